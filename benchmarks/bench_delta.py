@@ -0,0 +1,68 @@
+"""
+Delta rendering benchmark. Updates one slot of a dashboard with a 1,000 line header and a 20,000 row table,
+comparing a full Template.fill against a DeltaRenderer update when the changed slot is used by a single line, and when
+one row of the table changes.
+
+Run from the repository root with:
+
+    python benchmarks/bench_delta.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+from yatla.delta import DeltaRenderer
+
+HEADER_LINES = 1_000
+ROWS = 20_000
+REPEATS = 20
+
+DASHBOARD = yatla.parse(
+    "".join(f"Metric {i}: {{{{ m{i} }}}}\n" for i in range(HEADER_LINES))
+    + "Status: {{ status }}\n"
+    "{{ foreach row in rows }}\n"
+    "| {{ row }} |\n"
+    "{{ endforeach }}"
+)
+
+
+def main():
+    values = {f"m{i}": i for i in range(HEADER_LINES)}
+    values |= {"status": "ok", "rows": [f"row {i}" for i in range(ROWS)]}
+    renderer = DeltaRenderer(DASHBOARD)
+    renderer.fill(values)
+
+    statuses = iter(range(10**9))
+    rows = values["rows"]
+
+    def update_status():
+        values["status"] = next(statuses)
+        return renderer.update(values)
+
+    def update_row():
+        # Lists are replaced rather than changed in place, so the copy is part of the update.
+        values["rows"] = [
+            *rows[: ROWS // 2],
+            f"changed {next(statuses)}",
+            *rows[ROWS // 2 + 1 :],
+        ]
+        return renderer.update(values)
+
+    cases = [
+        ("full fill", lambda: DASHBOARD.fill(values)),
+        ("status update", update_status),
+        ("row update", update_row),
+    ]
+
+    print(f"{HEADER_LINES} header lines, {ROWS} rows, best of {REPEATS}")
+    for name, function in cases:
+        elapsed = min(timeit.repeat(function, number=1, repeat=REPEATS))
+        print(f"{name:<16} {elapsed * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Foreach benchmark. Renders the README times table, and a trivial loop body, over long lists with the reference AST
+evaluator and with the compiled render plan used by Template.fill.
+
+Run from the repository root with:
+
+    python benchmarks/bench_foreach.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+
+TEMPLATES = {
+    "times table": (
+        "This is the {{ factor }} times table:\n"
+        "{{ foreach num in num_list }}\n"
+        "    {{ factor }} * {{ num }} = {{ factor * num }}\n"
+        "{{ endforeach }}"
+    ),
+    "trivial body": (
+        "{{ foreach num in num_list }}\n" "- {{ num * factor }}\n" "{{ endforeach }}"
+    ),
+}
+
+SIZES = [1_000, 100_000]
+REPEATS = 5
+
+
+def main():
+    for name, source in TEMPLATES.items():
+        print(name)
+        benchmark(yatla.parse(source))
+
+
+def benchmark(template):
+    for size in SIZES:
+        values = {"factor": 7, "num_list": list(range(size))}
+        assert template.fill(values) == template._ast.eval(values)
+
+        number = max(1, 100_000 // size)
+        reference = min(
+            timeit.repeat(
+                lambda: template._ast.eval(values), number=number, repeat=REPEATS
+            )
+        )
+        compiled = min(
+            timeit.repeat(lambda: template.fill(values), number=number, repeat=REPEATS)
+        )
+        print(
+            f"{size:>8} elements: reference {reference / number * 1000:8.3f} ms, "
+            f"compiled {compiled / number * 1000:8.3f} ms ({reference / compiled:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
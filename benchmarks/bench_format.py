@@ -0,0 +1,63 @@
+"""
+Format spec benchmark. Renders a loop over a long list of prices with two decimals and thousands separators, comparing
+formatting in Python before filling against a format spec in the template, with and without an invariant operand.
+
+Run from the repository root with:
+
+    python benchmarks/bench_format.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+
+ELEMENTS = 200_000
+REPEATS = 5
+
+PLAIN = yatla.parse(
+    "{{ foreach price in prices }}\n"
+    "{{ price }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+FORMATTED = yatla.parse(
+    "{{ foreach price in prices }}\n"
+    "{{ price : ,.2f }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+SCALED = yatla.parse(
+    "{{ foreach price in prices }}\n"
+    "{{ price * rate : ,.2f }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+
+
+def main():
+    random.seed(0)
+    prices = [random.uniform(0, 1e6) for _ in range(ELEMENTS)]
+
+    cases = [
+        (
+            "pre-formatted",
+            lambda: PLAIN.fill({"prices": [f"{p:,.2f}" for p in prices]}),
+        ),
+        ("format spec", lambda: FORMATTED.fill({"prices": prices})),
+        (
+            "spec, reference",
+            lambda: FORMATTED._ast.eval({"prices": prices}),
+        ),
+        ("scaled spec", lambda: SCALED.fill({"prices": prices, "rate": 1.2})),
+    ]
+
+    print(f"{ELEMENTS} elements, best of {REPEATS}")
+    for name, function in cases:
+        elapsed = min(timeit.repeat(function, number=1, repeat=REPEATS))
+        print(f"{name:<16} {elapsed * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Parallel rendering benchmark. Renders a statement whose single loop lists two million transactions, comparing
+Template.fill in one process against a ParallelRenderer with an increasing number of workers. The workers are started
+before timing, so only rendering, sending the chunks and joining the output are measured. Scales only with as many
+CPUs as workers.
+
+Run from the repository root with:
+
+    python benchmarks/bench_parallel.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+from yatla.parallel import ParallelRenderer
+
+ELEMENTS = 2_000_000
+REPEATS = 3
+
+STATEMENT = yatla.parse(
+    "Statement for {{ customer }}\n"
+    "{{ foreach amount in amounts }}\n"
+    "{{ customer }},{{ amount * rate : ,.2f }}\n"
+    "{{ endforeach }}\n"
+    "End of statement"
+)  # fmt: skip
+
+
+def main():
+    random.seed(0)
+    values = {
+        "customer": "ACME",
+        "rate": 1.2,
+        "amounts": [random.uniform(0, 1e4) for _ in range(ELEMENTS)],
+    }
+
+    print(f"{ELEMENTS} elements on {os.cpu_count()} CPUs, best of {REPEATS}")
+    expected = STATEMENT.fill(values)
+    elapsed = min(
+        timeit.repeat(lambda: STATEMENT.fill(values), number=1, repeat=REPEATS)
+    )
+    print(f"{'1 process':<12} {elapsed * 1e3:8.1f} ms")
+
+    for workers in (2, 4, 8):
+        with ParallelRenderer(STATEMENT, workers) as renderer:
+            assert renderer.fill(values) == expected
+            elapsed = min(
+                timeit.repeat(lambda: renderer.fill(values), number=1, repeat=REPEATS)
+            )
+        print(f"{f'{workers} workers':<12} {elapsed * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Expression parser benchmark. Parses machine generated templates with 10,000 term expressions: a long operator chain,
+deeply nested parentheses and deeply nested right hand operands.
+
+Run from the repository root with:
+
+    python benchmarks/bench_parser.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+from yatla.lexer import Scanner
+from yatla.parser import parse_from_scanner
+
+TERMS = 10_000
+REPEATS = 3
+
+EXPRESSIONS = {
+    "chain": " + ".join(f"a{i % 100} * {i}" for i in range(TERMS)),
+    "nested parentheses": "(" * TERMS + "a" + ")" * TERMS,
+    "right nested": "1 + (" * TERMS + "a" + ")" * TERMS,
+}
+
+
+def main():
+    for name, expression in EXPRESSIONS.items():
+        source = "{{ " + expression + " }}"
+        ast_time = min(
+            timeit.repeat(
+                lambda: parse_from_scanner(Scanner(source)), number=1, repeat=REPEATS
+            )
+        )
+        parse_time = min(
+            timeit.repeat(lambda: yatla.parse(source), number=1, repeat=REPEATS)
+        )
+        template = yatla.parse(source)
+        values = {slot.name: 1 for slot in template.slots}
+        fill_time = min(
+            timeit.repeat(lambda: template.fill(values), number=1, repeat=REPEATS)
+        )
+        print(
+            f"{name:<20} scan and parse {ast_time * 1000:8.1f} ms, "
+            f"parse with inference and compilation {parse_time * 1000:8.1f} ms, "
+            f"fill {fill_time * 1000:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
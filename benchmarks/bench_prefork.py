@@ -0,0 +1,81 @@
+"""
+Prefork memory benchmark. Loads a set of templates into a registry, forks workers, and reports the average unique
+memory of a worker with and without freezing the registry before forking. Workers either only run a full garbage
+collection, as every long lived worker eventually does, or also fill every template, which copies the pages written
+by reference counting. Linux only.
+
+Run from the repository root with:
+
+    python benchmarks/bench_prefork.py
+"""
+
+import gc
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yatla.registry import TemplateRegistry, worker_memory
+
+TEMPLATES = 500
+WORKERS = 4
+
+SOURCE = "\n".join(
+    f"Line {i}: {{{{ name }}}} owes {{{{ total * {i} + fee }}}} by {{{{ Maximum(day, {i}) }}}}"
+    for i in range(50)
+)
+VALUES = {"name": "Ada", "total": 3, "fee": 1, "day": 14}
+
+
+def run_worker(registry: TemplateRegistry, fill: bool, write_end: int):
+    try:
+        gc.enable()
+        gc.collect()
+        if fill:
+            for name in registry:
+                registry.get(name).fill(VALUES)
+        os.write(write_end, f"{worker_memory().uss}\n".encode())
+    finally:
+        os._exit(0)
+
+
+def average_worker_uss(registry: TemplateRegistry, fill: bool) -> float:
+    read_end, write_end = os.pipe()
+    pids = []
+    for _ in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(registry, fill, write_end)
+        pids.append(pid)
+    os.close(write_end)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read_end) as f:
+        sizes = [int(line) for line in f]
+    return sum(sizes) / len(sizes)
+
+
+def main():
+    if worker_memory() is None:
+        print("/proc/self/smaps_rollup is unavailable, this benchmark requires Linux.")
+        return
+
+    gc.disable()
+    registry = TemplateRegistry()
+    for i in range(TEMPLATES):
+        registry.register(f"template{i}", SOURCE)
+
+    print(f"{TEMPLATES} templates, {WORKERS} workers, unique memory per worker")
+    for frozen in [False, True]:
+        if frozen:
+            registry.freeze()
+        collected = average_worker_uss(registry, fill=False)
+        filled = average_worker_uss(registry, fill=True)
+        print(
+            f"{'frozen' if frozen else 'not frozen':<12}"
+            f"collected {collected / 1e6:6.1f} MB, filled {filled / 1e6:6.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Cold start benchmark. Imports each module in a fresh interpreter with -X importtime and reports the median
+cumulative import time, failing if a module exceeds its budget.
+
+Run from the repository root with:
+
+    python benchmarks/bench_startup.py
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold start budgets in milliseconds, set from the medians measured with this script on Python 3.11 (yatla 0.15 ms,
+# yatla.main 38 ms, yatla.parser 36 ms) plus a 30% margin for noise, and at least 0.5 ms. yatla.main is dominated by
+# importing click, yatla.parser by dataclasses and enum. The compiler and the render cache are imported on first use.
+BUDGETS_MS = {
+    "yatla": 0.5,
+    "yatla.main": 50.0,
+    "yatla.parser": 47.0,
+}
+
+RUNS = 15
+
+# The warm up run has to write bytecode for later runs to reuse, so PYTHONDONTWRITEBYTECODE is dropped.
+ENV = {
+    key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"
+} | {"PYTHONPATH": ROOT}
+
+
+def cumulative_import_time_ms(module: str) -> float:
+    """
+    Imports module in a new interpreter and returns its cumulative import time in milliseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+        env=ENV,
+    )
+    # Lines look like: "import time: self [us] | cumulative | imported package"
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"{module} was not reported by -X importtime.")
+
+
+def main() -> int:
+    # Warm up so that bytecode compilation is not counted.
+    for module in BUDGETS_MS:
+        cumulative_import_time_ms(module)
+
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        timings = [cumulative_import_time_ms(module) for _ in range(RUNS)]
+        median = statistics.median(timings)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        failed = failed or median > budget
+        print(f"{module:<16} {median:8.2f} ms (budget {budget:.1f} ms) {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Streaming render benchmark. Renders a large generated template once, comparing the time and peak traced memory of
+parse(source).fill(values) against render_stream writing to a null stream.
+
+Run from the repository root with:
+
+    python benchmarks/bench_streaming.py
+"""
+
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+from yatla.streaming import render_stream
+
+LINES = 10_000
+
+SOURCE = "\n".join(
+    f"Row {i}: {{{{ name }}}} owes {{{{ total * {i} }}}} by {{{{ Maximum(day, {i % 28}) }}}}"
+    for i in range(LINES)
+)
+VALUES = {"name": "Ada", "total": 3, "day": 14}
+
+
+class NullWriter(io.TextIOBase):
+    def write(self, s):
+        return len(s)
+
+
+def measure(function):
+    # Tracing slows allocation heavily, so time and memory are measured in separate runs.
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    print(f"{LINES} lines, {len(SOURCE) / 1e6:.1f} MB of source")
+    for name, function in [
+        ("parse and fill", lambda: yatla.parse(SOURCE).fill(VALUES)),
+        ("render_stream", lambda: render_stream(SOURCE, VALUES, NullWriter())),
+    ]:
+        elapsed, peak = measure(function)
+        print(f"{name:<16} {elapsed:6.2f} s, peak {peak / 1e3:9.1f} kB")
+
+
+if __name__ == "__main__":
+    main()
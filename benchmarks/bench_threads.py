@@ -0,0 +1,67 @@
+"""
+Concurrent fill benchmark. Fills one shared template from 1, 2, 4 and 8 threads and reports the throughput. Fill
+throughput only scales with threads on free-threaded CPython builds; with the GIL enabled it shows the cost of
+contention instead.
+
+Run from the repository root with:
+
+    python benchmarks/bench_threads.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yatla
+
+FILLS = 20_000
+THREAD_COUNTS = [1, 2, 4, 8]
+
+TEMPLATE = yatla.parse(
+    "Dear {{ name }},\n"
+    "{{ foreach item in items }}\n"
+    "- {{ item }} at {{ price * 2 }}\n"
+    "{{ endforeach }}\n"
+    "Total: {{ Maximum(price * 10, 50) }}"
+)
+VALUES = {"name": "Ada", "items": ["tea", "cake", "jam"], "price": 3}
+
+
+def fill_concurrently(threads: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(FILLS // threads):
+            TEMPLATE.fill(VALUES)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    print(
+        f"Python {sys.version.split()[0]}, GIL {'enabled' if is_gil_enabled() else 'disabled'}"
+    )
+    baseline = None
+    for threads in THREAD_COUNTS:
+        elapsed = fill_concurrently(threads)
+        throughput = FILLS / elapsed
+        baseline = baseline or throughput
+        print(
+            f"{threads} threads: {throughput:9.0f} fills/s ({throughput / baseline:4.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import io
+
+import yatla
+from yatla.batch import (
+    coerce_value,
+    iter_records,
+    parse_argument_values,
+    render_records,
+)
+from yatla.loader import DictLoader
+
+
+def test_coerce_value():
+    assert coerce_value("-3") == -3
+    assert coerce_value("2.5") == 2.5
+    assert coerce_value("[1,2]") == [1, 2]
+    assert coerce_value("[1,2.5]") == [1.0, 2.5]
+    assert coerce_value("[a,b]") == ["a", "b"]
+    assert coerce_value("text") == "text"
+
+
+def test_iter_records_formats():
+    json_records = io.StringIO('[{"n": 1}, {"n": 2}]')
+    ndjson_records = io.StringIO('{"n": 1}\n\n{"n": 2}\n')
+    csv_records = io.StringIO("n\n1\n2\n")
+
+    assert list(iter_records(json_records, "json")) == [{"n": 1}, {"n": 2}]
+    assert list(iter_records(ndjson_records, "ndjson")) == [{"n": 1}, {"n": 2}]
+    assert list(iter_records(csv_records, "csv")) == [{"n": 1}, {"n": 2}]
+
+
+def test_csv_cells_are_coerced_by_slot_type():
+    template = yatla.parse(
+        "Hi {{ name }} {{ Maximum(n, 0) }}\n"
+        "{{ foreach t in tags }}\n"
+        "{{ t }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+    csv_records = io.StringIO('name,n,tags\n007,007,"[01,2]"\n')
+    records = iter_records(csv_records, "csv", template.slots)
+
+    assert list(render_records(template, records)) == ["Hi 007 7\n01\n2"]
+    assert parse_argument_values(["name:007"], template.slots) == {"name": "007"}
+
+
+def test_render_records_in_order():
+    template = yatla.parse("{{ name }}: {{ n * factor }}")
+    records = [{"name": str(i), "n": i} for i in range(20)]
+    expected = [f"{i}: {i * 3}" for i in range(20)]
+
+    assert list(render_records(template, records, {"factor": 3})) == expected
+    assert (
+        list(render_records(template, records, {"factor": 3}, workers=2, chunk_size=4))
+        == expected
+    )
+
+
+def test_render_records_in_workers_keeps_includes_and_escaping():
+    loader = DictLoader({"header": "<h1>{{ title }}</h1>"})
+    template = yatla.parse("{{ include header }}\n{{ name }}", "html", loader)
+    records = [{"title": "A & B", "name": "<b>"}] * 3
+
+    assert (
+        list(render_records(template, records, workers=2))
+        == ["<h1>A &amp; B</h1>\n&lt;b&gt;"] * 3
+    )
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from yatla.budget import BudgetExceededError, RenderBudget
+from yatla.parser import parse
+
+TEMPLATE = (
+    "Items for {{ name }}:\n"
+    "{{ foreach item in items }}\n"
+    "- {{ item }}\n"
+    "{{ endforeach }}\n"
+    "Done."
+)  # fmt: skip
+
+
+def test_fill_within_budget():
+    template = parse(TEMPLATE)
+    values = {"name": "Ada", "items": [1, 2, 3]}
+    expected = template.fill(values)
+
+    budget = RenderBudget(max_output=len(expected), max_iterations=3, timeout=60)
+
+    assert template.fill(values, budget) == expected
+
+
+def test_output_budget():
+    template = parse(TEMPLATE)
+    values = {"name": "Ada", "items": list(range(1000))}
+
+    with pytest.raises(BudgetExceededError) as error:
+        template.fill(values, RenderBudget(max_output=100))
+
+    assert error.value.limit == "output"
+    assert 100 < error.value.stats.output < 120
+    assert error.value.stats.iterations < 1000
+
+
+def test_iteration_budget():
+    template = parse(TEMPLATE)
+
+    with pytest.raises(BudgetExceededError) as error:
+        template.fill(
+            {"name": "Ada", "items": range(10**9)}, RenderBudget(max_iterations=5)
+        )
+
+    assert error.value.limit == "iterations"
+    assert error.value.stats.iterations == 6
+
+
+def test_timeout():
+    def slow_items():
+        time.sleep(0.01)
+        yield from range(1000)
+
+    template = parse(TEMPLATE)
+
+    with pytest.raises(BudgetExceededError) as error:
+        template.fill({"name": "Ada", "items": slow_items()}, RenderBudget(timeout=0))
+
+    assert error.value.limit == "timeout"
+
+
+def test_cost_estimate():
+    template = parse(TEMPLATE)
+    values = {"name": "A", "items": [1, 2, 3]}
+
+    assert template.cost.static_size == len("Items for :\n\nDone.")
+    assert template.cost.iterations(values) == 3
+    assert template.cost.estimate(values, expression_size=1) == len(
+        template.fill(values)
+    )
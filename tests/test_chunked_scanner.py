@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from yatla.lexer import Scanner
+from yatla.streaming import render_stream
+
+TEMPLATE = (
+    "Dear {{ name }},\r\n"
+    "{{ foreach item in items }}\r\n"
+    "- {{ item * 2 }}\r\n"
+    "{{ endforeach }}\r\n"
+    "Total: {{ Maximum(total, 10) }}"
+)  # fmt: skip
+
+
+def tokens(scanner: Scanner) -> list:
+    return [(t.type, t.literal, t.line_number) for t in scanner.scan()]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_chunked_text_stream_matches_string(chunk_size):
+    expected = tokens(Scanner(TEMPLATE))
+
+    assert tokens(Scanner(io.StringIO(TEMPLATE), chunk_size)) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_chunked_binary_stream_matches_string(chunk_size):
+    expected = tokens(Scanner(TEMPLATE))
+    stream = io.BytesIO(TEMPLATE.encode("utf-8"))
+
+    assert tokens(Scanner(stream, chunk_size)) == expected
+
+
+def test_render_stream_from_file_object():
+    values = {"name": "Ada", "items": [1, 2], "total": 3}
+    output = io.StringIO()
+
+    render_stream(io.StringIO(TEMPLATE), values, output)
+
+    assert output.getvalue() == "Dear Ada,\n- 2\n- 4\nTotal: 10"
@@ -0,0 +1,93 @@
+import pytest
+
+from yatla.compiler import compile_document
+from yatla.lexer import Scanner
+from yatla.parser import parse_from_scanner
+
+
+def render_both(template, values):
+    ast = parse_from_scanner(Scanner(template))
+    return compile_document(ast).render(values), ast.eval(values)
+
+
+def test_foreach_matches_reference():
+    template = (
+        "This is the {{ factor }} times table:\n"
+        "{{ foreach num in num_list }}\n"
+        "    {{ factor }} * {{ num }} = {{ factor * num }}\n"
+        "{{ (factor + 1) * 2 }} and {{ num }}\n"
+        "{{ endforeach }}\n"
+        "Done with {{ num }}"
+    )  # fmt: skip
+    values = {"factor": 3, "num_list": [1, 2.5, -4], "num": "slot"}
+
+    compiled, reference = render_both(template, values)
+
+    assert compiled == reference
+
+
+def test_empty_foreach_does_not_evaluate_invariants():
+    template = "{{ foreach x in xs }}\n{{ a / b }} {{ x }}\n{{ endforeach }}"
+
+    compiled, reference = render_both(template, {"xs": [], "a": 1, "b": 0})
+
+    assert compiled == reference == ""
+
+
+def test_invariant_errors_are_raised():
+    template = "{{ foreach x in xs }}\n{{ a / b }} {{ x }}\n{{ endforeach }}"
+    ast = parse_from_scanner(Scanner(template))
+
+    with pytest.raises(ZeroDivisionError):
+        compile_document(ast).render({"xs": [1], "a": 1, "b": 0})
+
+
+def test_repeated_subexpressions_are_computed_once():
+    template = (
+        "{{ Maximum(factor, num) }} and {{ Maximum(factor, num) + 1 }}\n"
+        "{{ foreach num in num_list }}\n"
+        "{{ factor * num }} {{ factor * num }} {{ num * (factor + 1) }}\n"
+        "{{ endforeach }}\n"
+        "{{ Maximum(factor, num) }}"
+    )  # fmt: skip
+    ast = parse_from_scanner(Scanner(template))
+    plan = compile_document(ast)
+    loop = plan.lines[1].parts[0]
+
+    assert len(plan.computations) == 1
+    assert len(loop.entry) == 1
+    assert len(loop.iteration) == 1
+
+    values = {"factor": 3, "num": 10, "num_list": [1, 2]}
+    assert plan.render(values) == ast.eval(values)
+
+
+def test_signed_zeros_are_not_shared():
+    values = {"x": 1}
+
+    assert render_both("{{ -0.0 * x }} {{ 0.0 * x }}", values) == ("-0.0 0.0",) * 2
+    assert render_both("{{ 0.0 * x }} {{ -0.0 * x }}", values) == ("0.0 -0.0",) * 2
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "{{ num }}",
+        "- {{ num }}",
+        "{{ num }};",
+        "{{ label }}: {{ (num) }} {{ label }}",
+        "{{ num * 2 }}",
+        "{{ factor - num }}",
+        "{{ num / (factor + 1) }}",
+    ],
+)
+def test_trivial_bodies_use_bulk_rendering(body):
+    template = "{{ foreach num in num_list }}\n" + body + "\n{{ endforeach }}"
+    ast = parse_from_scanner(Scanner(template))
+    plan = compile_document(ast)
+
+    assert plan.lines[0].parts[0].bulk is not None
+    for num_list in [[], [1], [1, 2.5, -3], (4, 5)]:
+        values = {"num_list": num_list, "factor": 3, "label": "x"}
+        assert plan.render(values) == ast.eval(values)
+        assert plan.render(values | {"num_list": iter(num_list)}) == ast.eval(values)
@@ -0,0 +1,69 @@
+import pytest
+
+from yatla.conformance import (
+    ENGINES,
+    RenderError,
+    compare,
+    generate_case,
+    minimise,
+    run_conformance,
+)
+from yatla.parser import parse
+
+
+def test_engines_conform():
+    assert run_conformance(iterations=300) == []
+
+
+def test_generate_case_is_reproducible():
+    source, values = generate_case(42)
+
+    assert generate_case(42) == (source, values)
+    assert {slot.name for slot in parse(source).slots} == set(values)
+
+
+def test_compare_reports_differing_outputs():
+    engines = ENGINES | {"broken": lambda template, values: "broken"}
+
+    outputs = compare("{{ a }}", {"a": 1}, engines)
+
+    assert outputs["reference"] == "1"
+    assert outputs["broken"] == "broken"
+
+
+def test_compare_allows_different_errors():
+    engines = {
+        "reference": ENGINES["reference"],
+        "other": lambda template, values: 1 / 0,
+    }
+
+    assert compare("{{ RoundUp(a, 1) }}", {}, engines) is None
+    assert compare("{{ a }}", {"a": 1}, engines)["other"] == RenderError(
+        "ZeroDivisionError"
+    )
+
+
+def test_minimise():
+    # An engine which renders the number 7 incorrectly.
+    engines = {
+        "reference": ENGINES["reference"],
+        "broken": lambda template, values: template.fill(values).replace("7", "8"),
+    }
+    source = (
+        "Header {{ title }}\n"
+        "{{ foreach x in items }}\n"
+        "- {{ x }} of {{ count * 2 }}\n"
+        "{{ endforeach }}\n"
+        "Footer"
+    )  # fmt: skip
+    values = {"title": "Report", "items": [1, 7, 3], "count": 5}
+
+    assert minimise(source, values, engines) == (
+        "{{ foreach x in items }}\n{{ x }}\n{{ endforeach }}",
+        {"items": [7]},
+    )
+
+
+def test_minimise_requires_failing_case():
+    with pytest.raises(ValueError):
+        minimise("{{ a }}", {"a": 1})
@@ -0,0 +1,133 @@
+import pytest
+
+import yatla
+import yatla.builtins
+from yatla.builtins import register_function
+from yatla.delta import DeltaRenderer, LineEdit, apply_edits
+from yatla.types import SlotType
+
+template_source = (
+    "Dear {{ name }},\n"
+    "Your balance is {{ balance }}.\n"
+    "{{ foreach item in items }}\n"
+    "- {{ item }}\n"
+    "{{ endforeach }}\n"
+    "Goodbye."
+)  # fmt: skip
+
+VALUES = {"name": "Ann", "balance": 10, "items": ["Pen", "Ink", "Paper"]}
+
+
+def test_delta_fill_matches_fill():
+    template = yatla.parse(template_source)
+
+    assert DeltaRenderer(template).fill(VALUES) == template.fill(VALUES)
+
+
+def test_delta_update_scalar():
+    renderer = DeltaRenderer(yatla.parse(template_source))
+    renderer.fill(VALUES)
+
+    assert renderer.update(VALUES | {"balance": 11}) == [
+        LineEdit(1, 2, ("Your balance is 11.",))
+    ]
+    assert renderer.update(VALUES | {"balance": 11}) == []
+
+
+def test_delta_update_signed_zero():
+    template = yatla.parse(template_source)
+    renderer = DeltaRenderer(template)
+    renderer.fill(VALUES | {"balance": 0.0, "items": [0.0]})
+
+    assert renderer.update(VALUES | {"balance": -0.0, "items": [-0.0]}) == [
+        LineEdit(1, 2, ("Your balance is -0.0.",)),
+        LineEdit(2, 3, ("- -0.0",)),
+    ]
+
+
+def test_delta_update_loop():
+    template = yatla.parse(template_source)
+    renderer = DeltaRenderer(template)
+    previous = renderer.fill(VALUES)
+
+    items = ["Pen", "Quill", "Paper", "Glue"]
+    edits = renderer.update(VALUES | {"items": items})
+
+    assert edits == [LineEdit(3, 5, ("- Quill", "- Paper", "- Glue"))]
+    assert apply_edits(previous, edits) == template.fill(VALUES | {"items": items})
+
+
+def test_delta_update_appended_element():
+    template = yatla.parse(template_source)
+    renderer = DeltaRenderer(template)
+    values = VALUES | {"items": ["Pen"]}
+    previous = renderer.fill(values)
+
+    values["items"] = [*values["items"], "Ink"]
+    edits = renderer.update(values)
+
+    assert edits == [LineEdit(3, 3, ("- Ink",))]
+    assert apply_edits(previous, edits) == renderer.output == template.fill(values)
+
+
+def test_delta_update_renders_only_changed_elements(monkeypatch):
+    monkeypatch.setattr(yatla.builtins, "FUNCTIONS", dict(yatla.builtins.FUNCTIONS))
+    rendered = []
+    register_function(
+        "Mark", lambda x: rendered.append(x) or x, [SlotType.String], SlotType.String
+    )
+    template = yatla.parse(
+        "{{ foreach item in items }}\n{{ Mark(item) }}\n{{ endforeach }}"
+    )
+    renderer = DeltaRenderer(template)
+    items = [str(i) for i in range(1000)]
+    previous = renderer.fill({"items": items})
+
+    rendered.clear()
+    items = items[:500] + ["new", "newer"] + items[501:]
+    edits = renderer.update({"items": items})
+
+    assert rendered == ["new", "newer"]
+    assert apply_edits(previous, edits) == template.fill({"items": items})
+
+    previous = renderer.output
+    rendered.clear()
+    items = items[:2] + items[3:]
+    edits = renderer.update({"items": items})
+
+    assert rendered == []
+    assert edits == [LineEdit(2, 3, ())]
+    assert apply_edits(previous, edits) == template.fill({"items": items})
+
+    # An element rendering a newline changes the number of lines of its element, so the loop is rendered again.
+    for items in (items[:9] + ["line\nbreak"] + items[10:], items[:5], items):
+        previous = renderer.output
+        edits = renderer.update({"items": items})
+        assert apply_edits(previous, edits) == template.fill({"items": items})
+
+
+def test_delta_update_empty_loop():
+    template = yatla.parse(template_source)
+    renderer = DeltaRenderer(template)
+    previous = renderer.fill(VALUES | {"items": []})
+
+    values = VALUES | {"name": "Bob", "balance": 0}
+    edits = renderer.update(values)
+
+    assert apply_edits(previous, edits) == template.fill(values)
+
+
+def test_delta_update_keeps_output_on_error():
+    renderer = DeltaRenderer(yatla.parse("{{ a }}\n{{ 1 / b }}"))
+    renderer.fill({"a": 1, "b": 1})
+
+    with pytest.raises(ZeroDivisionError):
+        renderer.update({"a": 2, "b": 0})
+
+    assert renderer.output == "1\n1.0"
+    assert renderer.update({"a": 2, "b": 1}) == [LineEdit(0, 1, ("2",))]
+
+
+def test_delta_update_requires_fill():
+    with pytest.raises(ValueError):
+        DeltaRenderer(yatla.parse(template_source)).update(VALUES)
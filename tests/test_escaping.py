@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from yatla.escaping import ESCAPES, get_escaper
+from yatla.parser import parse
+
+
+@pytest.mark.parametrize("name", ESCAPES)
+def test_escapers_match_tables(name):
+    text = "".join(chr(c) for c in range(0x300)) + "  & \\ \" '"
+
+    assert get_escaper(name)(text) == text.translate(ESCAPES[name])
+
+
+def test_html_escaping():
+    template = parse(
+        '<a title="{{ title }}">{{ count * 2 }} of {{ count }} & {{ name : >6 }}</a>\n'
+        "{{ foreach comment in comments }}\n"
+        "<li>{{ comment }}</li>\n"
+        "{{ endforeach }}",
+        escape="html",
+    )
+    values = {
+        "title": 'Tom & "Jerry"',
+        "count": 3,
+        "name": "<b>",
+        "comments": ["x < y", 1.5],
+    }
+
+    assert template.escape == "html"
+    assert template.fill(values) == (
+        '<a title="Tom &amp; &quot;Jerry&quot;">6 of 3 &    &lt;b&gt;</a>\n'
+        "<li>x &lt; y</li>\n"
+        "<li>1.5</li>"
+    )
+
+
+def test_values_are_escaped_whatever_their_slot_type():
+    template = parse("<p>{{ x }}</p>\n{{ x * 1 }}\n{{ a + b }}", escape="html")
+    values = {"x": "<script>", "a": "<b>", "b": "</b>"}
+
+    assert template.fill(values) == (
+        "<p>&lt;script&gt;</p>\n&lt;script&gt;\n&lt;b&gt;&lt;/b&gt;"
+    )
+
+    template = parse(
+        "{{ foreach x in xs }}\n{{ x * 1 }}\n{{ endforeach }}", escape="html"
+    )
+    assert template.fill({"xs": [1, "<i>"]}) == "1\n&lt;i&gt;"
+
+
+def test_csv_and_json_escaping():
+    csv = parse('"{{ name }}",{{ total : .2f }}', escape="csv")
+    json_template = parse('{"name": "{{ name }}", "total": {{ total }}}', escape="json")
+    values = {"name": 'Ada "The Countess"\nLovelace', "total": 2.5}
+
+    assert csv.fill(values) == '"Ada ""The Countess""\nLovelace",2.50'
+    assert json.loads(json_template.fill(values)) == values
+
+
+def test_unknown_escaping_mode():
+    with pytest.raises(ValueError):
+        parse("{{ name }}", escape="xml")
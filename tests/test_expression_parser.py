@@ -0,0 +1,54 @@
+import pytest
+
+from yatla.ast_nodes import (
+    BinOpASTNode,
+    BuiltinFunctionType,
+    DocumentASTNode,
+    ExpressionBlockASTNode,
+    IndentiferASTNode,
+    LineASTNode,
+)
+from yatla.lexer import Scanner
+from yatla.parser import parse, parse_from_scanner
+
+
+def test_multiplication_binds_tighter_than_addition():
+    assert parse_from_scanner(Scanner("{{ a + b * c }}")) == DocumentASTNode(
+        [
+            LineASTNode(
+                [
+                    ExpressionBlockASTNode(
+                        BinOpASTNode(
+                            IndentiferASTNode("a"),
+                            BinOpASTNode(
+                                IndentiferASTNode("b"),
+                                IndentiferASTNode("c"),
+                                BuiltinFunctionType.MULTIPLY,
+                            ),
+                            BuiltinFunctionType.ADD,
+                        )
+                    )
+                ]
+            )
+        ]
+    )
+
+
+def test_long_operator_chain():
+    template = parse("{{ " + " + ".join(["a - 1"] * 10_000) + " }}")
+
+    assert template.fill({"a": 2}) == "10000"
+
+
+def test_deeply_nested_expressions():
+    nested = parse("{{ " + "(" * 5_000 + "a" + ")" * 5_000 + " }}")
+    right_nested = parse("{{ " + "1 + (" * 5_000 + "a" + ")" * 5_000 + " }}")
+
+    assert nested.fill({"a": 3}) == "3"
+    assert right_nested.fill({"a": 3}) == "5003"
+
+
+@pytest.mark.parametrize("source", ["{{ a + 1) }}", "{{ a + 1, b }}", "{{ (a)) }}"])
+def test_unmatched_closing_tokens(source):
+    with pytest.raises(ValueError, match="Parser error"):
+        parse(source)
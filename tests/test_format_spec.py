@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from yatla.lexer import Scanner
+from yatla.parser import Parser, TokenSource, parse
+from yatla.template import Slot
+from yatla.types import SlotType
+
+
+def test_format_spec_fill():
+    template = parse("Total: {{ price * quantity : ,.2f }} for [{{ name : >6 }}]")
+    values = {"price": 1250.5, "quantity": 3, "name": "Ada"}
+
+    assert template.fill(values) == "Total: 3,751.50 for [   Ada]"
+    assert template._ast.eval(values) == template.fill(values)
+    assert template.slots == [
+        Slot("name", SlotType.Any),
+        Slot("price", SlotType.Num),
+        Slot("quantity", SlotType.Num),
+    ]
+
+
+def test_format_spec_in_bulk_loops():
+    template = parse(
+        "{{ foreach price in prices }}\n"
+        "- {{ price * rate : 08.2f }} EUR\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+    values = {"prices": [1, 2.5, 1234], "rate": 2}
+
+    assert template.slots == [
+        Slot("prices", SlotType.NumArray),
+        Slot("rate", SlotType.Num),
+    ]
+    assert template.fill(values) == "- 00002.00 EUR\n- 00005.00 EUR\n- 02468.00 EUR"
+    assert template._ast.eval(values) == template.fill(values)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "{{ price : q }}",
+        "{{ price : .f }}",
+        "{{ price : ,s }}",
+        "{{ price : .2d }}",
+        "{{ price : ,.2f",
+    ],
+)
+def test_invalid_format_specs(source):
+    with pytest.raises(ValueError):
+        parse(source)
+
+
+def test_format_spec_across_chunks():
+    source = "{{ total : ,.2f }} and {{ name:>5}}"
+    expected = Parser(TokenSource(Scanner(source))).parse_document()
+
+    for chunk_size in (1, 2, 3):
+        scanner = Scanner(io.StringIO(source), chunk_size=chunk_size)
+        assert Parser(TokenSource(scanner)).parse_document() == expected
@@ -0,0 +1,69 @@
+import yatla
+from yatla.cache import FragmentCache
+
+template_source = (
+    "Dear {{ name }},\n"
+    "Your balance is {{ balance }}.\n"
+    "This is the {{ factor }} times table:\n"
+    "{{ foreach num in num_list }}\n"
+    "    {{ factor }} * {{ num }} = {{ factor * num }}\n"
+    "{{ endforeach }}\n"
+    "Goodbye."
+)  # fmt: skip
+
+
+def test_fragment_cache_matches_fill():
+    template = yatla.parse(template_source)
+    cache = FragmentCache(template)
+    values = {"name": "Ann", "balance": 10, "factor": 2, "num_list": [1, 2, 3]}
+
+    assert cache.fill(values) == template.fill(values)
+    assert cache.fill(values) == template.fill(values)
+
+
+def test_fragment_cache_only_rerenders_changed_lines():
+    template = yatla.parse(template_source)
+    cache = FragmentCache(template)
+    values = {"name": "Ann", "balance": 10, "factor": 2, "num_list": [1, 2, 3]}
+    cache.fill(values)
+
+    updated = values | {"balance": 11}
+    assert cache.fill(updated) == template.fill(updated)
+
+    stats = cache.stats
+    assert stats.misses == 5 + 1
+    assert stats.hits == 4
+
+
+def test_fragment_cache_distinguishes_numeric_types():
+    template = yatla.parse("{{ value }}")
+    cache = FragmentCache(template)
+
+    assert cache.fill({"value": 1}) == "1"
+    assert cache.fill({"value": 1.0}) == "1.0"
+    assert cache.fill({"value": 0.0}) == "0.0"
+    assert cache.fill({"value": -0.0}) == "-0.0"
+
+
+def test_fragment_cache_skips_single_use_iterables():
+    template = yatla.parse("{{ foreach x in xs }}\n{{ x }}\n{{ endforeach }}")
+    cache = FragmentCache(template)
+
+    assert cache.fill({"xs": iter([1, 2])}) == "1\n2"
+    assert cache.stats.uncacheable == 1
+
+
+def test_fragment_cache_hits_skip_shared_computations(monkeypatch):
+    template = yatla.parse("{{ factor * 2 }}\n{{ factor * 2 + 1 }}")
+    cache = FragmentCache(template)
+    environments = []
+    environment = template._plan.environment
+    monkeypatch.setattr(
+        template._plan,
+        "environment",
+        lambda values: environments.append(values) or environment(values),
+    )
+
+    assert cache.fill({"factor": 3}) == "6\n7"
+    assert cache.fill({"factor": 3}) == "6\n7"
+    assert len(environments) == 1
@@ -0,0 +1,92 @@
+import pytest
+
+import yatla.builtins
+from yatla.builtins import register_function
+from yatla.parser import parse
+from yatla.template import Slot
+from yatla.types import SlotType
+
+
+@pytest.fixture(autouse=True)
+def functions(monkeypatch):
+    monkeypatch.setattr(yatla.builtins, "FUNCTIONS", dict(yatla.builtins.FUNCTIONS))
+
+
+def test_registered_function_types_its_arguments():
+    register_function(
+        "Repeat", lambda s, n: s * n, [SlotType.String, SlotType.Num], SlotType.String
+    )
+
+    template = parse("{{ Repeat(word, count + 1) }}")
+
+    assert template.slots == [
+        Slot("count", SlotType.Num),
+        Slot("word", SlotType.String),
+    ]
+    assert template.fill({"word": "ab", "count": 1}) == "abab"
+
+
+def test_string_arguments_narrow_slots_used_plainly():
+    register_function(
+        "Repeat", lambda s, n: s * n, [SlotType.String, SlotType.Num], SlotType.String
+    )
+
+    template = parse("{{ word }} {{ Repeat(word, 2) }}")
+    assert template.slots == [Slot("word", SlotType.String)]
+    assert template.fill({"word": "ab"}) == "ab abab"
+
+    template = parse(
+        "{{ foreach w in words }}\n{{ w }} {{ Repeat(w, 2) }}\n{{ endforeach }}"
+    )
+    assert template.slots == [Slot("words", SlotType.StringArray)]
+    assert template.fill({"words": ["a", "b"]}) == "a aa\nb bb"
+
+
+def test_calls_are_checked_when_parsing():
+    register_function("Name", lambda: "yatla", [], SlotType.String)
+
+    with pytest.raises(ValueError, match="requires 2 arguments"):
+        parse("{{ Maximum(1) }}")
+    with pytest.raises(ValueError, match="returns String"):
+        parse("{{ Name() + 1 }}")
+    with pytest.raises(ValueError):
+        register_function("Maximum", max, [SlotType.Num, SlotType.Num])
+
+
+@pytest.mark.parametrize("name", ["foreach", "endforeach", "in", "include"])
+def test_keywords_cannot_be_registered(name):
+    with pytest.raises(ValueError, match="Invalid function name"):
+        register_function(name, lambda: 1, [])
+
+
+def test_pure_calls_of_constants_are_folded():
+    calls = []
+    register_function("Double", lambda x: calls.append(x) or x * 2, [SlotType.Num])
+
+    template = parse("{{ Double(21) }} {{ Double(21) + n }}")
+
+    assert calls == [21]
+    assert template.fill({"n": 1}) == "42 43"
+    assert calls == [21]
+
+
+def test_impure_calls_are_neither_shared_nor_hoisted():
+    counter = iter(range(100))
+    register_function("Tick", lambda: next(counter), [], pure=False)
+
+    template = parse(
+        "{{ Tick() }} {{ Tick() }}\n"
+        "{{ foreach n in numbers }}\n"
+        "{{ n }}: {{ Tick() * 10 }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+
+    assert template.fill({"numbers": [1, 2]}) == "0 1\n1: 20\n2: 30"
+
+
+def test_calls_without_arguments_in_deep_expressions():
+    register_function("Pi", lambda: 3, [])
+
+    template = parse("{{ " + " + ".join(["x + Pi()"] * 70) + " }}")
+
+    assert template.fill({"x": 1}) == "280"
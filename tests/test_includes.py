@@ -0,0 +1,88 @@
+import pytest
+
+from yatla.loader import DictLoader, FileSystemLoader
+from yatla.parser import parse
+from yatla.streaming import StreamingRender
+from yatla.template import Slot
+from yatla.types import SlotType
+
+PARTIALS = {
+    "header": "== {{ title }} ==\n",
+    "item": "- {{ item }} x {{ quantity * 2 }}",
+    "footer": "{{ include signature }}\nThanks.",
+    "signature": "-- {{ author }}",
+}
+
+TEMPLATE = (
+    "{{ include header }}\n"
+    "{{ foreach item in items }}\n"
+    "{{ include item }}\n"
+    "{{ endforeach }}\n"
+    "{{ include footer }}"
+)  # fmt: skip
+
+VALUES = {"title": "Order", "items": ["Pen", "Ink"], "quantity": 3, "author": "Ada"}
+
+EXPECTED = "== Order ==\n- Pen x 6\n- Ink x 6\n-- Ada\nThanks."
+
+
+def test_includes_are_inlined():
+    loader = DictLoader(PARTIALS)
+    template = parse(TEMPLATE, loader=loader)
+
+    assert template.fill(VALUES) == EXPECTED
+    assert template.slots == [
+        Slot("author", SlotType.Any),
+        Slot("items", SlotType.AnyArray),
+        Slot("quantity", SlotType.Num),
+        Slot("title", SlotType.Any),
+    ]
+    assert "".join(StreamingRender(TEMPLATE, VALUES, loader)) == EXPECTED
+
+
+def test_partials_are_parsed_once():
+    loader = DictLoader(dict(PARTIALS))
+    first = parse(TEMPLATE, loader=loader)
+    loader.sources["header"] = "changed"
+    second = parse(TEMPLATE, loader=loader)
+
+    assert second.fill(VALUES) == EXPECTED
+    assert second._ast.lines[0] is first._ast.lines[0]
+
+    loader.clear()
+    assert parse(TEMPLATE, loader=loader).fill(VALUES).startswith("changed\n")
+
+
+def test_include_cycles():
+    loader = DictLoader({"a": "A\n{{ include b }}", "b": "{{ include a }}"})
+
+    with pytest.raises(ValueError, match="Include cycle: a -> b -> a."):
+        parse("{{ include a }}", loader=loader)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "Hello {{ include header }}",
+        "{{ include header }} world",
+        "{{ include missing }}",
+    ],
+)
+def test_invalid_includes(source):
+    with pytest.raises(ValueError):
+        parse(source, loader=DictLoader(PARTIALS))
+
+    with pytest.raises(ValueError):
+        parse("{{ include header }}")
+
+
+def test_file_system_loader(tmp_path):
+    (tmp_path / "partials").mkdir()
+    (tmp_path / "partials" / "header.txt").write_text("== {{ title }} ==\n")
+    loader = FileSystemLoader(str(tmp_path))
+
+    template = parse("{{ include partials/header.txt }}\nBody", loader=loader)
+
+    assert template.fill({"title": "Hi"}) == "== Hi ==\nBody"
+    with pytest.raises(ValueError):
+        parse("{{ include ../secret.txt }}", loader=loader)
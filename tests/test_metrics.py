@@ -0,0 +1,72 @@
+import pytest
+
+from yatla import metrics
+from yatla.cache import FragmentCache
+from yatla.parser import parse
+
+TEMPLATE = (
+    "Hello {{ name }}\n"
+    "{{ foreach item in items }}\n"
+    "- {{ item }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_metrics_are_disabled_by_default():
+    metrics.reset()
+    parse(TEMPLATE).fill({"name": "Ann", "items": [1, 2]})
+
+    assert not metrics.ENABLED
+    assert metrics.FILL_SECONDS.count() == 0
+    assert metrics.FOREACH_ITERATIONS.value() == 0
+
+
+def test_parse_and_fill_metrics(enabled):
+    template = parse(TEMPLATE)
+    output = template.fill({"name": "Ann", "items": [1, 2, 3]})
+
+    for phase in ("scan", "parse", "inference", "compile"):
+        assert metrics.PARSE_SECONDS.count(phase) == 1
+    assert metrics.FILL_SECONDS.count() == 1
+    assert metrics.OUTPUT_CHARACTERS.value() == len(output)
+    assert metrics.FOREACH_ITERATIONS.value() == 3
+
+
+def test_cache_metrics(enabled):
+    cache = FragmentCache(parse(TEMPLATE))
+    cache.fill({"name": "Ann", "items": [1]})
+    cache.fill({"name": "Bob", "items": [1]})
+
+    assert metrics.CACHE_REQUESTS.value("fragment", "miss") == 3
+    assert metrics.CACHE_REQUESTS.value("fragment", "hit") == 1
+
+
+def test_render_prometheus():
+    counter = metrics.Counter("requests_total", "Requests.", ["path"])
+    counter.inc('/a"b')
+    counter.inc('/a"b', amount=2)
+    histogram = metrics.Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value)
+
+    assert metrics.render_prometheus([counter, histogram]) == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/a\\"b"} 3\n'
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 2\n'
+        'latency_seconds_bucket{le="1"} 3\n'
+        'latency_seconds_bucket{le="+Inf"} 4\n'
+        "latency_seconds_sum 5.65\n"
+        "latency_seconds_count 4\n"
+    )
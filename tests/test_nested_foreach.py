@@ -0,0 +1,126 @@
+import pytest
+
+from yatla.budget import BudgetExceededError, RenderBudget
+from yatla.parser import parse
+from yatla.template import Slot
+from yatla.types import ArrayType, SlotType
+
+TEMPLATE = (
+    "Orders for {{ customer }}:\n"
+    "{{ foreach order in orders }}\n"
+    "Order:\n"
+    "{{ foreach item in order }}\n"
+    "- {{ item }} x {{ quantity }}\n"
+    "{{ endforeach }}\n"
+    "{{ endforeach }}\n"
+    "Done."
+)  # fmt: skip
+
+VALUES = {
+    "customer": "Ada",
+    "quantity": 2,
+    "orders": [["Pen", "Ink"], [], ["Paper"]],
+}
+
+EXPECTED = (
+    "Orders for Ada:\n"
+    "Order:\n"
+    "- Pen x 2\n"
+    "- Ink x 2\n"
+    "Order:\n"
+    "\n"
+    "Order:\n"
+    "- Paper x 2\n"
+    "Done."
+)  # fmt: skip
+
+
+def test_nested_foreach_fill():
+    template = parse(TEMPLATE)
+
+    assert template.fill(VALUES) == EXPECTED
+    assert template._ast.eval(VALUES) == EXPECTED
+
+
+def test_nested_foreach_slot_types():
+    template = parse(TEMPLATE)
+
+    assert template.slots == [
+        Slot("customer", SlotType.Any),
+        Slot("orders", ArrayType(SlotType.AnyArray)),
+        Slot("quantity", SlotType.Any),
+    ]
+
+    numeric = parse(
+        "{{ foreach row in matrix }}\n"
+        "{{ foreach column in row }}\n"
+        "{{ foreach cell in column }}\n"
+        "{{ cell * 2 }}\n"
+        "{{ endforeach }}\n"
+        "{{ endforeach }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+
+    assert numeric.slots == [Slot("matrix", ArrayType(ArrayType(SlotType.NumArray)))]
+    assert numeric.fill({"matrix": [[[1, 2]], [[3]]]}) == "2\n4\n6"
+
+
+def test_nested_foreach_over_independent_iterators():
+    template = parse(
+        "{{ foreach row in rows }}\n"
+        "{{ foreach column in columns }}\n"
+        "{{ row * column }}\n"
+        "{{ endforeach }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+
+    assert template.fill({"rows": [1, 2], "columns": [10, 20]}) == "10\n20\n20\n40"
+    # Single-use iterators are read once for each element of the outer loop.
+    assert template.fill({"rows": [1, 2], "columns": iter([10, 20])}) == "10\n20\n"
+
+
+def test_iterand_used_more_than_once():
+    template = parse(
+        "{{ foreach item in items }}\n"
+        "{{ item }} and {{ item }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+
+    assert template.slots == [Slot("items", SlotType.AnyArray)]
+    assert template.fill({"items": ["a", "b"]}) == "a and a\nb and b"
+
+
+def test_nested_foreach_validation():
+    validator = parse(TEMPLATE).validator
+
+    assert validator.errors(VALUES) == []
+    assert validator.errors(VALUES | {"orders": [["Pen"], "Ink"]}) == [
+        "Element 1 of slot 'orders' must be a list of strings or numbers, got 'Ink'."
+    ]
+
+
+def test_nested_foreach_budget():
+    template = parse(TEMPLATE)
+
+    assert template.cost.iterations(VALUES) == 6
+    assert template.fill(VALUES, RenderBudget(max_iterations=6)) == EXPECTED
+
+    with pytest.raises(BudgetExceededError) as error:
+        template.fill(VALUES, RenderBudget(max_iterations=5))
+    assert error.value.limit == "iterations"
+
+
+def test_invariant_of_empty_inner_loop_not_computed():
+    # 3 / divisor does not depend on either iterand, but is only evaluated for elements of the inner loop.
+    template = parse(
+        "{{ foreach order in orders }}\n"
+        "Order:\n"
+        "{{ foreach item in order }}\n"
+        "{{ item * ( 3 / divisor ) }} {{ 3 / divisor }}\n"
+        "{{ endforeach }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+    values = {"orders": [[], []], "divisor": 0}
+
+    assert template.fill(values) == "Order:\n\nOrder:\n"
+    assert template.fill(values, RenderBudget()) == template._ast.eval(values)
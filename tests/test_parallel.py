@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+from yatla.budget import RenderBudget
+from yatla.parallel import PARALLEL_THRESHOLD, ParallelRenderer, find_large_loop
+from yatla.parser import parse
+from yatla.streaming import render_stream
+
+TEMPLATE = (
+    "Statement for {{ customer }}\n"
+    "{{ foreach amount in amounts }}\n"
+    "{{ customer }}: {{ amount * rate : .2f }}\n"
+    "{{ endforeach }}\n"
+    "End"
+)  # fmt: skip
+
+VALUES = {"customer": "<Ann>", "rate": 2, "amounts": list(range(10))}
+
+
+def test_parallel_fill():
+    template = parse(TEMPLATE, escape="html")
+
+    with ParallelRenderer(template, workers=2, threshold=1, chunk_size=3) as renderer:
+        assert renderer.fill(VALUES) == template.fill(VALUES)
+        assert renderer.fill(VALUES | {"amounts": [1]}) == template.fill(
+            VALUES | {"amounts": [1]}
+        )
+        assert renderer.fill(VALUES | {"amounts": []}) == template.fill(
+            VALUES | {"amounts": []}
+        )
+
+
+def test_parallel_fill_nested_loop_over_iterator():
+    template = parse(
+        "{{ foreach x in xs }}\n"
+        "{{ foreach y in xs }}\n"
+        "{{ x * y }}\n"
+        "{{ endforeach }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+    values = {"xs": [1, 2, 3, 4, 5]}
+
+    with ParallelRenderer(template, workers=2, threshold=1, chunk_size=2) as renderer:
+        assert renderer.fill(values) == template.fill(values)
+
+
+def test_parallel_fill_raises_worker_errors():
+    template = parse("{{ foreach x in xs }}\n{{ 1 / x }}\n{{ endforeach }}")
+
+    with ParallelRenderer(template, workers=2, threshold=1, chunk_size=1) as renderer:
+        with pytest.raises(ZeroDivisionError):
+            renderer.fill({"xs": [1, 2, 0, 4]})
+
+
+def test_find_large_loop():
+    template = parse(TEMPLATE)
+    loop_line = template._ast.lines[1]
+
+    assert find_large_loop(loop_line, VALUES, threshold=10) is not None
+    assert find_large_loop(loop_line, VALUES, threshold=11) is None
+    assert find_large_loop(loop_line, {"amounts": iter(range(10))}, 1) is None
+    assert find_large_loop(template._ast.lines[0], VALUES, threshold=1) is None
+
+
+def test_fill_with_workers():
+    template = parse(TEMPLATE)
+    values = VALUES | {"amounts": list(range(PARALLEL_THRESHOLD))}
+
+    assert template.fill(values, workers=2) == template.fill(values)
+
+    with pytest.raises(ValueError):
+        template.fill(values, RenderBudget(), workers=2)
+
+
+def test_render_stream_with_workers():
+    values = VALUES | {"amounts": list(range(PARALLEL_THRESHOLD))}
+    output = io.StringIO()
+
+    render_stream(TEMPLATE, values, output, workers=2)
+
+    assert output.getvalue() == parse(TEMPLATE).fill(values)
@@ -0,0 +1,34 @@
+import tracemalloc
+
+from yatla.parser import Parser, TokenSource
+from yatla.profiling import PHASES, _RecordingScanner, _scan, profile_allocations
+
+TEMPLATE = (
+    "Hello {{ name }}\n"
+    "{{ foreach item in items }}\n"
+    "- {{ item * rate : .2f }} {{ Maximum(item, 3) }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+
+
+def test_scan_replays_parser_modes():
+    recording = _RecordingScanner(TEMPLATE)
+    Parser(TokenSource(recording)).parse_document()
+
+    assert _scan(TEMPLATE, recording.modes) == recording.tokens
+
+
+def test_profile_allocations():
+    small = profile_allocations(TEMPLATE, {"name": "Ann", "items": [1], "rate": 2})
+    large = profile_allocations(
+        TEMPLATE, {"name": "Ann", "items": list(range(1000)), "rate": 2}
+    )
+
+    assert list(small.phases) == list(PHASES)
+    assert all(stats.peak >= stats.size for stats in small.phases.values())
+    assert large.phases["fill"].peak > 10 * small.phases["fill"].peak
+
+    assert small.nodes["ForEachBlockASTNode"].count == 1
+    assert small.nodes["ExpressionBlockASTNode"].count == 3
+    assert "fill" in small.format()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,139 @@
+import gc
+import os
+import time
+
+import pytest
+
+from yatla.registry import DirectoryRegistry, TemplateRegistry, worker_memory
+
+
+@pytest.fixture
+def registry():
+    registry = TemplateRegistry()
+    registry.register("greeting", "Hello {{ name }}")
+    yield registry
+    gc.unfreeze()
+
+
+def test_register_and_get(registry):
+    assert "greeting" in registry
+    assert list(registry) == ["greeting"]
+    assert registry.get("greeting").fill({"name": "Ada"}) == "Hello Ada"
+    with pytest.raises(ValueError):
+        registry.get("missing")
+
+
+def test_freeze(registry):
+    registry.freeze()
+
+    assert registry.frozen
+    assert gc.get_freeze_count() > 0
+    with pytest.raises(ValueError):
+        registry.register("farewell", "Bye {{ name }}")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires fork.")
+def test_forked_worker_fills_registered_template(registry):
+    registry.freeze()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(write_end, registry.get("greeting").fill({"name": "Ada"}).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    _, status = os.waitpid(pid, 0)
+    assert os.read(read_end, 100) == b"Hello Ada"
+    assert status == 0
+
+
+def test_worker_memory():
+    memory = worker_memory()
+    if memory is None:
+        pytest.skip("/proc/self/smaps_rollup is unavailable.")
+
+    assert 0 < memory.uss <= memory.pss <= memory.rss
+
+
+def test_directory_registry_reloads_changed_files(tmp_path):
+    (tmp_path / "emails").mkdir()
+    welcome = tmp_path / "emails" / "welcome.txt"
+    welcome.write_text("Hello {{ name }}")
+    (tmp_path / "notes.md").write_text("ignored")
+
+    registry = DirectoryRegistry(str(tmp_path), pattern="*.txt")
+    assert list(registry) == ["emails/welcome.txt"]
+    assert registry.refresh() == []
+
+    welcome.write_text("Welcome {{ name }}!")
+    os.utime(welcome, ns=(0, 0))
+    assert registry.refresh() == ["emails/welcome.txt"]
+    assert registry.get("emails/welcome.txt").fill({"name": "Ada"}) == "Welcome Ada!"
+
+    welcome.write_text("Welcome {{ name }")
+    os.utime(welcome, ns=(1, 1))
+    assert registry.refresh() == []
+    assert "emails/welcome.txt" in registry.errors
+    assert registry.get("emails/welcome.txt").fill({"name": "Ada"}) == "Welcome Ada!"
+
+    welcome.unlink()
+    assert registry.refresh() == ["emails/welcome.txt"]
+    assert len(registry) == 0
+
+
+def test_directory_registry_background_reload(tmp_path):
+    template = tmp_path / "page.txt"
+    template.write_text("v1")
+    registry = DirectoryRegistry(str(tmp_path), poll_interval=0.01)
+    registry.start()
+    try:
+        template.write_text("version 2")
+        deadline = time.monotonic() + 5
+        while registry.get("page.txt").fill({}) != "version 2":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        registry.stop()
+
+
+def test_directory_registry_keeps_templates_on_any_error(tmp_path):
+    page = tmp_path / "page.txt"
+    page.write_bytes(b"\xff")
+
+    registry = DirectoryRegistry(str(tmp_path))
+    assert registry.errors["page.txt"].startswith("UnicodeDecodeError")
+
+    page.write_text("v1")
+    os.utime(page, ns=(0, 0))
+    assert registry.refresh() == ["page.txt"]
+    page.write_bytes(b"\xff")
+    os.utime(page, ns=(1, 1))
+    assert registry.refresh() == []
+    assert registry.get("page.txt").fill({}) == "v1"
+
+
+def test_directory_registry_background_reload_survives_errors(tmp_path, monkeypatch):
+    template = tmp_path / "page.txt"
+    template.write_text("v1")
+    registry = DirectoryRegistry(str(tmp_path), poll_interval=0.01)
+    list_files = registry._list_files
+    failures = [RuntimeError("unavailable")]
+
+    def flaky_list_files():
+        if failures:
+            raise failures.pop()
+        return list_files()
+
+    monkeypatch.setattr(registry, "_list_files", flaky_list_files)
+    registry.start()
+    try:
+        template.write_text("version 2")
+        deadline = time.monotonic() + 5
+        while registry.get("page.txt").fill({}) != "version 2":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert registry.poll_error is None
+    finally:
+        registry.stop()
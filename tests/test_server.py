@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from yatla.server import RenderServer
+
+
+def test_render_request_by_name():
+    server = RenderServer()
+    server.cache.register("greeting", "Hello {{ name }}")
+
+    response = server.handle(
+        '{"id": 7, "template": "greeting", "values": {"name": "Ann"}}'
+    )
+
+    assert json.loads(response) == {"id": 7, "output": "Hello Ann"}
+
+
+def test_file_templates_are_reloaded_when_changed(tmp_path):
+    path = tmp_path / "template.txt"
+    path.write_text("{{ n }}")
+    server = RenderServer()
+    request = json.dumps({"template": str(path), "values": {"n": 1}})
+
+    assert json.loads(server.handle(request))["output"] == "1"
+    path.write_text("n = {{ n }}")
+    assert json.loads(server.handle(request))["output"] == "n = 1"
+
+
+def test_serve_stream_reports_errors():
+    server = RenderServer()
+    server.cache.register("sum", "{{ a + b }}")
+    requests = io.StringIO(
+        '{"id": 1, "template": "sum", "values": {"a": 1, "b": 2}}\n'
+        "\n"
+        '{"id": 2, "template": "sum", "values": {"a": 1}}\n'
+    )
+    responses = io.StringIO()
+
+    server.serve_stream(requests, responses)
+
+    lines = [json.loads(l) for l in responses.getvalue().splitlines()]
+    assert lines[0] == {"id": 1, "output": "3"}
+    assert lines[1] == {"id": 2, "error": "KeyError: 'b'"}
+
+
+def test_unix_socket_does_not_replace_other_files(tmp_path):
+    path = tmp_path / "server.sock"
+    path.write_text("data")
+
+    with pytest.raises(ValueError, match="is not a socket"):
+        RenderServer().serve_unix_socket(str(path))
+    assert path.read_text() == "data"
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+from yatla.parser import parse
+from yatla.streaming import StreamingRender, render_stream
+
+TEMPLATE = (
+    "Hello {{ name }}, this is the {{ factor }} times table:\n"
+    "{{ foreach num in num_list }}\n"
+    "{{ factor }} * {{ num }} = {{ factor * num }}\n"
+    "{{ endforeach }}\n"
+    "Largest: {{ Maximum(factor * 10, 50) }}\n"
+)  # fmt: skip
+
+
+def test_stream_matches_fill():
+    values = {"name": "Ada", "factor": 7, "num_list": [1, 2, 3]}
+    output = io.StringIO()
+
+    slots = render_stream(TEMPLATE, values, output)
+
+    template = parse(TEMPLATE)
+    assert output.getvalue() == template.fill(values)
+    assert slots == template.slots
+
+
+def test_lines_are_rendered_before_the_rest_is_parsed():
+    render = iter(StreamingRender("{{ a }}\n{{ b }\n", {"a": 1, "b": 2}))
+
+    assert next(render) == "1"
+    with pytest.raises(ValueError):
+        list(render)
+
+
+def test_stream_deep_expression():
+    source = "Total: {{ " + " + ".join(["a"] * 10_000) + " }}"
+    assert "".join(StreamingRender(source, {"a": 1})) == "Total: 10000"
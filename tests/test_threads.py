@@ -0,0 +1,52 @@
+import dataclasses
+import threading
+
+import pytest
+
+from yatla.parser import parse
+
+TEMPLATE = (
+    "Hello {{ name }}, this is the {{ factor }} times table:\n"
+    "{{ foreach num in num_list }}\n"
+    "{{ factor }} * {{ num }} = {{ factor * num }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+
+THREADS = 8
+ROUNDS = 200
+
+
+def test_template_is_immutable():
+    template = parse(TEMPLATE)
+
+    with pytest.raises(AttributeError):
+        template.source = ""
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        template._ast.lines[0].content[0].value = ""
+
+    template.slots.clear()
+    assert len(template.slots) == 3
+
+
+def test_concurrent_parse_and_fill():
+    shared = parse(TEMPLATE)
+    barrier = threading.Barrier(THREADS)
+    failures = []
+
+    def work(thread: int):
+        values = {"name": str(thread), "factor": thread, "num_list": [1, 2, 3]}
+        expected = parse(TEMPLATE)._ast.eval(values)
+        barrier.wait()
+        for _ in range(ROUNDS):
+            # Parsing is reentrant, and a shared template can be filled from every thread.
+            own = parse(TEMPLATE)
+            if shared.fill(values) != expected or own.fill(values) != expected:
+                failures.append(thread)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
@@ -1,5 +1,5 @@
 from yatla.lexer import Scanner
-from yatla.parser import parse_from_scanner
+from yatla.parser import parse, parse_from_scanner
 from yatla.types import SlotType
 from yatla.validation import Constraint
 
@@ -10,3 +10,25 @@ def test_multiple_slots_of_same_name():
     parameters = parsed_template.get_parameters()
 
     assert parameters == [Constraint("factor", SlotType.Num)]
+
+
+def test_iterated_slot_narrowed_by_element_use():
+    template = (
+        "{{ foreach x in rows }}\n"
+        "{{ x }}\n"
+        "{{ endforeach }}\n"
+        "{{ foreach x in rows }}\n"
+        "{{ x * 2 }}\n"
+        "{{ endforeach }}"
+    )  # fmt: skip
+    parameters = parse_from_scanner(Scanner(template)).get_parameters()
+
+    assert parameters == [Constraint("rows", SlotType.NumArray)]
+
+
+def test_slot_used_as_value_and_array_is_untyped():
+    template = "{{ rows }}\n{{ foreach x in rows }}\n{{ x }}\n{{ endforeach }}"
+    parameters = parse_from_scanner(Scanner(template)).get_parameters()
+
+    assert parameters == [Constraint("rows", None)]
+    assert parse(template).fill({"rows": [1, 2]}) == "[1, 2]\n1\n2"
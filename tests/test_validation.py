@@ -0,0 +1,63 @@
+import pytest
+
+import yatla
+from yatla.types import ArrayType
+from yatla.validation import SlotValidationError, SlotValidator
+
+template_source = (
+    "Hello {{ name }}, {{ factor * 2 }}\n"
+    "{{ foreach num in num_list }}\n"
+    "{{ num * factor }}\n"
+    "{{ endforeach }}"
+)  # fmt: skip
+
+
+def test_valid_values_pass():
+    template = yatla.parse(template_source)
+    template.validate({"name": "Ann", "factor": 2.5, "num_list": [1, 2]})
+
+
+def test_all_errors_are_reported():
+    template = yatla.parse(template_source)
+
+    with pytest.raises(SlotValidationError) as error:
+        template.validate({"factor": "2", "num_list": [1, "x"]})
+
+    assert error.value.errors == [
+        "Slot 'factor' must be a number, got '2'.",
+        "Missing value for slot 'name'.",
+        "Element 1 of slot 'num_list' must be a number, got 'x'.",
+    ]
+
+
+def test_booleans_are_not_numbers():
+    template = yatla.parse("{{ factor * 2 }}")
+
+    with pytest.raises(SlotValidationError):
+        template.validate({"factor": True})
+
+
+def test_validate_batch_returns_invalid_records():
+    template = yatla.parse(template_source)
+    records = [
+        {"name": "Ann", "factor": 1, "num_list": []},
+        {"name": "Bob", "factor": None, "num_list": []},
+        {"name": 3, "factor": 1, "num_list": (1.5,)},
+    ]
+
+    assert template.validator.validate_batch(records) == {
+        1: ["Slot 'factor' must be a number, got None."]
+    }
+
+
+def test_untyped_slots_accept_any_value():
+    validator = SlotValidator([("rows", None), ("table", ArrayType(None))])
+
+    assert validator.errors({"rows": [1, "x"], "table": [[1], "x"]}) == []
+    assert validator.errors({"rows": 1, "table": "x"}) == [
+        "Slot 'table' must be a list, got 'x'."
+    ]
+    assert validator.errors({}) == [
+        "Missing value for slot 'rows'.",
+        "Missing value for slot 'table'.",
+    ]
@@ -1,3 +1,7 @@
-from yatla.parser import parse
+def __getattr__(name: str):
+    # Importing the parser pulls in the lexer, the AST and dataclasses, so it is deferred until first use.
+    if name == "parse":
+        from yatla.parser import parse
 
-parse = parse
+        return parse
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+from collections import ChainMap
 from dataclasses import dataclass
 from enum import Enum
 import operator
 from typing import Any, Callable, Optional
 
-from yatla.types import SlotType
-from yatla.validation import Constraint, compute_parameters
-import yatla.builtins
+from yatla.types import SlotType, array_of
+from yatla.validation import Constraint, compute_parameters, shared_subtype
+from yatla.builtins import BuiltinFunction
+from yatla.formatting import FormatSpec
 
 
 class BuiltinFunctionType(Enum):
@@ -17,11 +19,6 @@ class BuiltinFunctionType(Enum):
     MULTIPLY = 3
     DIVIDE = 4
 
-    ROUNDUP = 5
-    ROUNDDOWN = 6
-    MINIMUM = 7
-    MAXIMUM = 8
-
 
 FUNCTION_LOOKUP: dict[str, Callable[[Any, Any], Any]] = {
     BuiltinFunctionType.ADD: operator.__add__,
@@ -30,39 +27,27 @@ FUNCTION_LOOKUP: dict[str, Callable[[Any, Any], Any]] = {
     BuiltinFunctionType.DIVIDE: operator.__truediv__,
 }
 
-BUILTIN_FUNCTION_LOOKUP = {
-    BuiltinFunctionType.ROUNDUP: (
-        yatla.builtins.RoundUp,
-        2,
-        [SlotType.Num, SlotType.Num],
-    ),
-    BuiltinFunctionType.ROUNDDOWN: (
-        yatla.builtins.RoundDown,
-        2,
-        [SlotType.Num, SlotType.Num],
-    ),
-    BuiltinFunctionType.MINIMUM: (
-        yatla.builtins.Minimum,
-        2,
-        [SlotType.Num, SlotType.Num],
-    ),
-    BuiltinFunctionType.MAXIMUM: (
-        yatla.builtins.Maximum,
-        2,
-        [SlotType.Num, SlotType.Num],
-    ),
-}
-
 
 class ASTNode:
+    """
+    Base class of the nodes of a parsed template. Nodes are immutable so that a template can be shared between
+    threads. Sequences of child nodes may be given as lists and are stored as tuples.
+    """
+
     def eval(self, context):
         raise NotImplementedError
 
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
         raise NotImplementedError
 
+    def get_references(self) -> set[str]:
+        """
+        Returns the names of the slots this node reads when evaluated.
+        """
+        raise NotImplementedError
+
 
-@dataclass
+@dataclass(frozen=True)
 class IndentiferASTNode(ASTNode):
     value: str
 
@@ -75,8 +60,11 @@ class IndentiferASTNode(ASTNode):
         else:
             return [Constraint(self.value, type)]
 
+    def get_references(self) -> set[str]:
+        return {self.value}
 
-@dataclass
+
+@dataclass(frozen=True)
 class NumberASTNode(ASTNode):
     value: int | float
 
@@ -86,44 +74,120 @@ class NumberASTNode(ASTNode):
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
         return [None]
 
-
-@dataclass
+    def get_references(self) -> set[str]:
+        return set()
+
+
+def expression_parameters(
+    root: ASTNode, type: SlotType = None
+) -> list[Optional[Constraint]]:
+    """
+    Returns the constraints on the slots used in an expression. The expression is traversed without recursion, so
+    that very long or deeply nested expressions can be handled.
+    """
+    parameters = []
+    stack = [(root, type)]
+    while stack:
+        node, required_type = stack.pop()
+        if isinstance(node, ExpressionASTNode):
+            stack.append((node.value, required_type))
+        elif isinstance(node, BinOpASTNode):
+            _check_result_type(SlotType.Num, required_type, "An arithmetic operation")
+            stack.extend([(node.rhs, SlotType.Num), (node.lhs, SlotType.Num)])
+        elif isinstance(node, FunctionCallASTNode):
+            function = node.function
+            _check_result_type(function.return_type, required_type, function.name)
+            stack.extend(reversed(list(zip(node.arguments, function.argument_types))))
+        else:
+            parameters.extend(node.get_parameters(required_type))
+    return parameters
+
+
+def _check_result_type(result: SlotType, required: Optional[SlotType], producer: str):
+    if required not in (None, SlotType.Any, result):
+        raise ValueError(
+            f"{producer} returns {result.name} where {required.name} is required."
+        )
+
+
+def expression_references(root: ASTNode) -> set[str]:
+    """
+    Returns the names of the slots used in an expression, without recursion.
+    """
+    references = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ExpressionASTNode):
+            stack.append(node.value)
+        elif isinstance(node, BinOpASTNode):
+            stack.extend([node.rhs, node.lhs])
+        elif isinstance(node, FunctionCallASTNode):
+            stack.extend(node.arguments)
+        else:
+            references.update(node.get_references())
+    return references
+
+
+def is_pure(root: ASTNode) -> bool:
+    """
+    Returns whether evaluating a node only calls pure functions, so that it always renders the same output for the
+    same values.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ExpressionASTNode, ExpressionBlockASTNode)):
+            stack.append(node.value)
+        elif isinstance(node, BinOpASTNode):
+            stack.extend([node.rhs, node.lhs])
+        elif isinstance(node, FunctionCallASTNode):
+            if not node.function.pure:
+                return False
+            stack.extend(node.arguments)
+        elif isinstance(node, LineASTNode):
+            stack.extend(node.content)
+        elif isinstance(node, ForEachBlockASTNode):
+            stack.extend(node.body)
+    return True
+
+
+@dataclass(frozen=True)
 class ExpressionASTNode(ASTNode):
     value: NumberASTNode | IndentiferASTNode | BinOpASTNode
 
     def eval(self, context):
-        return self.value.eval(context)
+        node = self.value
+        while isinstance(node, ExpressionASTNode):
+            node = node.value
+        return node.eval(context)
 
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
-        return self.value.get_parameters(type)
+        return expression_parameters(self, type)
 
+    def get_references(self) -> set[str]:
+        return expression_references(self)
 
-@dataclass
+
+@dataclass(frozen=True)
 class FunctionCallASTNode(ASTNode):
-    function_identifier: IndentiferASTNode
-    arguments: list[ExpressionASTNode]
+    function: BuiltinFunction
+    arguments: tuple[ExpressionASTNode, ...]
 
-    def eval(self, context):
-        evaluated_args = [a.eval(context) for a in self.arguments]
-        function, arity, _ = BUILTIN_FUNCTION_LOOKUP[self.function_identifier]
-        if arity != len(evaluated_args):
-            message = f"Invalid number of arguments. {self.function_identifier} requires {arity} arguments. {len(evaluated_args)} were provided."
-            raise ValueError(message)
+    def __post_init__(self):
+        object.__setattr__(self, "arguments", tuple(self.arguments))
 
-        return function(*evaluated_args)
+    def eval(self, context):
+        return self.function.function(*[a.eval(context) for a in self.arguments])
 
     def get_parameters(self, type: SlotType = None) -> list[Constraint]:
-        all_params = []
+        return [p for p in expression_parameters(self, type) if p is not None]
 
-        _, _, expected_types = BUILTIN_FUNCTION_LOOKUP[self.function_identifier]
-
-        for node, type in zip(self.arguments, expected_types):
-            if val := node.get_parameters(type):
-                all_params.extend(val)
-        return [p for p in all_params if p is not None]
+    def get_references(self) -> set[str]:
+        return expression_references(self)
 
 
-@dataclass
+@dataclass(frozen=True)
 class BinOpASTNode(ASTNode):
     lhs: BinOpASTNode | NumberASTNode
     rhs: BinOpASTNode | NumberASTNode
@@ -134,29 +198,32 @@ class BinOpASTNode(ASTNode):
         return function(self.lhs.eval(context), self.rhs.eval(context))
 
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
-        all_parameters = []
-        arguments = [self.lhs, self.rhs]
-        parameter_types = [SlotType.Num, SlotType.Num]
+        return expression_parameters(self, type)
 
-        for parameter, required_type in zip(arguments, parameter_types):
-            if val := parameter.get_parameters(required_type):
-                all_parameters.extend(val)
+    def get_references(self) -> set[str]:
+        return expression_references(self)
 
-        return all_parameters
 
-
-@dataclass
+@dataclass(frozen=True)
 class ExpressionBlockASTNode(ASTNode):
     value: IndentiferASTNode | BinOpASTNode
+    format_spec: Optional[FormatSpec] = None
 
     def eval(self, context):
-        return str(self.value.eval(context))
+        if self.format_spec is None:
+            return str(self.value.eval(context))
+        return format(self.value.eval(context), self.format_spec.spec)
 
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
+        if self.format_spec is not None and self.format_spec.numeric:
+            return expression_parameters(self.value, SlotType.Num)
         return self.value.get_parameters()
 
+    def get_references(self) -> set[str]:
+        return self.value.get_references()
+
 
-@dataclass
+@dataclass(frozen=True)
 class TextASTNode(ASTNode):
     value: str
 
@@ -166,10 +233,16 @@ class TextASTNode(ASTNode):
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
         return [None]
 
+    def get_references(self) -> set[str]:
+        return set()
 
-@dataclass
+
+@dataclass(frozen=True)
 class LineASTNode(ASTNode):
-    content: list[TextASTNode | ExpressionBlockASTNode]
+    content: tuple[TextASTNode | ExpressionBlockASTNode, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "content", tuple(self.content))
 
     def eval(self, context):
         return "".join(node.eval(context) for node in self.content)
@@ -181,19 +254,28 @@ class LineASTNode(ASTNode):
                 all_params.extend(val)
         return [p for p in all_params if p is not None]
 
+    def get_references(self) -> set[str]:
+        return set().union(*(node.get_references() for node in self.content))
+
 
-@dataclass
+@dataclass(frozen=True)
 class ForEachBlockASTNode(ASTNode):
     iterand: str
     iterator: str
-    body: list[LineASTNode]
+    body: tuple[LineASTNode, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "body", tuple(self.body))
 
     def eval(self, context):
         iterator = context[self.iterator]
+        # The iterand is bound in a frame in front of the enclosing context, rather than in a copy of it.
+        frame = {}
+        scope = ChainMap(frame, context)
         output = []
         for value in iterator:
-            context_with_iterator = context | {self.iterand: value}
-            output.append("\n".join(l.eval(context_with_iterator) for l in self.body))
+            frame[self.iterand] = value
+            output.append("\n".join(l.eval(scope) for l in self.body))
         return "\n".join(output)
 
     def get_parameters(self, type: SlotType = None) -> list[Optional[Constraint]]:
@@ -202,32 +284,28 @@ class ForEachBlockASTNode(ASTNode):
             if val := node.get_parameters():
                 body_params.extend(val)
 
-        iterand_types = [p.type for p in body_params if p.identifier == self.iterand]
+        iterand_types = {p.type for p in body_params if p.identifier == self.iterand}
 
-        iterand_type = None
-        if len(iterand_types) == 1:
-            iterand_type = iterand_types[0]
-        elif set(iterand_types) == set([SlotType.Any, SlotType.Num]):
-            iterand_type = SlotType.Num
-        else:
+        iterand_type = shared_subtype(self.iterand, iterand_types)
+        if iterand_type is None:
             raise ValueError("Using array of mixed type")
 
-        iterator_type = None
-        if iterand_type == SlotType.Num:
-            iterator_type = SlotType.NumArray
-        elif iterand_type == SlotType.Any:
-            iterator_type = SlotType.AnyArray
-        else:
-            raise ValueError("Created array with invalid type of iterator")
-
+        # An iterand which is itself iterated over makes the iterator an array of arrays.
         body_params = [p for p in body_params if p.identifier != self.iterand]
-        body_params.append(Constraint(self.iterator, iterator_type))
+        body_params.append(Constraint(self.iterator, array_of(iterand_type)))
         return body_params
 
+    def get_references(self) -> set[str]:
+        body_references = set().union(*(l.get_references() for l in self.body))
+        return (body_references - {self.iterand}) | {self.iterator}
 
-@dataclass
+
+@dataclass(frozen=True)
 class DocumentASTNode(ASTNode):
-    lines: list[LineASTNode]
+    lines: tuple[LineASTNode, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "lines", tuple(self.lines))
 
     def eval(self, context):
         return "\n".join(l.eval(context) for l in self.lines)
@@ -238,3 +316,6 @@ class DocumentASTNode(ASTNode):
             params.extend(line.get_parameters())
         validated_params = compute_parameters(params)
         return validated_params
+
+    def get_references(self) -> set[str]:
+        return set().union(*(l.get_references() for l in self.lines))
@@ -0,0 +1,171 @@
+"""
+Loading records from data files and rendering a template once per record. Used by the command line interface.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import IO, Any, Callable, Iterable, Iterator, Mapping, Optional
+
+from yatla.ast_nodes import DocumentASTNode
+from yatla.template import Slot, Template
+from yatla.types import SlotType
+
+RECORD_FORMATS = ["json", "ndjson", "csv"]
+
+_FORMAT_EXTENSIONS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+_int_pattern = re.compile(r"-?\d+")
+_float_pattern = re.compile(r"-?\d+\.\d+")
+
+
+def coerce_value(value: str) -> int | float | str | list:
+    """
+    Converts a value given as text into a number, a list or a string. Lists are written as comma separated values
+    in square brackets, for example [1,2,3].
+    """
+    if _int_pattern.fullmatch(value):
+        return int(value)
+    if _float_pattern.fullmatch(value):
+        return float(value)
+    if value[:1] == "[" and value[-1:] == "]":
+        lst = value[1:-1].split(",")
+        if all(_int_pattern.fullmatch(v) for v in lst):
+            return [int(v) for v in lst]
+        if all(_int_pattern.fullmatch(v) or _float_pattern.fullmatch(v) for v in lst):
+            return [float(v) for v in lst]
+        return lst
+    return value
+
+
+def coerce_slot_value(value: str, type: Optional[SlotType]) -> int | float | str | list:
+    """
+    Converts a value given as text for a slot of the given type. Only values for Num and NumArray slots are
+    converted into numbers, so that text such as 007 in a String slot is kept as it is. Values for other array slots
+    are split into lists of strings.
+    """
+    if type in (SlotType.Num, SlotType.NumArray):
+        return coerce_value(value)
+    if type in (SlotType.StringArray, SlotType.AnyArray):
+        if value[:1] == "[" and value[-1:] == "]":
+            return value[1:-1].split(",")
+    return value
+
+
+def _coercions(slots: Optional[Iterable[Slot]]) -> Callable[[str, str], Any]:
+    if slots is None:
+        return lambda key, value: coerce_value(value)
+    types = {slot.name: slot.type for slot in slots}
+    return lambda key, value: coerce_slot_value(value, types.get(key))
+
+
+def parse_argument_values(
+    arguments: Iterable[str], slots: Optional[Iterable[Slot]] = None
+) -> dict:
+    """
+    Converts key:value pairs into a mapping of slot names to coerced values. If slots are given, values are coerced
+    by the type of their slot with coerce_slot_value.
+    """
+    coerce = _coercions(slots)
+    values = {}
+    for argument in arguments:
+        key, separator, value = argument.partition(":")
+        if not separator:
+            raise ValueError(f"Expected key:value but got: {argument}.")
+        values[key] = coerce(key, value)
+    return values
+
+
+def guess_format(filename: str) -> str:
+    """
+    Infers the record format of a file from its extension.
+    """
+    _, extension = os.path.splitext(filename)
+    if extension.lower() not in _FORMAT_EXTENSIONS:
+        raise ValueError(
+            f"Cannot infer the format of {filename}. Expected one of {RECORD_FORMATS}."
+        )
+    return _FORMAT_EXTENSIONS[extension.lower()]
+
+
+def iter_records(
+    stream: IO[str], format: str, slots: Optional[Iterable[Slot]] = None
+) -> Iterator[dict]:
+    """
+    Lazily reads records from a text stream. JSON files may hold a single object or a list of objects, NDJSON
+    streams hold one object per line and CSV files hold one record per row with slot names in the header. If slots
+    are given, CSV cells are coerced by the type of their slot with coerce_slot_value.
+    """
+    if format == "json":
+        data = json.load(stream)
+        yield from [data] if isinstance(data, dict) else data
+    elif format == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif format == "csv":
+        coerce = _coercions(slots)
+        for row in csv.DictReader(stream):
+            yield {k: coerce(k, v) for k, v in row.items()}
+    else:
+        raise ValueError(f"Unknown record format: {format}.")
+
+
+_worker_template: Template = None
+_worker_defaults: Mapping = None
+
+
+def _initialise_worker(
+    document: DocumentASTNode,
+    source: str,
+    slots: list[Slot],
+    escape: Optional[str],
+    defaults: Mapping,
+):
+    # The parsed document is sent rather than the source, as includes are resolved by the parent's loader.
+    global _worker_template, _worker_defaults
+    _worker_template = Template(document, source, slots, escape)
+    _worker_defaults = defaults
+
+
+def _render_in_worker(record: Mapping) -> str:
+    return _worker_template.fill({**_worker_defaults, **record})
+
+
+def render_records(
+    template: Template,
+    records: Iterable[Mapping],
+    defaults: Mapping = None,
+    workers: int = 1,
+    chunk_size: int = 64,
+) -> Iterator[str]:
+    """
+    Renders template once per record, yielding the outputs in the order of the records. Values in defaults are used
+    for slots a record does not provide. With more than one worker, records are rendered in a process pool where
+    each worker compiles the template once.
+    """
+    defaults = dict(defaults or {})
+    if workers <= 1:
+        for record in records:
+            yield template.fill({**defaults, **record})
+        return
+
+    import multiprocessing
+
+    initargs = (
+        template._ast,
+        template.source,
+        template.slots,
+        template.escape,
+        defaults,
+    )
+    with multiprocessing.Pool(
+        workers, initializer=_initialise_worker, initargs=initargs
+    ) as pool:
+        yield from pool.imap(_render_in_worker, records, chunksize=chunk_size)
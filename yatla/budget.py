@@ -0,0 +1,220 @@
+"""
+Limits on the work done by a single render, for templates filled with untrusted values, and static estimates of a
+template's output for admission control.
+
+A budget is enforced while rendering: the output size is checked as each loop element and line is rendered, loop
+iterations are counted as they happen, and the clock is read every DEADLINE_CHECK_INTERVAL iterations.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import ChainMap
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+from yatla.ast_nodes import (
+    DocumentASTNode,
+    ExpressionBlockASTNode,
+    ForEachBlockASTNode,
+    LineASTNode,
+    TextASTNode,
+)
+
+# Number of loop iterations between checks of the deadline.
+DEADLINE_CHECK_INTERVAL = 256
+
+
+@dataclass(frozen=True)
+class RenderBudget:
+    """
+    Limits for a single render. max_output is a number of characters and timeout a number of seconds measured from
+    the start of the render. A limit of None is not enforced.
+    """
+
+    max_output: Optional[int] = None
+    max_iterations: Optional[int] = None
+    timeout: Optional[float] = None
+
+
+@dataclass
+class RenderStats:
+    """
+    The progress of a render: characters of output, loop iterations started and seconds elapsed.
+    """
+
+    output: int
+    iterations: int
+    elapsed: float
+
+
+class BudgetExceededError(ValueError):
+    """
+    Raised when a render exceeds its budget. limit names the limit which was exceeded, one of "output",
+    "iterations" or "timeout", and stats holds the progress made before the render was stopped.
+    """
+
+    def __init__(self, limit: str, stats: RenderStats):
+        super().__init__(
+            f"Render exceeded its {limit} budget after {stats.output} characters, {stats.iterations} iterations "
+            f"and {stats.elapsed:.3f} seconds."
+        )
+        self.limit = limit
+        self.stats = stats
+
+
+class RenderMeter:
+    """
+    Tracks a single render against a budget.
+    """
+
+    def __init__(self, budget: RenderBudget):
+        self.output = 0
+        self.iterations = 0
+        self.start = time.monotonic()
+
+        self._max_output = math.inf if budget.max_output is None else budget.max_output
+        self._max_iterations = (
+            math.inf if budget.max_iterations is None else budget.max_iterations
+        )
+        self._deadline = (
+            math.inf if budget.timeout is None else self.start + budget.timeout
+        )
+        self._next_deadline_check = 0
+
+    @property
+    def stats(self) -> RenderStats:
+        return RenderStats(self.output, self.iterations, time.monotonic() - self.start)
+
+    def set_output(self, output: int):
+        """
+        Records the number of characters rendered so far.
+        """
+        self.output = output
+        if output > self._max_output:
+            raise BudgetExceededError("output", self.stats)
+
+    def iterate(self):
+        """
+        Records the start of a loop iteration.
+        """
+        self.iterations += 1
+        if self.iterations > self._max_iterations:
+            raise BudgetExceededError("iterations", self.stats)
+        if self.iterations >= self._next_deadline_check:
+            self._next_deadline_check = self.iterations + DEADLINE_CHECK_INTERVAL
+            if time.monotonic() > self._deadline:
+                raise BudgetExceededError("timeout", self.stats)
+
+
+@dataclass(frozen=True)
+class LoopCost:
+    """
+    The static cost of one iteration of a foreach loop: characters of text and newlines, the number of expressions
+    rendered, and the loops nested in its body.
+    """
+
+    iterand: str
+    iterator: str
+    static_size: int
+    expressions: int
+    loops: tuple[LoopCost, ...]
+
+    def _scopes(self, values: Mapping) -> tuple[int, list[tuple[Mapping, int]]]:
+        # Returns the number of elements, and the scopes nested loops are estimated in paired with the number of
+        # elements each stands for. Loops nested over the iterand are estimated once per element, other nested loops
+        # cost the same for every element.
+        elements = values.get(self.iterator)
+        count = _length(elements)
+        if not count:
+            return 0, []
+        if any(loop.iterator == self.iterand for loop in self.loops):
+            return count, [(ChainMap({self.iterand: e}, values), 1) for e in elements]
+        return count, [(values, count)]
+
+    def iterations(self, values: Mapping) -> int:
+        count, scopes = self._scopes(values)
+        return count + sum(
+            n * loop.iterations(scope) for scope, n in scopes for loop in self.loops
+        )
+
+    def estimate(self, values: Mapping, expression_size: int) -> int:
+        count, scopes = self._scopes(values)
+        per_iteration = self.static_size + self.expressions * expression_size
+        nested = sum(
+            n * loop.estimate(scope, expression_size)
+            for scope, n in scopes
+            for loop in self.loops
+        )
+        # Elements are separated by newlines.
+        return count * per_iteration + nested + max(count - 1, 0)
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    """
+    The static cost of a template, computed when it is parsed: characters of text and newlines rendered outside
+    loops, the number of expressions rendered outside loops, and the cost of each loop.
+    """
+
+    static_size: int
+    expressions: int
+    loops: tuple[LoopCost, ...]
+
+    def iterations(self, values: Mapping) -> int:
+        """
+        Returns the number of loop iterations a render with values performs.
+        """
+        return sum(loop.iterations(values) for loop in self.loops)
+
+    def estimate(self, values: Mapping, expression_size: int = 8) -> int:
+        """
+        Estimates the number of characters a render with values outputs, assuming each expression renders
+        expression_size characters.
+        """
+        return (
+            self.static_size
+            + self.expressions * expression_size
+            + sum(loop.estimate(values, expression_size) for loop in self.loops)
+        )
+
+
+def _length(value) -> int:
+    # Loops over values without a length, such as iterators, cannot be estimated and count as empty.
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
+
+def _line_costs(lines: tuple[LineASTNode, ...]) -> tuple[int, int, list[LoopCost]]:
+    static_size = max(len(lines) - 1, 0)
+    expressions = 0
+    loops = []
+    for line in lines:
+        for node in line.content:
+            if isinstance(node, TextASTNode):
+                static_size += len(node.value)
+            elif isinstance(node, ExpressionBlockASTNode):
+                expressions += 1
+            elif isinstance(node, ForEachBlockASTNode):
+                body_size, body_expressions, body_loops = _line_costs(node.body)
+                loops.append(
+                    LoopCost(
+                        node.iterand,
+                        node.iterator,
+                        body_size,
+                        body_expressions,
+                        tuple(body_loops),
+                    )
+                )
+    return static_size, expressions, loops
+
+
+def estimate_cost(document: DocumentASTNode) -> CostEstimate:
+    """
+    Computes the static cost of a parsed document.
+    """
+    static_size, expressions, loops = _line_costs(document.lines)
+    return CostEstimate(static_size, expressions, tuple(loops))
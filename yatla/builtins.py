@@ -1,7 +1,12 @@
 """
-Built-in functions accessible from a template.
+Built-in functions accessible from a template, and the registry of functions templates can call.
 """
 
+from dataclasses import dataclass, field
+from typing import Callable
+
+from yatla.types import SlotType
+
 
 def RoundUp(val, base):
     """
@@ -31,3 +36,63 @@ def Maximum(val1, val2):
     Returns the greatest of val1 and val2.
     """
     return max(val1, val2)
+
+
+@dataclass(frozen=True)
+class BuiltinFunction:
+    """
+    A function which can be called from a template. Calls are checked against the argument types when a template is
+    parsed, and the return type is used to infer the types of the slots around a call. Pure functions always return
+    the same value for the same arguments and have no side effects, so calls to them may be evaluated once and
+    shared, or evaluated when the template is compiled if their arguments are constants.
+    """
+
+    name: str
+    function: Callable = field(repr=False)
+    argument_types: tuple[SlotType, ...]
+    return_type: SlotType = SlotType.Num
+    pure: bool = True
+
+    @property
+    def arity(self) -> int:
+        return len(self.argument_types)
+
+
+FUNCTIONS: dict[str, BuiltinFunction] = {}
+
+_keywords = ["foreach", "endforeach", "in", "include"]
+
+
+def register_function(
+    name: str,
+    function: Callable,
+    argument_types: list[SlotType],
+    return_type: SlotType = SlotType.Num,
+    pure: bool = True,
+    replace: bool = False,
+) -> BuiltinFunction:
+    """
+    Makes function callable from templates as name. Templates parsed before a function is registered or replaced
+    keep the function they were parsed with. Processes which parse templates, such as batch render workers, must
+    register the same functions.
+    """
+    if not name.isidentifier() or name in _keywords:
+        raise ValueError(f"Invalid function name: {name}.")
+    if name in FUNCTIONS and not replace:
+        raise ValueError(f"Function {name} is already registered.")
+    builtin = BuiltinFunction(name, function, tuple(argument_types), return_type, pure)
+    FUNCTIONS[name] = builtin
+    return builtin
+
+
+def get_function(name: str) -> BuiltinFunction:
+    """
+    Returns the function registered as name.
+    """
+    if name not in FUNCTIONS:
+        raise ValueError(f"Unknown function: {name}.")
+    return FUNCTIONS[name]
+
+
+for _function in [RoundUp, RoundDown, Minimum, Maximum]:
+    register_function(_function.__name__, _function, [SlotType.Num, SlotType.Num])
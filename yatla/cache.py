@@ -0,0 +1,149 @@
+"""
+Fragment caching for templates which are filled repeatedly with similar values.
+
+Each line of a template (including a line holding a foreach block) is cached separately, keyed only on the
+values of the slots that line references. Re-filling a template after changing one slot re-renders only the lines
+which use that slot.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+from yatla import metrics
+from yatla.ast_nodes import is_pure
+from yatla.template import Template
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _freeze(value: Any):
+    """
+    Converts a slot value to a hashable cache key. The type is part of the key as 1, 1.0 and True compare equal but
+    render differently, and floats are keyed on their repr as 0.0 and -0.0 do too.
+    """
+    if isinstance(value, float):
+        return (type(value), repr(value))
+    if isinstance(value, (str, int)):
+        return (type(value), value)
+    if isinstance(value, (list, tuple)):
+        return (list, tuple(_freeze(v) for v in value))
+    # Other iterables may be single-use, so they are never used as keys.
+    raise _Uncacheable
+
+
+@dataclass
+class FragmentCacheStats:
+    """
+    Reuse metrics for a fragment cache.
+    """
+
+    hits: int
+    misses: int
+    uncacheable: int
+    entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses + self.uncacheable
+        return self.hits / lookups if lookups else 0.0
+
+
+class FragmentCache:
+    """
+    Fills a template while reusing the rendered output of lines whose referenced slots have not changed since a
+    previous fill. At most max_entries renderings are kept for each line.
+    """
+
+    def __init__(self, template: Template, max_entries: int = 128):
+        self.template = template
+        self.max_entries = max_entries
+        # Lines calling impure functions are rendered on every fill.
+        self._fragments = [
+            (
+                line,
+                (
+                    tuple(sorted(line.node.get_references()))
+                    if is_pure(line.node)
+                    else None
+                ),
+            )
+            for line in template._plan.lines
+        ]
+        self._entries: list[dict] = [{} for _ in self._fragments]
+
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def fill(
+        self,
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+    ) -> str:
+        """
+        Fill the slots in the template using the provided values. The output is identical to Template.fill.
+        """
+        plan = self.template._plan
+        # The shared computations are only needed to render a line, so fills served from the cache skip them.
+        env = None
+        measured = metrics.ENABLED
+        if measured:
+            before = (self.hits, self.misses, self.uncacheable)
+        output = []
+        for (line, references), entries in zip(self._fragments, self._entries):
+            key = None
+            if references is not None:
+                try:
+                    key = tuple(_freeze(values[name]) for name in references)
+                except _Uncacheable:
+                    pass
+            if key is not None and (rendered := entries.get(key)) is not None:
+                self.hits += 1
+                output.append(rendered)
+                continue
+
+            if env is None:
+                env = plan.environment(values)
+            rendered = line.render(env)
+            if key is None:
+                self.uncacheable += 1
+            else:
+                self.misses += 1
+                if len(entries) >= self.max_entries:
+                    del entries[next(iter(entries))]
+                entries[key] = rendered
+            output.append(rendered)
+
+        if measured:
+            for result, count, previous in zip(
+                ("hit", "miss", "uncacheable"),
+                (self.hits, self.misses, self.uncacheable),
+                before,
+            ):
+                if count > previous:
+                    metrics.CACHE_REQUESTS.inc(
+                        "fragment", result, amount=count - previous
+                    )
+        return "\n".join(output)
+
+    def clear(self):
+        """
+        Removes all cached fragments and resets the metrics.
+        """
+        for entries in self._entries:
+            entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    @property
+    def stats(self) -> FragmentCacheStats:
+        return FragmentCacheStats(
+            self.hits,
+            self.misses,
+            self.uncacheable,
+            sum(len(entries) for entries in self._entries),
+        )
@@ -0,0 +1,674 @@
+"""
+Compiles a parsed template into a render plan, which is what Template.fill executes. The AST's own eval methods are
+kept as the reference implementation; a render plan always produces identical output.
+
+Rendering works on an environment, a dict holding the slot values and the iterands of the loops being rendered.
+A render plan is not modified after compilation and every render creates its own environment, so a plan may be
+rendered from several threads at once.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from operator import itemgetter
+from itertools import repeat
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+from yatla import metrics
+from yatla.ast_nodes import (
+    FUNCTION_LOOKUP,
+    ASTNode,
+    BinOpASTNode,
+    DocumentASTNode,
+    ExpressionASTNode,
+    ExpressionBlockASTNode,
+    ForEachBlockASTNode,
+    FunctionCallASTNode,
+    IndentiferASTNode,
+    LineASTNode,
+    NumberASTNode,
+    TextASTNode,
+    is_pure,
+)
+from yatla.budget import RenderBudget, RenderMeter
+from yatla.escaping import Escaper
+from yatla.formatting import FormatSpec
+
+# A compiled line part is either static text or a function rendering text from the environment.
+Part = str | Callable[[dict], str]
+
+# Renders the single iterand dependent part of a trivial loop body for every element at once.
+BulkRenderer = Callable[[dict, list], Iterable[str]]
+
+# A computation stores the value of a subexpression in a register of the environment. Registers are ints, so they
+# never collide with slot names.
+Computation = tuple[int, Callable[[dict], Any]]
+
+_missing = object()
+
+# The environment key of the meter tracking a budgeted render. Registers are never negative.
+METER = -1
+
+
+def _run_computations(computations: tuple[Computation, ...], env: dict):
+    for register, function in computations:
+        env[register] = function(env)
+
+
+def _render_parts(parts: list[Part], env: dict) -> str:
+    return "".join([p if p.__class__ is str else p(env) for p in parts])
+
+
+class CompiledLine:
+    """
+    A line of a render plan.
+    """
+
+    def __init__(self, node: LineASTNode, parts: list[Part]):
+        self.node = node
+        self.parts = tuple(parts)
+
+    def render(self, env: dict) -> str:
+        return _render_parts(self.parts, env)
+
+
+class CompiledForEach:
+    """
+    A foreach block of a render plan. Each part of the body is classified as depending on the iterand or as
+    invariant. Invariant parts, including static text, are rendered once when the loop starts and merged with their
+    neighbours, so only the iterand dependent parts are rendered per element.
+
+    Shared subexpressions which do not depend on the iterand are computed once when the loop starts (entry), and
+    those which do are computed once per element (iteration).
+
+    Trivial bodies, a single line with one iterand dependent part, are rendered by a bulk renderer which maps over
+    the elements instead of rendering the line once per element.
+    """
+
+    def __init__(
+        self,
+        node: ForEachBlockASTNode,
+        body: list[list[tuple[bool, Part]]],
+        entry: list[Computation],
+        iteration: list[Computation],
+        bulk: Optional[BulkRenderer] = None,
+    ):
+        self.node = node
+        self.iterand = node.iterand
+        self.iterator = node.iterator
+        self.body = tuple(tuple(line) for line in body)
+        self.entry = tuple(entry)
+        self.iteration = tuple(iteration)
+        self.bulk = bulk
+
+    def _hoist_invariants(self, env: dict) -> list[list[Part]]:
+        lines = []
+        for line in self.body:
+            parts = []
+            for invariant, part in line:
+                if invariant and part.__class__ is not str:
+                    part = part(env)
+                if part.__class__ is str and parts and parts[-1].__class__ is str:
+                    parts[-1] += part
+                else:
+                    parts.append(part)
+            lines.append(parts)
+        return lines
+
+    def _render_bulk(self, env: dict) -> str:
+        values = env[self.iterator]
+        if not isinstance(values, (list, tuple)):
+            values = list(values)
+        if not values:
+            return ""
+
+        _run_computations(self.entry, env)
+        (parts,) = self._hoist_invariants(env)
+        prefix = parts[0] if parts[0].__class__ is str else ""
+        suffix = parts[-1] if parts[-1].__class__ is str else ""
+
+        if metrics.ENABLED:
+            metrics.FOREACH_ITERATIONS.inc(amount=len(values))
+        rendered = self.bulk(env, values)
+        if prefix or suffix:
+            return prefix + (suffix + "\n" + prefix).join(rendered) + suffix
+        return "\n".join(rendered)
+
+    def _render_metered(self, env: dict, meter: RenderMeter) -> str:
+        """
+        Renders the loop element by element, recording each iteration and the output so far with meter. The meter
+        is set to the exact output size after each element, which corrects the counts of nested loops.
+        """
+        iterand = self.iterand
+        iteration = self.iteration
+        shadowed = env.get(iterand, _missing)
+
+        start = meter.output
+        lines = None
+        output = []
+        for value in env[self.iterator]:
+            meter.iterate()
+            if lines is None:
+                _run_computations(self.entry, env)
+                lines = self._hoist_invariants(env)
+            env[iterand] = value
+            if iteration:
+                _run_computations(iteration, env)
+            before = meter.output
+            element = "\n".join([_render_parts(p, env) for p in lines])
+            meter.set_output(before + len(element) + (1 if output else 0))
+            output.append(element)
+
+        if shadowed is _missing:
+            env.pop(iterand, None)
+        else:
+            env[iterand] = shadowed
+        meter.output = start
+        if metrics.ENABLED:
+            metrics.FOREACH_ITERATIONS.inc(amount=len(output))
+        return "\n".join(output)
+
+    def __call__(self, env: dict) -> str:
+        meter = env.get(METER)
+        if meter is not None:
+            return self._render_metered(env, meter)
+        if self.bulk is not None:
+            return self._render_bulk(env)
+
+        iterand = self.iterand
+        iteration = self.iteration
+        shadowed = env.get(iterand, _missing)
+
+        lines = None
+        output = []
+        for value in env[self.iterator]:
+            if lines is None:
+                # Invariant parts are only rendered for non-empty loops, as in the reference implementation.
+                _run_computations(self.entry, env)
+                lines = self._hoist_invariants(env)
+                if len(lines) == 1:
+                    line = lines[0]
+            env[iterand] = value
+            if iteration:
+                _run_computations(iteration, env)
+            if len(lines) == 1:
+                output.append(_render_parts(line, env))
+            else:
+                output.append("\n".join([_render_parts(p, env) for p in lines]))
+
+        if shadowed is _missing:
+            env.pop(iterand, None)
+        else:
+            env[iterand] = shadowed
+        if metrics.ENABLED:
+            metrics.FOREACH_ITERATIONS.inc(amount=len(output))
+        return "\n".join(output)
+
+
+class CompiledDocument:
+    """
+    The render plan of a whole template.
+    """
+
+    def __init__(
+        self,
+        node: DocumentASTNode,
+        lines: list[CompiledLine],
+        computations: list[Computation],
+    ):
+        self.node = node
+        self.lines = tuple(lines)
+        self.computations = tuple(computations)
+
+    def environment(self, values: Mapping) -> dict:
+        """
+        Creates the environment used to render lines of this plan, computing the subexpressions shared at the
+        document level. Each render needs its own environment.
+        """
+        env = dict(values)
+        _run_computations(self.computations, env)
+        return env
+
+    def render(self, values: Mapping, budget: Optional[RenderBudget] = None) -> str:
+        """
+        Renders the plan with values, raising a BudgetExceededError if the render exceeds budget.
+        """
+        env = self.environment(values)
+        if budget is None:
+            return "\n".join([line.render(env) for line in self.lines])
+
+        meter = env[METER] = RenderMeter(budget)
+        output = []
+        for line in self.lines:
+            before = meter.output
+            rendered = line.render(env)
+            meter.set_output(before + len(rendered) + (1 if output else 0))
+            output.append(rendered)
+        return "\n".join(output)
+
+
+class _Scope:
+    """
+    The document, or a foreach loop, during compilation.
+    """
+
+    def __init__(self, parent: Optional[_Scope], node: Optional[ForEachBlockASTNode]):
+        self.parent = parent
+        self.node = node
+        self.iterand = node.iterand if node else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.names = (*parent.names, self.iterand) if parent else ()
+        self.entry: list[Computation] = []
+        self.iteration: list[Computation] = []
+
+    def chain(self) -> list[_Scope]:
+        """
+        Returns this scope and its enclosing scopes, innermost first.
+        """
+        scopes = []
+        scope = self
+        while scope is not None:
+            scopes.append(scope)
+            scope = scope.parent
+        return scopes
+
+    def binding_depth(self, name: str) -> int:
+        """
+        Returns the depth of the innermost scope binding name. Slots are bound by the document, at depth 0.
+        """
+        for scope in self.chain():
+            if scope.iterand == name:
+                return scope.depth
+        return 0
+
+    def ancestor(self, depth: int) -> _Scope:
+        scope = self
+        while scope.depth > depth:
+            scope = scope.parent
+        return scope
+
+    def site(self, owner: _Scope) -> list[Computation]:
+        """
+        Returns where to compute a subexpression owned by owner which is used in this scope. Subexpressions owned by
+        an enclosing scope are hoisted to the start of this loop. They are not hoisted further, out of enclosing
+        loops, as this loop may have no elements for some of their elements, and nothing is computed for a loop
+        which has no elements.
+        """
+        if owner is self:
+            return self.iteration if self.parent else self.entry
+        return self.entry
+
+    def dominating_sites(self) -> list[list[Computation]]:
+        """
+        Returns the sites which are always computed before this scope renders.
+        """
+        sites = []
+        for scope in self.chain():
+            sites.extend([scope.entry, scope.iteration])
+        return sites
+
+
+def _unwrap(node: ASTNode) -> ASTNode:
+    while isinstance(node, ExpressionASTNode):
+        node = node.value
+    return node
+
+
+_LOAD, _CONSTANT, _APPLY = "load", "constant", "apply"
+
+# Expressions nested more deeply than this are compiled to a postfix program rather than nested closures, which
+# would exceed the recursion limit when called.
+MAX_CLOSURE_NESTING = 64
+
+
+def _compile_postfix(root: ASTNode) -> Callable[[dict], Any]:
+    """
+    Compiles an expression into a postfix program evaluated with an explicit stack.
+    """
+    program = []
+    stack = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node = _unwrap(node)
+        if isinstance(node, IndentiferASTNode):
+            program.append((_LOAD, node.value))
+        elif isinstance(node, NumberASTNode):
+            program.append((_CONSTANT, node.value))
+        elif children_done:
+            if isinstance(node, BinOpASTNode):
+                program.append((_APPLY, (FUNCTION_LOOKUP[node.operator_type], 2)))
+            else:
+                program.append((_APPLY, (node.function.function, len(node.arguments))))
+        else:
+            children = (
+                [node.lhs, node.rhs]
+                if isinstance(node, BinOpASTNode)
+                else node.arguments
+            )
+            stack.append((node, True))
+            stack.extend([(c, False) for c in reversed(children)])
+
+    def evaluate(env):
+        values = []
+        for instruction, argument in program:
+            if instruction is _LOAD:
+                values.append(env[argument])
+            elif instruction is _CONSTANT:
+                values.append(argument)
+            else:
+                function, arity = argument
+                # values[-arity:] would take the whole stack for a call without arguments.
+                start = len(values) - arity
+                arguments = values[start:]
+                del values[start:]
+                values.append(function(*arguments))
+        return values[0]
+
+    return evaluate
+
+
+_NUMBER_TYPES = (int, float)
+
+
+def _escaping(render: Callable[[Any], str], escape: Escaper) -> Callable[[Any], str]:
+    """
+    Returns a function rendering a value with render and escaping the text, unless the value is a number. Values are
+    not checked against the types of their slots when a template is filled, so this is decided for every value.
+    """
+
+    def render_escaped(value) -> str:
+        text = render(value)
+        # Subclasses of int and float may render any text, so only the exact types are trusted.
+        return text if type(value) in _NUMBER_TYPES else escape(text)
+
+    return render_escaped
+
+
+def _bulk_formatter(
+    format_spec: Optional[FormatSpec], escape: Optional[Escaper] = None
+) -> Callable[[Iterable], Iterable[str]]:
+    """
+    Returns a function rendering many values at once, with format_spec if one is given, and escaping the rendered
+    text of values other than numbers with escape if one is given.
+    """
+    if format_spec is None:
+        render = lambda values: map(str, values)
+    else:
+        spec = format_spec.spec
+        render = lambda values: map(format, values, repeat(spec))
+    if escape is None:
+        return render
+    if format_spec is None:
+        render_escaped = _escaping(str, escape)
+    else:
+        render_escaped = _escaping(lambda value: format(value, spec), escape)
+    return lambda values: map(render_escaped, values)
+
+
+class _Compiler:
+    """
+    Compiles a document, sharing structurally identical pure subexpressions. Each distinct subexpression is
+    computed once per scope that owns it and is kept in a register when it is used more than once, or when it can be
+    hoisted out of a loop. Pure subexpressions of constants are evaluated during compilation.
+    """
+
+    def __init__(self, escape: Optional[Escaper] = None):
+        self._escape = escape
+        self._keys: dict[tuple, int] = {}
+        self._descriptions: dict[tuple, dict[int, tuple[int, int, int, bool]]] = {}
+        self._occurrences: Counter = Counter()
+        self._registers: dict[tuple[_Scope, int], list[tuple[list, int]]] = {}
+        self._register_count = 0
+        self._constants: dict[int, Any] = {}
+
+    def _describe(self, root: ASTNode, scope: _Scope) -> tuple[int, int, int, bool]:
+        """
+        Returns a structural key, the depth of the owning scope, the height of an expression and whether it is a
+        pure function of constants. Keys are hash-consed to ints, so nodes with equal keys are structurally identical
+        and evaluate to the same value in the same scope. The owning scope is the innermost scope binding one of the
+        expression's references. Calls to impure functions get a key of their own and are owned by the scope they
+        appear in, so they are neither shared nor hoisted.
+
+        Each compound subexpression is counted against its owning scope the first time it is described. Expressions
+        are traversed without recursion, so that very long expressions can be compiled.
+        """
+        descriptions = self._descriptions.setdefault(scope.names, {})
+        keys = self._keys
+        stack = [_unwrap(root)]
+        while stack:
+            node = stack[-1]
+            if id(node) in descriptions:
+                stack.pop()
+                continue
+
+            node_type = node.__class__
+            if node_type is IndentiferASTNode:
+                key = ("id", node.value)
+                depth = scope.binding_depth(node.value)
+                height = 0
+                constant = False
+            elif node_type is NumberASTNode:
+                # repr tells apart 1 and 1.0, and 0.0 and -0.0, which compare equal.
+                key = ("num", repr(node.value))
+                depth = height = 0
+                constant = True
+            elif node_type is BinOpASTNode or node_type is FunctionCallASTNode:
+                if node_type is BinOpASTNode:
+                    children = [_unwrap(node.lhs), _unwrap(node.rhs)]
+                    key = ["op", node.operator_type]
+                else:
+                    children = [_unwrap(a) for a in node.arguments]
+                    key = ["call", node.function]
+
+                pending = [c for c in children if id(c) not in descriptions]
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                depth = height = 0
+                constant = True
+                for child in children:
+                    child_key, child_depth, child_height, child_constant = descriptions[
+                        id(child)
+                    ]
+                    key.append(child_key)
+                    depth = max(depth, child_depth)
+                    height = max(height, child_height)
+                    constant = constant and child_constant
+                if node_type is FunctionCallASTNode and not node.function.pure:
+                    key.append(id(node))
+                    depth = scope.depth
+                    constant = False
+                key = keys.setdefault(tuple(key), len(keys))
+                height += 1
+                self._occurrences[id(scope.ancestor(depth).node), key] += 1
+            else:
+                raise ValueError(f"Cannot compile expression: {node}.")
+
+            stack.pop()
+            if node_type is not BinOpASTNode and node_type is not FunctionCallASTNode:
+                key = keys.setdefault(key, len(keys))
+            descriptions[id(node)] = (key, depth, height, constant)
+
+        return descriptions[id(_unwrap(root))]
+
+    def _count_lines(self, lines: list[LineASTNode], scope: _Scope):
+        for line in lines:
+            for node in line.content:
+                if isinstance(node, ExpressionBlockASTNode):
+                    self._describe(node.value, scope)
+                elif isinstance(node, ForEachBlockASTNode):
+                    self._count_lines(node.body, _Scope(scope, node))
+
+    def compile_expression(self, node: ASTNode, scope: _Scope) -> Callable[[dict], Any]:
+        node = _unwrap(node)
+        if isinstance(node, IndentiferASTNode):
+            return itemgetter(node.value)
+        if isinstance(node, NumberASTNode):
+            value = node.value
+            return lambda env: value
+
+        key, depth, height, constant = self._describe(node, scope)
+        if constant:
+            value = self._constants.get(key, _missing)
+            if value is _missing:
+                try:
+                    value = self._constants[key] = _compile_postfix(node)({})
+                except Exception:
+                    # Errors such as division by zero are raised when the expression is rendered, as in the
+                    # reference implementation.
+                    pass
+            if value is not _missing:
+                return lambda env: value
+        if height > MAX_CLOSURE_NESTING:
+            return _compile_postfix(node)
+
+        owner = scope.ancestor(depth)
+        dominating_sites = scope.dominating_sites()
+        for site, register in self._registers.get((owner, key), []):
+            if any(site is s for s in dominating_sites):
+                return itemgetter(register)
+
+        function = self._compile_operation(node, scope)
+        if self._occurrences[id(owner.node), key] < 2 and owner is scope:
+            return function
+
+        register = self._register_count
+        self._register_count += 1
+        site = scope.site(owner)
+        site.append((register, function))
+        self._registers.setdefault((owner, key), []).append((site, register))
+        return itemgetter(register)
+
+    def _compile_operation(
+        self, node: BinOpASTNode | FunctionCallASTNode, scope: _Scope
+    ) -> Callable[[dict], Any]:
+        if isinstance(node, BinOpASTNode):
+            function = FUNCTION_LOOKUP[node.operator_type]
+            lhs = self.compile_expression(node.lhs, scope)
+            rhs = self.compile_expression(node.rhs, scope)
+            return lambda env: function(lhs(env), rhs(env))
+
+        function = node.function.function
+        arguments = [self.compile_expression(a, scope) for a in node.arguments]
+        return lambda env: function(*[a(env) for a in arguments])
+
+    def _is_escaped(self, node: ExpressionBlockASTNode) -> bool:
+        """
+        Returns whether the output of an expression block may need escaping. Specs which only apply to numbers fail
+        for any other value, so their output is never escaped.
+        """
+        return self._escape is not None and not (
+            node.format_spec is not None and node.format_spec.numeric
+        )
+
+    def compile_part(self, node: ASTNode, scope: _Scope) -> Part:
+        if isinstance(node, TextASTNode):
+            return node.value
+        if isinstance(node, ExpressionBlockASTNode):
+            expression = self.compile_expression(node.value, scope)
+            if self._is_escaped(node):
+                if node.format_spec is not None:
+                    spec = node.format_spec.spec
+                    render = _escaping(lambda value: format(value, spec), self._escape)
+                else:
+                    render = _escaping(str, self._escape)
+                return lambda env: render(expression(env))
+            if node.format_spec is not None:
+                spec = node.format_spec.spec
+                return lambda env: format(expression(env), spec)
+            return lambda env: str(expression(env))
+        if isinstance(node, ForEachBlockASTNode):
+            return self.compile_foreach(node, scope)
+        raise ValueError(f"Cannot compile line content: {node}.")
+
+    def compile_foreach(
+        self, node: ForEachBlockASTNode, parent: _Scope
+    ) -> CompiledForEach:
+        scope = _Scope(parent, node)
+        body = [
+            [
+                (
+                    # Nested loops are rendered for every element, as their iterator may be single-use.
+                    node.iterand not in n.get_references()
+                    and is_pure(n)
+                    and not isinstance(n, ForEachBlockASTNode),
+                    self.compile_part(n, scope),
+                )
+                for n in line.content
+            ]
+            for line in node.body
+        ]
+        bulk = None
+        if len(node.body) == 1 and not scope.iteration:
+            bulk = self._compile_bulk(node, scope)
+        return CompiledForEach(node, body, scope.entry, scope.iteration, bulk)
+
+    def _compile_bulk(
+        self, node: ForEachBlockASTNode, scope: _Scope
+    ) -> Optional[BulkRenderer]:
+        """
+        Recognises loop bodies whose only iterand dependent part is the iterand itself, or a single arithmetic
+        operation between the iterand and an invariant expression. Parts calling impure functions are never
+        invariant.
+        """
+        dependent = [
+            n
+            for n in node.body[0].content
+            if node.iterand in n.get_references() or not is_pure(n)
+        ]
+        if len(dependent) != 1 or not isinstance(dependent[0], ExpressionBlockASTNode):
+            return None
+
+        expression = _unwrap(dependent[0].value)
+        iterand = IndentiferASTNode(node.iterand)
+        render = _bulk_formatter(
+            dependent[0].format_spec,
+            self._escape if self._is_escaped(dependent[0]) else None,
+        )
+
+        if expression == iterand:
+            return lambda env, values: render(values)
+
+        if not isinstance(expression, BinOpASTNode):
+            return None
+        function = FUNCTION_LOOKUP[expression.operator_type]
+        lhs, rhs = _unwrap(expression.lhs), _unwrap(expression.rhs)
+
+        if lhs == iterand and node.iterand not in rhs.get_references() and is_pure(rhs):
+            operand = self.compile_expression(rhs, scope)
+            return lambda env, values: render(
+                map(function, values, repeat(operand(env)))
+            )
+        if rhs == iterand and node.iterand not in lhs.get_references() and is_pure(lhs):
+            operand = self.compile_expression(lhs, scope)
+            return lambda env, values: render(
+                map(function, repeat(operand(env)), values)
+            )
+        return None
+
+    def compile_document(self, node: DocumentASTNode) -> CompiledDocument:
+        scope = _Scope(None, None)
+        self._count_lines(node.lines, scope)
+        lines = [
+            CompiledLine(line, [self.compile_part(n, scope) for n in line.content])
+            for line in node.lines
+        ]
+        return CompiledDocument(node, lines, scope.entry)
+
+
+def compile_expression(node: ASTNode) -> Callable[[dict], Any]:
+    """
+    Compiles an expression node into a function which evaluates it in an environment.
+    """
+    return _Compiler().compile_expression(node, _Scope(None, None))
+
+
+def compile_document(
+    node: DocumentASTNode, escape: Optional[Escaper] = None
+) -> CompiledDocument:
+    """
+    Compiles a parsed document into a render plan. If escape is given, the output of expressions is passed through
+    it, except for values which are numbers.
+    """
+    return _Compiler(escape).compile_document(node)
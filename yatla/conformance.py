@@ -0,0 +1,333 @@
+"""
+A differential conformance harness for the render engines.
+
+Template.fill executes a compiled render plan, with constant folding, hoisting and bulk loops, and other entry
+points add streaming, metering and caching. Each must render exactly what the reference implementation, the AST's
+own eval methods, renders. The harness generates random valid templates and values matching their inferred slots,
+renders each through every engine in ENGINES and compares the results with the first engine's. When the first
+engine raises an error, every engine must raise one, but not necessarily of the same type: hoisting evaluates loop
+invariant expressions before the loop, so a template with two errors may meet either first.
+
+Every case is generated from its own seed, so a failure is reproduced with generate_case(seed), and minimise shrinks
+a failing case to a smaller one which still fails::
+
+    for mismatch in run_conformance(iterations=1000):
+        source, values = minimise(mismatch.source, mismatch.values)
+"""
+
+import io
+import random
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional
+
+from yatla.budget import RenderBudget
+from yatla.builtins import FUNCTIONS
+from yatla.cache import FragmentCache
+from yatla.delta import DeltaRenderer, apply_edits
+from yatla.lexer import Scanner
+from yatla.parallel import ParallelRenderer
+from yatla.parser import Parser, TokenSource, parse
+from yatla.streaming import StreamingRender
+from yatla.template import Slot, Template
+from yatla.types import ArrayType, SlotType, element_type
+
+Engine = Callable[[Template, Mapping], str]
+
+
+def _chunked(template: Template, values: Mapping) -> str:
+    # Parses the source from a stream read two characters at a time.
+    scanner = Scanner(io.StringIO(template.source), chunk_size=2)
+    document = Parser(TokenSource(scanner)).parse_document()
+    return Template(document, template.source, template.slots).fill(values)
+
+
+def _cached(template: Template, values: Mapping) -> str:
+    # The second fill is served from the cache.
+    cache = FragmentCache(template)
+    cache.fill(values)
+    return cache.fill(values)
+
+
+def _delta(template: Template, values: Mapping) -> str:
+    # Filled first with every list reversed, so lines using lists are updated and the others are kept.
+    renderer = DeltaRenderer(template)
+    previous = renderer.fill(
+        {k: v[::-1] if isinstance(v, list) else v for k, v in values.items()}
+    )
+    return apply_edits(previous, renderer.update(values))
+
+
+def _parallel(template: Template, values: Mapping) -> str:
+    # Every top level loop is split, into chunks of two elements.
+    with ParallelRenderer(template, workers=2, threshold=1, chunk_size=2) as renderer:
+        return renderer.fill(values)
+
+
+# Render engines by name. Each renders a template with values, and must match the reference engine.
+ENGINES: dict[str, Engine] = {
+    "reference": lambda template, values: template._ast.eval(values),
+    "compiled": lambda template, values: template.fill(values),
+    "budgeted": lambda template, values: template.fill(values, RenderBudget()),
+    "streaming": lambda template, values: "".join(
+        StreamingRender(template.source, values)
+    ),
+    "chunked": _chunked,
+    "cached": _cached,
+    "parallel": _parallel,
+    "delta": _delta,
+}
+
+_SLOT_NAMES = ("a", "b", "total", "name")
+_ITERATOR_NAMES = ("items", "rows")
+_ITERAND_NAMES = ("x", "y", "z")
+_TEXT = ("", " ", "Total", "a b", "-", "=", "é", "  \t", ",", "(", ")", "+", "x")
+_NUMBERS = ("0", "1", "2", "3", "10", "0.5", "2.5", "0.1", "100.0")
+_FORMAT_SPECS = ("", ".2f", ",", ">6", "<3", "^5", "08.3f", "+", "e", ".3", ",.1f")
+_OPERATORS = ("+", "-", "*", "/")
+
+_STRING_VALUES = ("", "a", "hello world", "é", "<&>", " x ", "1")
+_NUMBER_VALUES = (0, 1, 2, -3, 7, 2.5, 0.1, -0.5, 1e20, 1e-7, 3.0, 10**20)
+
+
+@dataclass(frozen=True)
+class RenderError:
+    """
+    The outcome of a render which raised an error, in place of its output.
+    """
+
+    type: str
+
+
+@dataclass
+class Mismatch:
+    """
+    A case whose outputs differ between engines. outputs holds each engine's output, or the error it raised.
+    """
+
+    seed: Optional[int]
+    source: str
+    values: dict
+    outputs: dict[str, str | RenderError]
+
+
+def _expression(rng: random.Random, names: list[str], depth: int = 0) -> str:
+    choice = rng.random()
+    if depth >= 3 or choice < 0.45:
+        return rng.choice(names) if rng.random() < 0.7 else rng.choice(_NUMBERS)
+    if choice < 0.8:
+        operator = rng.choice(_OPERATORS)
+        lhs = _expression(rng, names, depth + 1)
+        rhs = _expression(rng, names, depth + 1)
+        return f"{lhs} {operator} {rhs}"
+    if choice < 0.9:
+        return f"( {_expression(rng, names, depth + 1)} )"
+    function = rng.choice(sorted(FUNCTIONS))
+    arguments = [
+        _expression(rng, names, depth + 1) for _ in FUNCTIONS[function].argument_types
+    ]
+    return f"{function}({', '.join(arguments)})"
+
+
+def _line(rng: random.Random, names: list[str]) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 4)):
+        if rng.random() < 0.5:
+            parts.append(rng.choice(_TEXT))
+        else:
+            spec = ""
+            if rng.random() < 0.2:
+                spec = f" : {rng.choice(_FORMAT_SPECS)}"
+            parts.append(f"{{{{ {_expression(rng, names)}{spec} }}}}")
+    return "".join(parts)
+
+
+def _lines(rng: random.Random, names: list[str], depth: int = 0) -> list[str]:
+    lines = []
+    for _ in range(rng.randint(1, 4)):
+        if depth < 2 and rng.random() < 0.3:
+            iterand = rng.choice(_ITERAND_NAMES)
+            iterators = [*_ITERATOR_NAMES, *(n for n in names if n in _ITERAND_NAMES)]
+            iterator = rng.choice(iterators)
+            lines.append(f"{{{{ foreach {iterand} in {iterator} }}}}")
+            lines.extend(_lines(rng, [*names, iterand], depth + 1))
+            lines.append("{{ endforeach }}")
+        else:
+            lines.append(_line(rng, names))
+    return lines
+
+
+def generate_source(rng: random.Random) -> str:
+    """
+    Generates a random template source. The source may not be valid, for example when the variable of a loop is used
+    with conflicting types.
+    """
+    source = "\n".join(_lines(rng, list(_SLOT_NAMES)))
+    if rng.random() < 0.2:
+        source += "\n"
+    return source
+
+
+def generate_value(rng: random.Random, type: SlotType | ArrayType):
+    """
+    Generates a random value of a slot type.
+    """
+    element = element_type(type)
+    if element is not None:
+        return [generate_value(rng, element) for _ in range(rng.randint(0, 3))]
+    if type == SlotType.String:
+        return rng.choice(_STRING_VALUES)
+    if type == SlotType.Num:
+        return rng.choice(_NUMBER_VALUES)
+    return rng.choice(rng.choice((_STRING_VALUES, _NUMBER_VALUES)))
+
+
+def generate_values(rng: random.Random, slots: list[Slot]) -> dict:
+    """
+    Generates random values for a template's slots.
+    """
+    return {slot.name: generate_value(rng, slot.type) for slot in slots}
+
+
+def generate_case(seed: int) -> tuple[str, dict]:
+    """
+    Generates a valid template source and values for its slots from seed.
+    """
+    rng = random.Random(seed)
+    while True:
+        source = generate_source(rng)
+        try:
+            template = parse(source)
+        except ValueError:
+            continue
+        return source, generate_values(rng, template.slots)
+
+
+def _outcome(engine: Engine, template: Template, values: Mapping) -> str | RenderError:
+    try:
+        return engine(template, values)
+    except Exception as e:
+        return RenderError(type(e).__name__)
+
+
+def compare(
+    source: str, values: Mapping, engines: Optional[Mapping[str, Engine]] = None
+) -> Optional[dict[str, str | RenderError]]:
+    """
+    Renders source with values through every engine, returning the outcomes if any differs from the first engine's
+    and None otherwise.
+    """
+    template = parse(source)
+    outputs = {
+        name: _outcome(engine, template, values)
+        for name, engine in (ENGINES if engines is None else engines).items()
+    }
+    expected, *actual = outputs.values()
+    if isinstance(expected, RenderError):
+        differs = not all(isinstance(output, RenderError) for output in actual)
+    else:
+        differs = any(output != expected for output in actual)
+    return outputs if differs else None
+
+
+def run_conformance(
+    iterations: int = 1000,
+    seed: int = 0,
+    engines: Optional[Mapping[str, Engine]] = None,
+) -> list[Mismatch]:
+    """
+    Compares the engines on the cases generated from the seeds seed to seed + iterations, returning the cases
+    whose outputs differ.
+    """
+    mismatches = []
+    for case_seed in range(seed, seed + iterations):
+        source, values = generate_case(case_seed)
+        if outputs := compare(source, values, engines):
+            mismatches.append(Mismatch(case_seed, source, values, outputs))
+    return mismatches
+
+
+def _fails(source: str, values: Mapping, engines) -> bool:
+    try:
+        return compare(source, values, engines) is not None
+    except ValueError:
+        # The candidate is not a valid template.
+        return False
+
+
+def _smaller_values(value):
+    # Candidate replacements for a value, simplest first.
+    if isinstance(value, list):
+        for index in range(len(value)):
+            yield value[:index] + value[index + 1 :]
+        for index, element in enumerate(value):
+            for smaller in _smaller_values(element):
+                yield value[:index] + [smaller] + value[index + 1 :]
+    elif isinstance(value, str):
+        if value:
+            yield ""
+            yield value[1:]
+    elif value not in (0, 1):
+        yield 0
+        yield 1
+
+
+def _smaller_lines(line: str):
+    # Candidate replacements for a line: removing one block or text part at a time.
+    parts = []
+    position = 0
+    while position < len(line):
+        start = line.find("{{", position)
+        if start == -1:
+            parts.append(line[position:])
+            break
+        if start > position:
+            parts.append(line[position:start])
+        end = line.find("}}", start)
+        end = len(line) if end == -1 else end + 2
+        parts.append(line[start:end])
+        position = end
+    for index in range(len(parts)):
+        yield "".join(parts[:index] + parts[index + 1 :])
+
+
+def minimise(
+    source: str, values: Mapping, engines: Optional[Mapping[str, Engine]] = None
+) -> tuple[str, dict]:
+    """
+    Shrinks a case whose outputs differ between engines, returning the smallest source and values found which
+    still differ. Lines, then parts of lines, then values are removed or simplified one at a time, as long as the
+    template stays valid and the outputs keep differing.
+    """
+    values = dict(values)
+    if not _fails(source, values, engines):
+        raise ValueError("The case does not fail, so it cannot be minimised.")
+
+    progress = True
+    while progress:
+        progress = False
+
+        lines = source.split("\n")
+        for index in range(len(lines) - 1, -1, -1):
+            candidate = "\n".join(lines[:index] + lines[index + 1 :])
+            if len(lines) > 1 and _fails(candidate, values, engines):
+                source, lines, progress = candidate, candidate.split("\n"), True
+
+        for index in range(len(lines)):
+            for smaller in _smaller_lines(lines[index]):
+                candidate = "\n".join(lines[:index] + [smaller] + lines[index + 1 :])
+                if _fails(candidate, values, engines):
+                    source, lines, progress = candidate, candidate.split("\n"), True
+                    break
+
+        slots = {slot.name for slot in parse(source).slots}
+        for name in list(values):
+            if name not in slots:
+                del values[name]
+                continue
+            for smaller in _smaller_values(values[name]):
+                if _fails(source, values | {name: smaller}, engines):
+                    values[name] = smaller
+                    progress = True
+                    break
+
+    return source, values
@@ -0,0 +1,362 @@
+"""
+Delta rendering for documents which are kept up to date as their values change, such as documents pushed to clients
+on every change of a slot.
+
+A DeltaRenderer fills a template once, and then turns each change of values into a list of line edits against the
+previous output. Each slot's value is compared with its previous value, by identity first, and only the lines of the
+template (including lines holding a foreach block) which reference a changed slot are rendered again. A loop whose
+list changed renders only the elements between the unchanged elements at the start and at the end of the list. Only
+the output lines which differ are included in the edits, so the cost of an update follows the size of the change
+rather than the size of the document::
+
+    renderer = DeltaRenderer(template)
+    output = renderer.fill(values)
+    ...
+    edits = renderer.update(new_values)
+    output = apply_edits(output, edits)
+"""
+
+import operator
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
+
+from yatla.ast_nodes import (
+    DocumentASTNode,
+    ForEachBlockASTNode,
+    LineASTNode,
+    is_pure,
+)
+from yatla.compiler import CompiledDocument, compile_document
+from yatla.escaping import get_escaper
+from yatla.template import Template
+
+
+@dataclass(frozen=True)
+class LineEdit:
+    """
+    Replaces the lines start to end, excluding end, of the previous output with lines. Lines are counted from 0.
+    An edit with start equal to end inserts lines before line start.
+    """
+
+    start: int
+    end: int
+    lines: tuple[str, ...]
+
+
+def apply_edits(output: str, edits: Iterable[LineEdit]) -> str:
+    """
+    Applies edits, in the order returned by DeltaRenderer.update, to the previous output.
+    """
+    lines = output.split("\n")
+    # Every edit refers to the previous output, so they are applied from the last to the first. An insertion may
+    # start where the next edit starts, and must be applied after it.
+    for edit in reversed(list(edits)):
+        lines[edit.start : edit.end] = edit.lines
+    return "\n".join(lines)
+
+
+# Sequences are compared in blocks, so that runs of equal lines or values are compared by list comparisons rather than
+# one by one.
+_BLOCK = 256
+
+_SCALARS = {str, int, float, bool}
+
+# Values which compare equal always render the same if all of them have one of these types.
+_EXACT_TYPES = {str, int, bool}
+
+# The value of a slot missing from the values.
+_MISSING = object()
+
+# The environment key the elements of a loop which are rendered again are bound to. It contains a space, so it is
+# never a slot name.
+_ELEMENTS = " elements"
+
+
+def _same_values(old: Sequence, new: Sequence) -> bool:
+    """
+    Returns whether two sequences of values render the same. Equal values render differently when their types
+    differ, such as 1 and 1.0, or when they are zeros of different signs, so those are compared by their repr.
+    """
+    if old != new:
+        return False
+    try:
+        # Only strings compare equal to strings, and joining is the fastest check that every value is one.
+        "".join(old)
+        return True
+    except TypeError:
+        pass
+    types = set(map(type, old))
+    if len(types) == 1 and types == set(map(type, new)):
+        if types <= _EXACT_TYPES or (float in types and 0.0 not in old):
+            return True
+    return list(map(repr, old)) == list(map(repr, new))
+
+
+def _common_prefix(
+    old: Sequence, new: Sequence, same: Callable[[Sequence, Sequence], bool]
+) -> int:
+    # The number of leading items of old and new which are the same.
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit:
+        end = min(start + _BLOCK, limit)
+        if not same(old[start:end], new[start:end]):
+            while same(old[start : start + 1], new[start : start + 1]):
+                start += 1
+            return start
+        start = end
+    return limit
+
+
+def _common_suffix(
+    old: Sequence,
+    new: Sequence,
+    limit: int,
+    same: Callable[[Sequence, Sequence], bool],
+) -> int:
+    # The number of trailing items of old and new which are the same, up to limit.
+    count = 0
+    while count < limit:
+        size = min(_BLOCK, limit - count)
+        old_end, new_end = len(old) - count, len(new) - count
+        if not same(old[old_end - size : old_end], new[new_end - size : new_end]):
+            while same(old[old_end - 1 : old_end], new[new_end - 1 : new_end]):
+                count += 1
+                old_end -= 1
+                new_end -= 1
+            return count
+        count += size
+    return limit
+
+
+def _changed_prefix(old: Any, new: Any) -> Optional[int]:
+    """
+    Returns None if a slot's value renders the same as its previous value, and otherwise the number of leading
+    elements of a list which are unchanged, or 0. Strings, numbers, lists and tuples are compared by identity, then
+    by value. Lists are assumed not to be changed in place, as a list which is the same object as the previous value
+    is not compared again. Values of other types, such as single-use iterators, are always changed.
+    """
+    kind = type(new)
+    if type(old) is not kind:
+        return 0
+    if kind in _SCALARS:
+        return None if old is new or _same_values((old,), (new,)) else 0
+    if kind is list or kind is tuple:
+        if old is new:
+            return None
+        prefix = _common_prefix(old, new, _same_values)
+        return None if prefix == len(old) == len(new) else prefix
+    return 0
+
+
+def _diff_lines(offset: int, old: list[str], new: list[str]) -> LineEdit:
+    # Returns the edit replacing the lines of old which differ from new, between their common prefix and suffix.
+    prefix = _common_prefix(old, new, operator.eq)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix, operator.eq)
+    return LineEdit(
+        offset + prefix,
+        offset + len(old) - suffix,
+        tuple(new[prefix : len(new) - suffix]),
+    )
+
+
+def _partial_loop(line: LineASTNode) -> Optional[ForEachBlockASTNode]:
+    """
+    Returns the foreach block of a line holding only a foreach block whose elements can be rendered on their own,
+    or None. Such a loop's body neither holds a foreach block nor references the whole iterator, so each element
+    renders one line for each line of the body unless its values contain newlines.
+    """
+    if len(line.content) != 1 or not isinstance(line.content[0], ForEachBlockASTNode):
+        return None
+    (loop,) = line.content
+    if not loop.body or any(
+        isinstance(node, ForEachBlockASTNode)
+        for body_line in loop.body
+        for node in body_line.content
+    ):
+        return None
+    if any(loop.iterator in body_line.get_references() for body_line in loop.body):
+        return None
+    return loop
+
+
+class DeltaRenderer:
+    """
+    Fills a template and computes the line edits between its outputs for successive values. fill renders the whole
+    document, and update renders only the lines affected by the values which changed since the previous fill or
+    update.
+
+    Values are compared with the values of the previous fill or update, and a value which is the same object is
+    unchanged, so lists must be replaced rather than changed in place between updates. Lines referencing slots
+    whose values are neither strings, numbers nor lists, and lines calling impure functions, are rendered on every
+    update.
+    """
+
+    def __init__(self, template: Template):
+        self.template = template
+        # The lines referencing each slot, and the lines calling impure functions.
+        self._lines_by_slot: dict[str, list[int]] = {}
+        self._impure_lines: list[int] = []
+        self._references: list[frozenset[str]] = []
+        # The lines holding a loop whose changed elements can be rendered on their own.
+        self._loops: dict[int, ForEachBlockASTNode] = {}
+        for index, line in enumerate(template._plan.lines):
+            references = frozenset(line.node.get_references())
+            self._references.append(references)
+            if not is_pure(line.node):
+                self._impure_lines.append(index)
+                continue
+            for name in references:
+                self._lines_by_slot.setdefault(name, []).append(index)
+            if (loop := _partial_loop(line.node)) is not None:
+                self._loops[index] = loop
+        self._loop_plans: dict[int, CompiledDocument] = {}
+        self._values: dict[str, Any] = {}
+        # The output lines of each line of the template.
+        self._rendered: Optional[list[list[str]]] = None
+        # The loops whose every element rendered one line for each line of the body.
+        self._uniform: set[int] = set()
+
+    def _take_values(self, values: Mapping) -> dict[str, Any]:
+        return {name: values.get(name, _MISSING) for name in self._lines_by_slot}
+
+    def _is_uniform(self, index: int, lines: list[str]) -> bool:
+        loop = self._loops.get(index)
+        if loop is None:
+            return False
+        elements = self._values[loop.iterator]
+        return (
+            type(elements) in (list, tuple)
+            and len(elements) > 0
+            and len(lines) == len(elements) * len(loop.body)
+        )
+
+    def fill(
+        self,
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+    ) -> str:
+        """
+        Fills the template with values, returning the whole output. The output is identical to Template.fill.
+        """
+        env = self.template._plan.environment(values)
+        rendered = [line.render(env) for line in self.template._plan.lines]
+        self._values = self._take_values(values)
+        self._rendered = [r.split("\n") for r in rendered]
+        self._uniform = {
+            index
+            for index in self._loops
+            if self._is_uniform(index, self._rendered[index])
+        }
+        return "\n".join(rendered)
+
+    def _loop_plan(self, index: int) -> CompiledDocument:
+        # Renders the elements of a loop bound to _ELEMENTS.
+        plan = self._loop_plans.get(index)
+        if plan is None:
+            loop = replace(self._loops[index], iterator=_ELEMENTS)
+            plan = self._loop_plans[index] = compile_document(
+                DocumentASTNode([LineASTNode([loop])]),
+                get_escaper(self.template.escape),
+            )
+        return plan
+
+    def _update_loop(
+        self, index: int, values: Mapping, old: Sequence, new: Any, prefix: int
+    ) -> Optional[tuple[int, int, list[str]]]:
+        """
+        Renders the elements of a loop between the prefix of unchanged elements and the unchanged elements at the
+        end of its list. Returns the range of the previous output lines of the loop to replace and the lines
+        replacing them, or None if the loop must be rendered as a whole.
+        """
+        if type(new) not in (list, tuple) or not new:
+            return None
+        height = len(self._loops[index].body)
+        suffix = _common_suffix(
+            old, new, min(len(old), len(new)) - prefix, _same_values
+        )
+        elements = new[prefix : len(new) - suffix]
+        lines = []
+        if elements:
+            output = self._loop_plan(index).render({**values, _ELEMENTS: elements})
+            lines = output.split("\n")
+            if len(lines) != len(elements) * height:
+                return None
+        return prefix * height, (len(old) - suffix) * height, lines
+
+    def update(
+        self,
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+    ) -> list[LineEdit]:
+        """
+        Fills the template with values, returning the edits which turn the previous output into the new output.
+        Edits are ordered by position and do not overlap. If rendering raises an error, the previous output is kept.
+        """
+        if self._rendered is None:
+            raise ValueError("A delta renderer must be filled before it is updated.")
+
+        previous = self._values
+        current = self._take_values(values)
+        # The number of unchanged leading elements of each changed slot.
+        changed = {}
+        affected = set(self._impure_lines)
+        for name, value in current.items():
+            prefix = _changed_prefix(previous[name], value)
+            if prefix is not None:
+                changed[name] = prefix
+                affected.update(self._lines_by_slot[name])
+
+        # Every line is rendered before any is replaced, so that an error keeps the previous output.
+        replacements = []
+        env = None
+        plan = self.template._plan
+        for index in sorted(affected):
+            # A loop whose list is the only changed slot it references renders only its changed elements.
+            loop = self._loops.get(index)
+            if index in self._uniform and changed.keys() & self._references[index] == {
+                loop.iterator
+            }:
+                name = loop.iterator
+                partial = self._update_loop(
+                    index, values, previous[name], current[name], changed[name]
+                )
+                if partial is not None:
+                    replacements.append((index, *partial))
+                    continue
+            if env is None:
+                env = plan.environment(values)
+            lines = plan.lines[index].render(env).split("\n")
+            replacements.append((index, 0, len(self._rendered[index]), lines))
+
+        edits = []
+        offset = 0
+        position = 0
+        for index, start, end, lines in replacements:
+            offset += sum(map(len, self._rendered[position:index]))
+            position = index
+            old = self._rendered[index][start:end]
+            if old != lines:
+                edits.append(_diff_lines(offset + start, old, lines))
+
+        self._values = current
+        for index, start, end, lines in replacements:
+            rendered = self._rendered[index]
+            if start == 0 and end == len(rendered):
+                self._rendered[index] = lines
+                if index in self._loops:
+                    self._uniform.discard(index)
+                    if self._is_uniform(index, lines):
+                        self._uniform.add(index)
+            else:
+                rendered[start:end] = lines
+        return edits
+
+    @property
+    def output(self) -> str:
+        """
+        The output of the previous fill or update.
+        """
+        return "\n".join(map("\n".join, self._rendered))
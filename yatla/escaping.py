@@ -0,0 +1,84 @@
+"""
+Output escaping for templates rendered into HTML, CSV or JSON. A template parsed with an escaping mode escapes the
+output of its expressions as it is rendered, so the values passed to fill are used as they are. Whether a value is
+escaped depends on its type when it is rendered, not on the inferred type of its slot, as fill does not validate
+values: numbers and the static text of the template are never escaped, and everything else is.
+
+Each mode is defined by a str.translate table. Translating looks up every character of the text in the table, which
+is several times slower than searching the text for the few characters a mode replaces, so rendering uses an escaper
+function equivalent to the table instead.
+"""
+
+from typing import Callable, Optional
+
+Escaper = Callable[[str], str]
+
+# Text inside HTML elements and quoted attribute values.
+HTML = str.maketrans(
+    {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"}
+)
+
+# The body of a double quoted CSV field.
+CSV = str.maketrans({'"': '""'})
+
+# The body of a JSON string.
+JSON = str.maketrans(
+    {
+        **{chr(c): f"\\u{c:04x}" for c in range(0x20)},
+        "\b": "\\b",
+        "\t": "\\t",
+        "\n": "\\n",
+        "\f": "\\f",
+        "\r": "\\r",
+        '"': '\\"',
+        "\\": "\\\\",
+    }
+)
+
+ESCAPES: dict[str, dict[int, str]] = {"html": HTML, "csv": CSV, "json": JSON}
+
+
+def _escape_html(text: str) -> str:
+    # & is replaced first, as the other replacements introduce it.
+    return (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("'", "&#x27;")
+    )
+
+
+def _escape_csv(text: str) -> str:
+    return text.replace('"', '""')
+
+
+def _json_escaper() -> Escaper:
+    # The json package imports re, so it is only imported by templates which escape JSON.
+    from json.encoder import encode_basestring
+
+    return lambda text: encode_basestring(text)[1:-1]
+
+
+def get_escaper(name: Optional[str]) -> Optional[Escaper]:
+    """
+    Returns the function escaping text for an escaping mode, or None if name is None.
+    """
+    if name is None:
+        return None
+    if name == "html":
+        return _escape_html
+    if name == "csv":
+        return _escape_csv
+    if name == "json":
+        return _json_escaper()
+    raise ValueError(
+        f"Unknown escaping mode: {name}. Expected one of {', '.join(ESCAPES)}."
+    )
+
+
+def escape(value, name: str) -> str:
+    """
+    Renders value as text escaped for the escaping mode name.
+    """
+    return get_escaper(name)(str(value))
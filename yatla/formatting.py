@@ -0,0 +1,82 @@
+"""
+Format specs for expression blocks, such as ``{{ price * quantity : ,.2f }}``. A spec uses the syntax of Python's
+format specification mini-language and is checked once, when the template is parsed, so rendering passes the spec
+straight to format.
+"""
+
+from dataclasses import dataclass
+
+_ALIGNMENTS = "<>=^"
+_SIGNS = "+- "
+_GROUPINGS = ",_"
+# Presentation types which only apply to numbers. Integer only types are checked against an int, the rest against
+# a float.
+_INTEGER_TYPES = "bcdoxX"
+_NUMBER_TYPES = "bcdeEfFgGnoxX%"
+
+
+@dataclass(frozen=True)
+class FormatSpec:
+    """
+    A parsed format spec. numeric is true for specs which only apply to numbers, for example ones with a number
+    presentation type, a sign, a grouping option or = alignment.
+    """
+
+    spec: str
+    numeric: bool
+
+
+def _take_digits(spec: str, position: int) -> int:
+    while position < len(spec) and spec[position].isdigit():
+        position += 1
+    return position
+
+
+def parse_format_spec(spec: str) -> FormatSpec:
+    """
+    Parses a format spec, raising a ValueError if it is not valid.
+    """
+    # [[fill]align][sign]["z"]["#"]["0"][width][grouping]["." precision][type]
+    position = 0
+    numeric = False
+    if spec[1:2] and spec[1] in _ALIGNMENTS:
+        numeric = spec[1] == "="
+        position = 2
+    elif spec[:1] and spec[0] in _ALIGNMENTS:
+        numeric = spec[0] == "="
+        position = 1
+    for options in (_SIGNS, "z", "#", "0"):
+        if spec[position : position + 1] and spec[position] in options:
+            numeric = True
+            position += 1
+    position = _take_digits(spec, position)
+    if spec[position : position + 1] and spec[position] in _GROUPINGS:
+        numeric = True
+        position += 1
+    if spec[position : position + 1] == ".":
+        precision = _take_digits(spec, position + 1)
+        if precision == position + 1:
+            raise ValueError(f"Invalid format spec: {spec!r}. Expected precision.")
+        position = precision
+    presentation = spec[position:]
+    if presentation not in ("", "s") and (
+        len(presentation) != 1 or presentation not in _NUMBER_TYPES
+    ):
+        raise ValueError(
+            f"Invalid format spec: {spec!r}. Unknown presentation type {presentation!r}."
+        )
+    numeric = numeric or presentation != "" and presentation != "s"
+
+    # Specs which pass the grammar can still combine options which format rejects, such as a precision with an
+    # integer presentation type.
+    if not numeric:
+        sample = ""
+    elif presentation and presentation in _INTEGER_TYPES:
+        sample = 1
+    else:
+        sample = 1.5
+    try:
+        format(sample, spec)
+    except ValueError as e:
+        raise ValueError(f"Invalid format spec: {spec!r}. {e}") from None
+    return FormatSpec(spec, numeric)
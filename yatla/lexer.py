@@ -2,11 +2,10 @@
 This module provides the lexer which is used to parse templates. The members of this module are not required in most templating workflows.
 """
 
+import codecs
 from dataclasses import dataclass
 from enum import Enum
-import re
-import string
-from typing import Optional
+from typing import IO, Optional
 
 
 class TokenType(Enum):
@@ -34,11 +33,15 @@ class TokenType(Enum):
     FOREACH = 13
     ENDFOREACH = 14
     IN = 15
+    INCLUDE = 19
 
     # Line delimiters.
     NEWLINE = 16
     EOF = 17
 
+    # The format spec following a colon at the end of an expression block.
+    FORMAT_SPEC = 18
+
 
 @dataclass
 class Token:
@@ -55,15 +58,66 @@ class Token:
 
 
 allowed_whitespace = " \t\v\f"
-printable_characters = list(
-    string.digits + string.ascii_letters + string.punctuation + string.whitespace
-)
-string_chars_without_nl = [c for c in printable_characters if c not in ["\n"]]
-identifer_chars = [
-    c
-    for c in list(string.digits + string.ascii_letters + string.punctuation)
-    if c not in ["(", ")", ","]
-]
+
+# Number of characters (or bytes, for binary streams) a scanner reads from a stream at a time.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# The same characters as the string module's constants. They are spelled out because importing string also imports
+# re, which dominates the import time of this module.
+_digits = "0123456789"
+_ascii_letters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_punctuation = r"""!"#$%&'()*+,-./:;<=>?@[\]^_`{|}~"""
+_whitespace = " \t\n\r\v\f"
+
+_character_tables: Optional[dict[str, list[str]]] = None
+_character_sets: Optional[dict[str, frozenset[str]]] = None
+
+
+def _get_character_tables() -> dict[str, list[str]]:
+    """
+    Builds the character tables used by the scanner on first use, rather than at import time. Threads racing on the
+    first use may each build the tables, which is harmless as they build equal tables.
+    """
+    global _character_tables
+    if _character_tables is None:
+        printable = list(_digits + _ascii_letters + _punctuation + _whitespace)
+        _character_tables = {
+            "printable_characters": printable,
+            "string_chars_without_nl": [c for c in printable if c not in ["\n"]],
+            "identifer_chars": [
+                c
+                for c in list(_digits + _ascii_letters + _punctuation)
+                if c not in ["(", ")", ",", ":"]
+            ],
+        }
+    return _character_tables
+
+
+def _get_character_sets() -> dict[str, frozenset[str]]:
+    global _character_sets
+    if _character_sets is None:
+        _character_sets = {
+            name: frozenset(table) for name, table in _get_character_tables().items()
+        }
+    return _character_sets
+
+
+def __getattr__(name: str):
+    # printable_characters, string_chars_without_nl and identifer_chars are built lazily.
+    tables = _get_character_tables()
+    if name in tables:
+        return tables[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _is_decimal(value: str) -> bool:
+    """
+    Returns whether value is a decimal number such as 1.5 or -0.25.
+    """
+    whole, point, fraction = value.partition(".")
+    if whole[:1] == "-":
+        whole = whole[1:]
+    return bool(point) and whole.isdigit() and fraction.isdigit()
 
 
 class Scanner:
@@ -71,16 +125,66 @@ class Scanner:
     Scanner class for tokenising documents.
     """
 
-    def __init__(self, source):
-        self.source = self._normalise_newlines(source)
+    def __init__(
+        self,
+        source: str | IO[str] | IO[bytes],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        encoding: str = "utf-8",
+    ):
+        """
+        Source is either the whole document, or a text or binary file-like object which is read chunk_size
+        characters or bytes at a time as scanning proceeds. Binary streams are decoded using encoding.
+        """
+        if isinstance(source, str):
+            self.source = self._normalise_newlines(source)
+            self._stream = None
+        else:
+            self.source = ""
+            self._stream = source
         self.current = 0
         self.line_number = 1
 
         self.break_on_whitespace = False
 
+        self._chunk_size = chunk_size
+        self._encoding = encoding
+        self._decoder = None
+        # A carriage return at the end of a chunk is held back until the next chunk shows whether it starts a \r\n.
+        self._pending_carriage_return = ""
+
     def _normalise_newlines(self, source: str):
         return source.replace("\r\n", "\n")
 
+    def _read_chunk(self):
+        """
+        Reads the next chunk of the stream into the buffer, discarding the characters which have been scanned.
+        """
+        data = self._stream.read(self._chunk_size)
+        if isinstance(data, bytes):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder(self._encoding)()
+            text = self._decoder.decode(data, final=not data)
+        else:
+            text = data
+
+        text = self._pending_carriage_return + text
+        self._pending_carriage_return = ""
+        if not data:
+            self._stream = None
+        elif text[-1:] == "\r":
+            text = text[:-1]
+            self._pending_carriage_return = "\r"
+
+        self.source = self.source[self.current :] + self._normalise_newlines(text)
+        self.current = 0
+
+    def _fill_buffer(self, count: int):
+        """
+        Reads from the stream until the buffer holds count unscanned characters or the stream is exhausted.
+        """
+        while self._stream is not None and self.current + count > len(self.source):
+            self._read_chunk()
+
     def _add_token(self, type: TokenType, literal=None):
         return Token(type, None, literal, self.line_number)
 
@@ -106,7 +210,7 @@ class Scanner:
             return self._add_token(TokenType.RIGHT_PAREN)
         elif value == ".":
             return self._add_token(TokenType.DOT)
-        elif re.match(r"^-?\d+\.\d+$", value):
+        elif _is_decimal(value):
             return self._add_token(TokenType.NUMBER, float(value))
         elif value.isdigit():
             return self._add_token(TokenType.NUMBER, int(value))
@@ -116,6 +220,8 @@ class Scanner:
             return self._add_token(TokenType.ENDFOREACH)
         elif value == "in":
             return self._add_token(TokenType.IN)
+        elif value == "include":
+            return self._add_token(TokenType.INCLUDE)
         else:
             return self._add_token(TokenType.STRING, value)
 
@@ -131,11 +237,40 @@ class Scanner:
         """
         self.break_on_whitespace = False
 
+    def _scan_format_spec(self) -> str:
+        """
+        Scans the raw text of a format spec, up to the }} closing its expression block.
+        """
+        spec = ""
+        while True:
+            if self._stream is not None and self.current + 2 > len(self.source):
+                self._fill_buffer(2)
+            c = self.source[self.current : self.current + 1]
+            if c in ("", "\n"):
+                raise ValueError(
+                    f"Expected }}}} after format spec at {self.line_number}."
+                )
+            if c == "}" and self.source[self.current + 1 : self.current + 2] == "}":
+                return spec.strip()
+            spec += c
+            self.current += 1
+
     def scan(self):
         """
         Scans a document, yielding tokens.
         """
-        while self.current < len(self.source):
+        character_sets = _get_character_sets()
+        printable_characters = character_sets["printable_characters"]
+        identifer_chars = character_sets["identifer_chars"]
+        string_chars_without_nl = character_sets["string_chars_without_nl"]
+
+        while True:
+            # Two characters are needed to recognise {{ and }}.
+            if self._stream is not None and self.current + 2 > len(self.source):
+                self._fill_buffer(2)
+            if self.current >= len(self.source):
+                break
+
             c = self.source[self.current]
             if self.break_on_whitespace and (c in allowed_whitespace):
                 self.current += 1
@@ -143,10 +278,10 @@ class Scanner:
                 self.current += 1
                 yield self._add_token(TokenType.NEWLINE)
                 self.line_number += 1
-            elif c == "{" and self.source[self.current + 1] == "{":
+            elif c == "{" and self.source[self.current + 1 : self.current + 2] == "{":
                 self.current += 2
                 yield self._add_token(TokenType.LEFT_DOUBLE_CURLY_PAREN)
-            elif c == "}" and self.source[self.current + 1] == "}":
+            elif c == "}" and self.source[self.current + 1 : self.current + 2] == "}":
                 self.current += 2
                 yield self._add_token(TokenType.RIGHT_DOUBLE_CURLY_PAREN)
             elif self.break_on_whitespace and c == "(":
@@ -158,7 +293,10 @@ class Scanner:
             elif self.break_on_whitespace and c == ",":
                 self.current += 1
                 yield self._add_token(TokenType.COMMA)
-            elif c in string.printable:
+            elif self.break_on_whitespace and c == ":":
+                self.current += 1
+                yield self._add_token(TokenType.FORMAT_SPEC, self._scan_format_spec())
+            elif c in printable_characters:
                 if self.break_on_whitespace:
                     # break on whitespace and emit string
                     allowed_chars = identifer_chars
@@ -168,25 +306,36 @@ class Scanner:
 
                 literal_value = c
                 self.current += 1
-                while (self.current < len(self.source)) and (
-                    s := self._char_in_list(self.source[self.current], allowed_chars)
-                ):
+                while True:
+                    if self._stream is not None and self.current + 2 > len(self.source):
+                        self._fill_buffer(2)
+                    if not (
+                        (self.current < len(self.source))
+                        and (
+                            s := self._char_in_list(
+                                self.source[self.current], allowed_chars
+                            )
+                        )
+                    ):
+                        yield self._add_literal(literal_value)
+                        break
+
                     self.current += 1
 
-                    if s == "{" and self.source[self.current] == "{":
+                    if s == "{" and self.source[self.current : self.current + 1] == "{":
                         yield self._add_literal(literal_value)
                         self.current += 1
                         yield self._add_token(TokenType.LEFT_DOUBLE_CURLY_PAREN)
                         break
-                    elif s == "}" and self.source[self.current] == "}":
+                    elif (
+                        s == "}" and self.source[self.current : self.current + 1] == "}"
+                    ):
                         self.current += 1
                         yield self._add_literal(literal_value)
                         yield self._add_token(TokenType.RIGHT_DOUBLE_CURLY_PAREN)
                         break
                     else:
                         literal_value += s
-                else:
-                    yield self._add_literal(literal_value)
             else:
                 raise ValueError(f"Unknown token: {c} at {self.line_number}.")
 
@@ -0,0 +1,93 @@
+"""
+Loaders resolve the include blocks of a template, such as ``{{ include header }}``, to other templates by name.
+
+An include block must be the only text on its line, and is replaced by the lines of the included template when the
+including template is parsed, so a filled template never looks partials up. A loader parses each partial once and
+caches its lines, which are shared by every template including it. Partials may include other partials, and include
+cycles are reported when they are parsed.
+"""
+
+import os
+from typing import Mapping
+
+from yatla.ast_nodes import LineASTNode
+from yatla.lexer import Scanner
+from yatla.parser import Parser, TokenSource
+
+
+class TemplateLoader:
+    """
+    Base class for loaders. Subclasses implement get_source.
+    """
+
+    def __init__(self):
+        self._cache: dict[str, tuple[LineASTNode, ...]] = {}
+
+    def get_source(self, name: str) -> str:
+        """
+        Returns the source of the template called name, raising a ValueError if there is none.
+        """
+        raise NotImplementedError
+
+    def load(
+        self, name: str, including: tuple[str, ...] = ()
+    ) -> tuple[LineASTNode, ...]:
+        """
+        Returns the parsed lines of the template called name. including holds the names of the templates whose
+        includes are being resolved, outermost first. A single trailing newline of the source is removed, as files
+        usually end with one.
+        """
+        if name in including:
+            raise ValueError(f"Include cycle: {' -> '.join((*including, name))}.")
+        lines = self._cache.get(name)
+        if lines is None:
+            source = self.get_source(name)
+            if source.endswith("\n"):
+                source = source[:-1]
+            parser = Parser(TokenSource(Scanner(source)), self, (*including, name))
+            lines = self._cache[name] = tuple(parser.iter_lines())
+        return lines
+
+    def clear(self):
+        """
+        Removes every parsed partial from the cache, so changed sources are read again.
+        """
+        self._cache.clear()
+
+
+class DictLoader(TemplateLoader):
+    """
+    Loads templates from a mapping of names to sources.
+    """
+
+    def __init__(self, sources: Mapping[str, str]):
+        super().__init__()
+        self.sources = sources
+
+    def get_source(self, name: str) -> str:
+        if name not in self.sources:
+            raise ValueError(f"Unknown template: {name}.")
+        return self.sources[name]
+
+
+class FileSystemLoader(TemplateLoader):
+    """
+    Loads templates from the files in a directory, named by their path relative to the directory with / separators,
+    for example "emails/header.txt".
+    """
+
+    def __init__(self, directory: str, encoding: str = "utf-8"):
+        super().__init__()
+        self.directory = directory
+        self.encoding = encoding
+
+    def get_source(self, name: str) -> str:
+        root = os.path.abspath(self.directory)
+        path = os.path.abspath(os.path.join(root, *name.split("/")))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Template {name} is outside {self.directory}.")
+        try:
+            with open(path, encoding=self.encoding) as f:
+                return f.read()
+        except OSError as e:
+            raise ValueError(f"Cannot load template {name}: {e}") from None
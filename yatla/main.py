@@ -1,7 +1,6 @@
-import re
 import click
-from yatla.lexer import Scanner
-from yatla.parser import parse
+
+# The yatla modules are imported inside each command so that startup only pays for the command which runs.
 
 
 @click.group()
@@ -12,17 +11,21 @@ def cli():
 @cli.command()
 @click.argument("filepath", type=click.Path(exists=True))
 def lexer(filepath):
-    text = open(filepath).read()
-    tokens = list(Scanner(text).scan())
+    from yatla.lexer import Scanner
 
-    print("\n".join(map(str, tokens)))
+    with open(filepath) as f:
+        for token in Scanner(f).scan():
+            print(token)
 
 
 @cli.command()
 @click.argument("filepath", type=click.Path(exists=True))
 def ast(filepath):
+    from yatla.lexer import Scanner
+    from yatla.parser import parse_from_scanner
+
     text = open(filepath).read()
-    doc = parse(Scanner(text))
+    doc = parse_from_scanner(Scanner(text))
 
     print(doc)
 
@@ -30,38 +33,157 @@ def ast(filepath):
 @cli.command()
 @click.argument("filepath", type=click.Path(exists=True))
 @click.argument("data", nargs=-1)
-def eval(filepath, data: tuple[str, ...]):
+@click.option(
+    "--input",
+    "input_file",
+    type=click.File("r"),
+    help="JSON, NDJSON or CSV file of records to render the template with. Use - for stdin.",
+)
+@click.option(
+    "--format",
+    "input_format",
+    type=click.Choice(["json", "ndjson", "csv"]),
+    help="Format of the input file. Inferred from the file extension by default.",
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False),
+    help="Write each rendered record to <index>.txt in this directory instead of stdout.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Number of worker processes. Records are rendered in parallel, and a single fill renders large foreach "
+    "loops in parallel.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Render each line as soon as it is parsed. For large templates filled once with key:value pairs.",
+)
+def eval(
+    filepath,
+    data: tuple[str, ...],
+    input_file,
+    input_format,
+    output_dir,
+    workers,
+    stream,
+):
+    """
+    Render the template with key:value pairs, or once per record of an input file. Key:value pairs are used as
+    defaults for every record.
+    """
+    import os
+    from yatla.batch import (
+        guess_format,
+        iter_records,
+        parse_argument_values,
+        render_records,
+    )
+    from yatla.parser import parse
+
+    if stream:
+        if input_file is not None or output_dir is not None:
+            raise click.UsageError(
+                "--stream cannot be combined with --input or --output-dir."
+            )
+        import sys
+        from yatla.streaming import render_stream
+
+        # Slots are only known once the template has been streamed, so values are coerced without their types.
+        with open(filepath) as f:
+            render_stream(f, parse_argument_values(data), sys.stdout, workers=workers)
+        sys.stdout.write("\n")
+        return
+
     text = open(filepath).read()
-    doc = parse(Scanner(text))
-    data: dict[str, str] = dict(arg.split(":") for arg in data)
-
-    for k in data.keys():
-        value = data[k]
-        if re.match(r"^-?\d+$", value):
-            data[k] = int(value)
-        elif re.match(r"^-?\d+\.\d+$", value):
-            data[k] = float(value)
-        elif value[0] == "[" and value[-1] == "]":
-            lst = value[1:-1].split(",")
-            if all(re.match(r"^-?\d+", v) for v in lst):
-                data[k] = [int(v) for v in lst]
-            elif all(re.match(r"^-?\d+\.\d+$", v) for v in lst):
-                data[k] = [float(v) for v in lst]
-            else:
-                data[k] = lst
-
-    print(doc.eval(data))
+    template = parse(text)
+    defaults = parse_argument_values(data, template.slots)
+
+    if input_file is None:
+        if output_dir is None:
+            click.echo(template.fill(defaults, workers=workers))
+            return
+        records = [{}]
+    else:
+        if input_format is None:
+            if input_file.name == "<stdin>":
+                raise click.UsageError("--format is required when reading from stdin.")
+            input_format = guess_format(input_file.name)
+        records = iter_records(input_file, input_format, template.slots)
+
+    outputs = render_records(template, records, defaults, workers)
+
+    if output_dir is None:
+        for output in outputs:
+            click.echo(output)
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+        for index, output in enumerate(outputs):
+            with open(os.path.join(output_dir, f"{index}.txt"), "w") as f:
+                f.write(output)
+
+
+@cli.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    help="Listen on this Unix domain socket instead of stdin/stdout.",
+)
+@click.option(
+    "--template",
+    "templates",
+    multiple=True,
+    help="Preload a template as NAME=PATH so requests can refer to it by NAME.",
+)
+def serve(socket_path, templates: tuple[str, ...]):
+    """
+    Answer render requests, one JSON object per line, using a warm template cache.
+    """
+    import sys
+    from yatla.server import RenderServer
+
+    server = RenderServer()
+    for template in templates:
+        name, separator, path = template.partition("=")
+        if not separator:
+            raise click.BadParameter(f"Expected NAME=PATH but got: {template}.")
+        with open(path) as f:
+            server.cache.register(name, f.read())
+
+    if socket_path is None:
+        server.serve_stream(sys.stdin, sys.stdout)
+    else:
+        server.serve_unix_socket(socket_path)
 
 
 @cli.command()
 @click.argument("filepath", type=click.Path(exists=True))
-def type(filepath):
+@click.argument("data", nargs=-1)
+def profile(filepath, data: tuple[str, ...]):
+    """
+    Report the memory allocated by each phase of parsing the template and filling it with key:value pairs, and the
+    memory held by each node type of the parsed template.
+    """
+    from yatla.batch import parse_argument_values
+    from yatla.profiling import profile_allocations
+
     text = open(filepath).read()
-    doc = parse(Scanner(text))
+    print(profile_allocations(text, parse_argument_values(data)).format())
+
+
+@cli.command()
+@click.argument("filepath", type=click.Path(exists=True))
+def type(filepath):
+    from yatla.parser import parse
 
-    paramters = doc.get_parameters()
+    text = open(filepath).read()
+    template = parse(text)
 
-    print(paramters)
+    print(template.slots)
 
 
 def main():
@@ -0,0 +1,229 @@
+"""
+Metrics describing the engine itself: parse and fill latencies, output sizes, loop iterations and cache reuse.
+
+Metrics are disabled by default. While they are disabled, each instrumented call only reads ENABLED, so the
+overhead is a single attribute lookup. enable() starts recording, and render_prometheus() formats every metric in
+the Prometheus text exposition format, for example to be written to a file collected by a node exporter or served
+by an existing HTTP endpoint::
+
+    from yatla import metrics
+
+    metrics.enable()
+    ...
+    with open("yatla.prom", "w") as f:
+        f.write(metrics.render_prometheus())
+"""
+
+import bisect
+import math
+
+# threading.Lock is _thread.allocate_lock, and importing threading would make up most of the time taken to import
+# this module, which the parser imports.
+from _thread import allocate_lock
+from typing import Iterable, Optional
+
+ENABLED = False
+
+# Latency buckets in seconds. Templates usually render in well under a millisecond, so the buckets start lower than
+# Prometheus' defaults.
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in labels]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    A value which only increases, with one series for each combination of label values.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = allocate_lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(tuple(zip(self.labels, label_values)))} "
+            f"{_format_value(value)}"
+            for label_values, value in values
+        ]
+
+
+class Histogram:
+    """
+    Counts observations in cumulative buckets and tracks their sum, with one series for each combination of label
+    values.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Each series holds a count per bucket, a count of observations above every bucket, and the sum.
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = allocate_lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = (
+                    [0] * (len(self.buckets) + 1),
+                    [0.0],
+                )
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = sorted(
+                (label_values, (list(counts), total[0]))
+                for label_values, (counts, total) in self._series.items()
+            )
+        lines = []
+        for label_values, (counts, total) in series:
+            labels = tuple(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+PARSE_SECONDS = Histogram(
+    "yatla_parse_seconds",
+    "Time spent parsing templates, by phase: scan, parse, inference or compile.",
+    ["phase"],
+)
+FILL_SECONDS = Histogram(
+    "yatla_fill_seconds", "Time spent filling templates with Template.fill."
+)
+OUTPUT_CHARACTERS = Counter(
+    "yatla_output_characters_total", "Characters of output rendered by Template.fill."
+)
+FOREACH_ITERATIONS = Counter(
+    "yatla_foreach_iterations_total", "Elements rendered by foreach loops."
+)
+CACHE_REQUESTS = Counter(
+    "yatla_cache_requests_total",
+    "Cache lookups, by cache (fragment or template) and result (hit, miss or uncacheable).",
+    ["cache", "result"],
+)
+
+METRICS = (
+    PARSE_SECONDS,
+    FILL_SECONDS,
+    OUTPUT_CHARACTERS,
+    FOREACH_ITERATIONS,
+    CACHE_REQUESTS,
+)
+
+
+def enable():
+    """
+    Starts recording metrics.
+    """
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    """
+    Stops recording metrics. Recorded values are kept until reset.
+    """
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """
+    Clears every recorded value.
+    """
+    for metric in METRICS:
+        metric.reset()
+
+
+def render_prometheus(metrics: Optional[Iterable[Counter | Histogram]] = None) -> str:
+    """
+    Formats metrics, by default every metric in this module, in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in METRICS if metrics is None else metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
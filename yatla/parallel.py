@@ -0,0 +1,205 @@
+"""
+Parallel rendering of templates dominated by one very large foreach loop, such as a statement listing millions of
+transactions.
+
+A ParallelRenderer renders the template line by line in the calling process, except for lines holding a single
+foreach block whose iterator has at least threshold elements. The elements of those loops are split into chunks,
+each chunk is rendered in a pool of worker processes, and the chunks are reassembled in order. The document tree is
+sent to each worker once, when the pool starts. Each chunk is sent with its elements and the other values referenced
+by the loop, so large arrays used inside the loop body are sent once per chunk.
+
+Only loops over lists and tuples at the top level of the template are split. Other loops, and loops below the
+threshold, are rendered in the calling process as usual.
+"""
+
+import math
+import os
+from dataclasses import replace
+from typing import Iterable, Iterator, Mapping, Optional
+
+from yatla import metrics
+from yatla.ast_nodes import DocumentASTNode, ForEachBlockASTNode, LineASTNode
+from yatla.compiler import CompiledDocument, compile_document
+from yatla.escaping import get_escaper
+from yatla.template import Template
+
+# Loops with fewer elements are rendered in the calling process, as sending them to a worker costs more than
+# rendering them.
+PARALLEL_THRESHOLD = 50_000
+
+# Chunks per worker when no chunk size is given. More chunks than workers balance the load when elements differ in
+# cost.
+_CHUNKS_PER_WORKER = 4
+
+# The environment key a chunk is bound to in a worker. It contains a space, so it is never a slot name. The iterator
+# keeps its full value, as nested loops may iterate over it too.
+_CHUNK = " chunk"
+
+_worker_lines: tuple[LineASTNode, ...] = None
+_worker_escape: Optional[str] = None
+_worker_plans: dict[int, CompiledDocument] = {}
+
+
+def _initialise_worker(lines: tuple[LineASTNode, ...], escape: Optional[str]):
+    global _worker_lines, _worker_escape
+    _worker_lines = lines
+    _worker_escape = escape
+    _worker_plans.clear()
+
+
+def _render_in_worker(task: tuple[int, Mapping, list]) -> str:
+    index, values, elements = task
+    plan = _worker_plans.get(index)
+    if plan is None:
+        (loop,) = _worker_lines[index].content
+        document = DocumentASTNode([LineASTNode([replace(loop, iterator=_CHUNK)])])
+        plan = _worker_plans[index] = compile_document(
+            document, get_escaper(_worker_escape)
+        )
+    return plan.render({**values, _CHUNK: elements})
+
+
+def find_large_loop(
+    line: LineASTNode, values: Mapping, threshold: int = PARALLEL_THRESHOLD
+) -> Optional[ForEachBlockASTNode]:
+    """
+    Returns the foreach block of a line holding only a foreach block whose iterator is a list or tuple of at least
+    threshold elements, or None. Other iterables are not split, as they may only be iterated once.
+    """
+    if len(line.content) != 1 or not isinstance(line.content[0], ForEachBlockASTNode):
+        return None
+    (loop,) = line.content
+    elements = values.get(loop.iterator)
+    if not isinstance(elements, (list, tuple)) or len(elements) < threshold:
+        return None
+    return loop
+
+
+class ParallelRenderer:
+    """
+    Fills a template, rendering its large top level foreach loops in a pool of worker processes. The pool is
+    started by the first fill with a large loop and is kept for later fills until close is called, so a renderer is
+    best used as a context manager::
+
+        with ParallelRenderer(template, workers=8) as renderer:
+            output = renderer.fill(values)
+
+    workers defaults to the number of CPUs. Loops are split into chunks of chunk_size elements, by default enough
+    for four chunks per worker.
+    """
+
+    def __init__(
+        self,
+        template: Template,
+        workers: Optional[int] = None,
+        threshold: int = PARALLEL_THRESHOLD,
+        chunk_size: Optional[int] = None,
+    ):
+        if workers is not None and workers < 1:
+            raise ValueError("A parallel renderer needs at least one worker.")
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("The chunk size must be at least 1.")
+        self.template = template
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._closed = False
+
+    def _get_pool(self):
+        if self._pool is None:
+            import multiprocessing
+
+            self._closed = False
+            self._pool = multiprocessing.Pool(
+                self.workers,
+                initializer=_initialise_worker,
+                initargs=(self.template._ast.lines, self.template.escape),
+            )
+        return self._pool
+
+    def _render_loop(
+        self, index: int, loop: ForEachBlockASTNode, values: Mapping
+    ) -> Iterator[str]:
+        pool = self._get_pool()
+        elements = values[loop.iterator]
+        chunk_size = self.chunk_size or math.ceil(
+            len(elements) / (self.workers * _CHUNKS_PER_WORKER)
+        )
+        references = set().union(*(line.get_references() for line in loop.body))
+        references.discard(loop.iterand)
+        loop_values = {name: values[name] for name in references if name in values}
+        tasks = self._tasks(index, loop_values, elements, chunk_size)
+        if metrics.ENABLED:
+            metrics.FOREACH_ITERATIONS.inc(amount=len(elements))
+        return pool.imap(_render_in_worker, tasks)
+
+    def _tasks(
+        self, index: int, values: Mapping, elements: list, chunk_size: int
+    ) -> Iterator[tuple[int, Mapping, list]]:
+        # The pool sends tasks from a thread of its own as workers become free.
+        for start in range(0, len(elements), chunk_size):
+            if self._closed:
+                return
+            yield index, values, elements[start : start + chunk_size]
+
+    def iter_fill(
+        self,
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+    ) -> Iterator[str]:
+        """
+        Fills the template with values, yielding the output in pieces which concatenate to the output of
+        template.fill(values). Chunks are yielded as soon as they and every chunk before them have been rendered.
+        """
+        lines = self.template._ast.lines
+        # Every large loop is sent to the workers before any line is rendered, so the workers render them while the
+        # calling process renders the lines in between.
+        loops = {}
+        for index, line in enumerate(lines):
+            loop = find_large_loop(line, values, self.threshold)
+            if loop is not None:
+                loops[index] = self._render_loop(index, loop, values)
+
+        plan = self.template._plan
+        env = plan.environment(values)
+        for index, line in enumerate(plan.lines):
+            if index:
+                yield "\n"
+            if index not in loops:
+                yield line.render(env)
+                continue
+            for position, chunk in enumerate(loops[index]):
+                if position:
+                    yield "\n"
+                yield chunk
+
+    def fill(
+        self,
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+    ) -> str:
+        """
+        Fills the template with values. The output is the same as the output of template.fill(values).
+        """
+        return "".join(self.iter_fill(values))
+
+    def close(self):
+        """
+        Stops the worker processes. Chunks which were not sent to a worker yet are discarded, and the workers finish
+        the chunks they were sent before they stop.
+        """
+        if self._pool is not None:
+            # Terminating a pool while its tasks are being sent can deadlock, so the tasks are stopped instead.
+            self._closed = True
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
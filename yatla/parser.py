@@ -1,4 +1,7 @@
 from __future__ import annotations
+import time
+from typing import Iterator, Optional
+
 from yatla.ast_nodes import (
     BinOpASTNode,
     BuiltinFunctionType,
@@ -14,9 +17,28 @@ from yatla.ast_nodes import (
 )
 
 
+from yatla import metrics
+from yatla.builtins import get_function
+from yatla.formatting import parse_format_spec
 from yatla.lexer import Token, TokenType, Scanner
 from yatla.template import Slot, Template
 
+# Binary operators by token, with their precedence. Higher precedence binds more tightly.
+BINARY_OPERATORS = {
+    TokenType.PLUS: (1, BuiltinFunctionType.ADD),
+    TokenType.MINUS: (1, BuiltinFunctionType.SUBTRACT),
+    TokenType.MULTIPLY: (2, BuiltinFunctionType.MULTIPLY),
+    TokenType.DIVIDE: (2, BuiltinFunctionType.DIVIDE),
+}
+
+# Tokens which may follow a complete expression.
+EXPRESSION_TERMINATORS = [
+    TokenType.RIGHT_PAREN,
+    TokenType.COMMA,
+    TokenType.RIGHT_DOUBLE_CURLY_PAREN,
+    TokenType.FORMAT_SPEC,
+]
+
 
 class TokenSource:
     def __init__(self, lexer: Scanner):
@@ -35,144 +57,124 @@ class TokenSource:
 
 
 class Parser:
-    def __init__(self, t: TokenSource) -> None:
+    def __init__(
+        self, t: TokenSource, loader=None, including: tuple[str, ...] = ()
+    ) -> None:
+        """
+        loader resolves include blocks, and including holds the names of the templates whose includes are being
+        resolved, outermost first.
+        """
         self.tokens = t
+        self.loader = loader
+        self.including = including
         self.current_token = t.get_next_token()
 
     def advance(self):
         self.current_token = self.tokens.get_next_token()
 
-    def parse_argument_list(self) -> list[ExpressionBlockASTNode]:
-        self.assert_current_token_in_set(
-            [TokenType.STRING, TokenType.NUMBER, TokenType.LEFT_PAREN]
-        )
-        args = []
-        while True:
-            args.append(self.parse_add_expression())
-
-            if self.current_token.type == TokenType.COMMA:
-                self.advance()
-                if self.current_token.type == TokenType.RIGHT_PAREN:
-                    raise ValueError(
-                        "Unexpected end of argument list. Expected term after comma."
-                    )
-            if self.current_token.type == TokenType.RIGHT_PAREN:
-                break
-        return args
-
     # <expression> ::= <add-expr>
-    #   string, number or (
     # <add-expr> ::= <mul-expr> (['+' | '-'] <mul-expr>)*
-    #   string, number or (
     # <mul-expr> ::= <atomic> (['*' | '/'] <atomic>)*
-    #   string, number or (
-    # <atomic> ::= [<literal> | <variable> | '(' <expression> ')'
-    #     string, number or (
-    def parse_atom(self) -> IndentiferASTNode | NumberASTNode | ExpressionASTNode:
-        self.assert_current_token_in_set(
-            [TokenType.STRING, TokenType.NUMBER, TokenType.LEFT_PAREN]
-        )
-        if self.current_token.type == TokenType.STRING:
-            val = self.current_token.literal
-            self.advance()
-            if self.current_token.type == TokenType.LEFT_PAREN:
-                if val == "RoundUp":
-                    val = BuiltinFunctionType.ROUNDUP
-                elif val == "RoundDown":
-                    val = BuiltinFunctionType.ROUNDDOWN
-                elif val == "Minimum":
-                    val = BuiltinFunctionType.MINIMUM
-                elif val == "Maximum":
-                    val = BuiltinFunctionType.MAXIMUM
-                else:
-                    raise ValueError(f"Unknown function: {val}.")
-                self.advance()
-                args = self.parse_argument_list()
-
-                self.assert_current_token_in_set([TokenType.RIGHT_PAREN])
-                self.advance()
-
-                return FunctionCallASTNode(val, args)
-            else:
-                return IndentiferASTNode(val)
-
-        elif self.current_token.type == TokenType.NUMBER:
-            val = self.current_token.literal
-            self.advance()
-            return NumberASTNode(val)
-        elif self.current_token.type == TokenType.LEFT_PAREN:
-            # Consume (
-            self.advance()
-
-            value = self.parse_add_expression()
-
-            self.assert_current_token_in_set([TokenType.RIGHT_PAREN])
-            # Consume )
-            self.advance()
-
-            return ExpressionASTNode(value)
-
-    def parse_mul_expression(self) -> BinOpASTNode:
-        self.assert_current_token_in_set(
-            [TokenType.STRING, TokenType.NUMBER, TokenType.LEFT_PAREN]
-        )
-
-        term = self.parse_atom()
+    # <atomic> ::= <number> | <variable> | <function> '(' <expression> (',' <expression>)* ')' | '(' <expression> ')'
+    #
+    # Expressions are parsed with the shunting-yard algorithm using explicit operand and operator stacks, so neither
+    # long operator chains nor deeply nested parentheses and function calls recurse. Open parentheses and function
+    # calls are kept on the operator stack as frames.
+    def parse_expression(self) -> ExpressionASTNode | BinOpASTNode:
+        operands = []
+        operators: list[tuple] = []
+
+        def reduce(precedence=0):
+            while operators and operators[-1][0] == "operator":
+                _, operator_precedence, operator_type = operators[-1]
+                if operator_precedence < precedence:
+                    break
+                operators.pop()
+                rhs = operands.pop()
+                lhs = operands.pop()
+                operands.append(BinOpASTNode(lhs, rhs, operator_type))
 
+        expect_operand = True
         while True:
-            operator_map = {
-                TokenType.MULTIPLY: BuiltinFunctionType.MULTIPLY,
-                TokenType.DIVIDE: BuiltinFunctionType.DIVIDE,
-            }
-
-            if self.current_token.type in operator_map.keys():
-                op = operator_map[self.current_token.type]
-                self.advance()
-                rhs = self.parse_atom()
-                term = BinOpASTNode(term, rhs, op)
-            else:
+            token_type = self.current_token.type
+            if expect_operand:
+                if (
+                    token_type == TokenType.RIGHT_PAREN
+                    and operators
+                    and operators[-1][0] == "call"
+                    and operators[-1][2] == len(operands)
+                ):
+                    # An empty argument list.
+                    expect_operand = False
+                    continue
                 self.assert_current_token_in_set(
-                    [
-                        TokenType.RIGHT_PAREN,
-                        TokenType.PLUS,
-                        TokenType.MINUS,
-                        TokenType.RIGHT_DOUBLE_CURLY_PAREN,
-                        TokenType.COMMA,
-                    ]
+                    [TokenType.STRING, TokenType.NUMBER, TokenType.LEFT_PAREN]
                 )
-                break
-        return term
-
-    def parse_add_expression(self) -> BinOpASTNode:
-        self.assert_current_token_in_set(
-            [TokenType.STRING, TokenType.NUMBER, TokenType.LEFT_PAREN]
-        )
+                if token_type == TokenType.LEFT_PAREN:
+                    operators.append(("paren",))
+                    self.advance()
+                    continue
 
-        term = self.parse_mul_expression()
+                value = self.current_token.literal
+                self.advance()
+                if token_type == TokenType.NUMBER:
+                    operands.append(NumberASTNode(value))
+                elif self.current_token.type == TokenType.LEFT_PAREN:
+                    operators.append(("call", get_function(value), len(operands)))
+                    self.advance()
+                    continue
+                else:
+                    operands.append(IndentiferASTNode(value))
+                expect_operand = False
 
-        while True:
-            operator_map = {
-                TokenType.PLUS: BuiltinFunctionType.ADD,
-                TokenType.MINUS: BuiltinFunctionType.SUBTRACT,
-            }
+            elif token_type in BINARY_OPERATORS:
+                precedence, operator_type = BINARY_OPERATORS[token_type]
+                reduce(precedence)
+                operators.append(("operator", precedence, operator_type))
+                self.advance()
+                expect_operand = True
+
+            elif token_type == TokenType.RIGHT_PAREN and operators:
+                reduce()
+                if not operators:
+                    # The parenthesis closes nothing, so it ends the expression and the caller reports it.
+                    return operands[0]
+                frame = operators.pop()
+                if frame[0] == "paren":
+                    operands[-1] = ExpressionASTNode(operands[-1])
+                else:
+                    _, function, start = frame
+                    arguments = operands[start:]
+                    del operands[start:]
+                    if len(arguments) != function.arity:
+                        raise ValueError(
+                            f"Invalid number of arguments. {function.name} requires {function.arity} arguments. "
+                            f"{len(arguments)} were provided."
+                        )
+                    operands.append(FunctionCallASTNode(function, arguments))
+                self.advance()
 
-            if self.current_token.type in operator_map.keys():
-                op = operator_map[self.current_token.type]
+            elif token_type == TokenType.COMMA and operators:
+                reduce()
+                if not operators:
+                    return operands[0]
+                if operators[-1][0] != "call":
+                    self.assert_current_token_in_set([TokenType.RIGHT_PAREN])
                 self.advance()
-                rhs = self.parse_mul_expression()
-                term = BinOpASTNode(term, rhs, op)
+                if self.current_token.type == TokenType.RIGHT_PAREN:
+                    raise ValueError(
+                        "Unexpected end of argument list. Expected term after comma."
+                    )
+                expect_operand = True
+
             else:
-                self.assert_current_token_in_set(
-                    [
-                        TokenType.RIGHT_PAREN,
-                        TokenType.MULTIPLY,
-                        TokenType.DIVIDE,
-                        TokenType.RIGHT_DOUBLE_CURLY_PAREN,
-                        TokenType.COMMA,
-                    ]
-                )
-                break
-        return term
+                self.assert_current_token_in_set(EXPRESSION_TERMINATORS)
+                if operators:
+                    reduce()
+                if operators:
+                    # An unclosed parenthesis or argument list.
+                    self.assert_current_token_in_set([TokenType.RIGHT_PAREN])
+                return operands[0]
 
     def parse_foreach_line(self) -> LineASTNode:
         self.assert_current_token_in_set(
@@ -222,8 +224,16 @@ class Parser:
                 self.tokens.lexer.trim_whitespace()
                 self.advance()
                 next_token = self.current_token
-                if next_token.type == TokenType.FOREACH:
-                    raise ValueError("Cannot nest foreach loops.")
+                if next_token.type in [TokenType.FOREACH, TokenType.INCLUDE]:
+                    self.tokens.push_back_token(next_token)
+                    self.current_token = line_start_token
+                    if next_token.type == TokenType.FOREACH:
+                        body.append(LineASTNode([self.parse_foreach_block()]))
+                    else:
+                        body.extend(self.parse_include_block())
+                    self.assert_current_token_in_set([TokenType.NEWLINE], message)
+                    self.advance()
+                    continue
                 elif next_token.type == TokenType.ENDFOREACH:
                     self.advance()
 
@@ -260,6 +270,49 @@ class Parser:
 
         return ForEachBlockASTNode(iterand, iterator, body)
 
+    def at_include_block(self) -> bool:
+        """
+        Returns whether the current token opens an include block, without consuming it.
+        """
+        if self.current_token.type != TokenType.LEFT_DOUBLE_CURLY_PAREN:
+            return False
+        line_start_token = self.current_token
+        self.tokens.lexer.trim_whitespace()
+        self.advance()
+        next_token = self.current_token
+        self.tokens.push_back_token(next_token)
+        self.current_token = line_start_token
+        self.tokens.lexer.keep_whitespace()
+        return next_token.type == TokenType.INCLUDE
+
+    def parse_include_block(self) -> tuple[LineASTNode, ...]:
+        """
+        Parses an include block and returns the lines of the included template, which replace the line holding the
+        block.
+        """
+        self.assert_current_token_in_set([TokenType.LEFT_DOUBLE_CURLY_PAREN])
+        self.tokens.lexer.trim_whitespace()
+        self.advance()
+
+        self.assert_current_token_in_set([TokenType.INCLUDE])
+        self.advance()
+
+        self.assert_current_token_in_set([TokenType.STRING])
+        name = self.current_token.literal
+        self.advance()
+
+        self.assert_current_token_in_set([TokenType.RIGHT_DOUBLE_CURLY_PAREN])
+        self.tokens.lexer.keep_whitespace()
+        self.advance()
+
+        self.assert_current_token_in_set(
+            [TokenType.NEWLINE, TokenType.EOF],
+            "Include blocks must be the only text on a line.",
+        )
+        if self.loader is None:
+            raise ValueError(f"Cannot include {name}, no loader was given.")
+        return self.loader.load(name, self.including)
+
     def parse_template_expression(self) -> ExpressionBlockASTNode:
         self.assert_current_token_in_set([TokenType.LEFT_DOUBLE_CURLY_PAREN])
         self.tokens.lexer.trim_whitespace()
@@ -277,7 +330,13 @@ class Parser:
             TokenType.NUMBER,
             TokenType.LEFT_PAREN,
         ]:
-            node = ExpressionBlockASTNode(self.parse_add_expression())
+            value = self.parse_expression()
+
+        format_spec = None
+        if self.current_token.type == TokenType.FORMAT_SPEC:
+            format_spec = parse_format_spec(self.current_token.literal)
+            self.advance()
+        node = ExpressionBlockASTNode(value, format_spec)
 
         self.assert_current_token_in_set([TokenType.RIGHT_DOUBLE_CURLY_PAREN])
         self.tokens.lexer.keep_whitespace()
@@ -297,6 +356,8 @@ class Parser:
 
         if self.current_token.type == TokenType.ENDFOREACH:
             raise ValueError("Unexpected endforeach block.")
+        if self.current_token.type == TokenType.INCLUDE:
+            raise ValueError("Include blocks must be the only text on a line.")
 
         self.assert_current_token_in_set(
             [
@@ -344,7 +405,11 @@ class Parser:
                 content.append(self.parse_text())
         return LineASTNode(content)
 
-    def parse_document(self) -> DocumentASTNode:
+    def iter_lines(self) -> Iterator[LineASTNode]:
+        """
+        Parses a document one line at a time, yielding each line as soon as it is complete. A line holding a
+        foreach block is complete at the end of the block.
+        """
         self.assert_current_token_in_set(
             [
                 TokenType.LEFT_DOUBLE_CURLY_PAREN,
@@ -354,12 +419,14 @@ class Parser:
             ]
         )
 
-        lines = []
         if self.current_token.type == TokenType.EOF:
-            return DocumentASTNode(lines)
+            return
 
         while True:
-            lines.append(self.parse_line())
+            if self.at_include_block():
+                yield from self.parse_include_block()
+            else:
+                yield self.parse_line()
             line_ending_tok = self.current_token
             if line_ending_tok.type == TokenType.EOF:
                 break
@@ -369,10 +436,11 @@ class Parser:
             if (line_ending_tok.type == TokenType.NEWLINE) and (
                 self.current_token.type == TokenType.EOF
             ):
-                lines.append(LineASTNode([]))
+                yield LineASTNode([])
                 break
 
-        return DocumentASTNode(lines)
+    def parse_document(self) -> DocumentASTNode:
+        return DocumentASTNode(list(self.iter_lines()))
 
     def assert_current_token_in_set(self, expected: list[TokenType], message=None):
         if self.current_token.type not in expected:
@@ -381,16 +449,58 @@ class Parser:
             raise ValueError(message)
 
 
-def parse(source: str) -> Template:
+def parse(source: str, escape: Optional[str] = None, loader=None) -> Template:
     """
     Given a template source as a string, parse the template into a Template object. This method also verifies that a template is valid.
+
+    escape selects an escaping mode for the output of expressions which are not numbers, one of "html", "csv" or
+    "json". loader is a TemplateLoader resolving the names in include blocks.
     """
+    if metrics.ENABLED:
+        return _parse_with_metrics(source, escape, loader)
+
     lexer = Scanner(source)
     token_buffer = TokenSource(lexer)
-    parser = Parser(token_buffer)
+    parser = Parser(token_buffer, loader)
     parsed_template = parser.parse_document()
     slots = [Slot(c.identifier, c.type) for c in parsed_template.get_parameters()]
-    return Template(parsed_template, source, slots)
+    return Template(parsed_template, source, slots, escape)
+
+
+class _TimedTokenSource(TokenSource):
+    """
+    A token source recording the time spent scanning.
+    """
+
+    def __init__(self, lexer: Scanner):
+        super().__init__(lexer)
+        self.elapsed = 0.0
+
+    def get_next_token(self):
+        start = time.perf_counter()
+        token = super().get_next_token()
+        self.elapsed += time.perf_counter() - start
+        return token
+
+
+def _parse_with_metrics(source: str, escape: Optional[str], loader) -> Template:
+    """
+    Parses source as parse does, recording the time spent scanning, parsing, inferring slot types and compiling.
+    """
+    token_buffer = _TimedTokenSource(Scanner(source))
+    start = time.perf_counter()
+    parsed_template = Parser(token_buffer, loader).parse_document()
+    parsed = time.perf_counter()
+    slots = [Slot(c.identifier, c.type) for c in parsed_template.get_parameters()]
+    inferred = time.perf_counter()
+    template = Template(parsed_template, source, slots, escape)
+    compiled = time.perf_counter()
+
+    metrics.PARSE_SECONDS.observe(token_buffer.elapsed, "scan")
+    metrics.PARSE_SECONDS.observe(parsed - start - token_buffer.elapsed, "parse")
+    metrics.PARSE_SECONDS.observe(inferred - parsed, "inference")
+    metrics.PARSE_SECONDS.observe(compiled - inferred, "compile")
+    return template
 
 
 def parse_from_scanner(l: Scanner):
@@ -0,0 +1,220 @@
+"""
+Allocation profiling for parsing and filling a template, built on tracemalloc.
+
+profile_allocations parses and fills a template one phase at a time, measuring the memory allocated by each phase:
+
+- scan: tokenising the source, in the same scanning modes the parser selects.
+- parse: building the document tree from the tokens.
+- infer: inferring the types of the slots.
+- compile: compiling the document tree into a render plan.
+- fill: rendering the plan with the given values.
+
+tracemalloc only sees memory which is still allocated, so a phase is described by the memory it holds when it ends
+(size and blocks) and by the most memory it held at once (peak). Temporary objects, such as the strings joined into
+a line, only show in the peak. The memory held by the document tree is also broken down by node type.
+
+Profiling slows allocation heavily, so profiles are for comparing templates and versions, not for timing.
+"""
+
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Mapping
+
+from yatla.ast_nodes import ASTNode, DocumentASTNode
+from yatla.compiler import compile_document
+from yatla.lexer import Scanner, Token
+from yatla.parser import Parser, TokenSource
+
+PHASES = ("scan", "parse", "infer", "compile", "fill")
+
+
+@dataclass
+class AllocationStats:
+    """
+    The memory allocated by a phase in bytes. size and blocks count the memory allocated during the phase which is
+    still allocated when it ends, and peak the most memory allocated at once during the phase.
+    """
+
+    size: int
+    blocks: int
+    peak: int
+
+
+@dataclass
+class NodeAllocations:
+    """
+    The number of nodes of one type in a document tree, and the bytes they hold, counting each node's attributes,
+    child tuples and strings but not its child nodes.
+    """
+
+    count: int
+    size: int
+
+
+@dataclass
+class AllocationProfile:
+    """
+    The allocations of each phase, keyed by the names in PHASES, and of each node type of the document tree, keyed
+    by class name.
+    """
+
+    phases: dict[str, AllocationStats]
+    nodes: dict[str, NodeAllocations]
+
+    def format(self) -> str:
+        """
+        Formats the profile as a table.
+        """
+        lines = [f"{'phase':<24} {'size':>12} {'blocks':>10} {'peak':>12}"]
+        for name, stats in self.phases.items():
+            lines.append(
+                f"{name:<24} {stats.size:>12,} {stats.blocks:>10,} {stats.peak:>12,}"
+            )
+        lines.append("")
+        lines.append(f"{'node type':<24} {'size':>12} {'count':>10}")
+        for name, stats in sorted(
+            self.nodes.items(), key=lambda item: item[1].size, reverse=True
+        ):
+            lines.append(f"{name:<24} {stats.size:>12,} {stats.count:>10,}")
+        return "\n".join(lines)
+
+
+class _RecordingScanner(Scanner):
+    """
+    A scanner recording each token it yields and the scanning mode the token was scanned in.
+    """
+
+    def __init__(self, source: str):
+        super().__init__(source)
+        self.tokens: list[Token] = []
+        self.modes: list[bool] = []
+
+    def scan(self):
+        tokens = super().scan()
+        while True:
+            self.modes.append(self.break_on_whitespace)
+            token = next(tokens, None)
+            if token is None:
+                return
+            self.tokens.append(token)
+            yield token
+
+
+class _ReplayLexer:
+    """
+    Replays scanned tokens to a parser. The scanning modes were already applied when the tokens were scanned.
+    """
+
+    def __init__(self, tokens: list[Token]):
+        self.tokens = tokens
+
+    def scan(self):
+        return iter(self.tokens)
+
+    def trim_whitespace(self):
+        pass
+
+    def keep_whitespace(self):
+        pass
+
+
+def _scan(source: str, modes: list[bool]) -> list[Token]:
+    scanner = Scanner(source)
+    tokens = scanner.scan()
+    scanned = []
+    for mode in modes:
+        scanner.break_on_whitespace = mode
+        scanned.append(next(tokens))
+    return scanned
+
+
+def _measure(function: Callable[[], Any]) -> tuple[Any, AllocationStats]:
+    gc.collect()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    result = function()
+
+    end_size, peak = tracemalloc.get_traced_memory()
+    end_blocks = len(tracemalloc.take_snapshot().traces)
+    return result, AllocationStats(end_size - size, end_blocks - blocks, peak - size)
+
+
+def _own_objects(node: ASTNode) -> Iterable:
+    # The attributes of a node which belong to it rather than to a child node.
+    yield node.__dict__
+    for value in node.__dict__.values():
+        if isinstance(value, tuple):
+            yield value
+        elif isinstance(value, str):
+            yield value
+
+
+def node_allocations(document: DocumentASTNode) -> dict[str, NodeAllocations]:
+    """
+    Returns the number of nodes of each type in a document tree and the bytes they hold. Objects shared between
+    nodes, such as interned strings, are counted once.
+    """
+    nodes: dict[str, NodeAllocations] = {}
+    seen = set()
+    stack: list = [document]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        size = sys.getsizeof(node)
+        for value in _own_objects(node):
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+        for value in node.__dict__.values():
+            if isinstance(value, ASTNode):
+                stack.append(value)
+            elif isinstance(value, tuple):
+                stack.extend(v for v in value if isinstance(v, ASTNode))
+
+        stats = nodes.setdefault(type(node).__name__, NodeAllocations(0, 0))
+        stats.count += 1
+        stats.size += size
+    return nodes
+
+
+def profile_allocations(
+    source: str,
+    values: Mapping[
+        str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+    ],
+    loader=None,
+) -> AllocationProfile:
+    """
+    Parses source and fills it with values one phase at a time, returning the memory allocated by each phase and
+    held by each node type of the document tree. loader resolves include blocks; the included templates are parsed
+    before profiling starts.
+    """
+    # The parser switches the scanner between modes while it parses, so the modes are recorded by a first parse
+    # and replayed when scanning is measured on its own.
+    recording = _RecordingScanner(source)
+    Parser(TokenSource(recording), loader).parse_document()
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        tokens, scan = _measure(lambda: _scan(source, recording.modes))
+        document, parse = _measure(
+            lambda: Parser(TokenSource(_ReplayLexer(tokens)), loader).parse_document()
+        )
+        _, infer = _measure(document.get_parameters)
+        plan, compile = _measure(lambda: compile_document(document))
+        _, fill = _measure(lambda: plan.render(values))
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    phases = dict(zip(PHASES, (scan, parse, infer, compile, fill)))
+    return AllocationProfile(phases, node_allocations(document))
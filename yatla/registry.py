@@ -0,0 +1,264 @@
+"""
+Registries of named templates. TemplateRegistry serves prefork servers, where a parent process loads every template
+before forking its workers. DirectoryRegistry serves the templates in a directory to a long running process,
+reloading templates whose files change without blocking the threads filling them.
+
+Forked workers share the parent's memory pages until they write to them. Filling a template only reads it, but the
+garbage collector writes to the header of every object it tracks each time it runs a full collection, which copies
+the pages holding the templates into each worker. Freezing the registry moves every object allocated so far into the
+collector's permanent generation, which collections skip, so the templates stay shared. Reference counting still
+writes to the objects used by a fill, so some pages are copied regardless; worker_memory reports how much memory
+each worker holds on its own.
+
+A typical parent process::
+
+    gc.disable()
+    registry = TemplateRegistry()
+    registry.register_file("invoice", "templates/invoice.txt")
+    registry.freeze()
+    # fork the workers, each calling gc.enable() once started
+"""
+
+import fnmatch
+import gc
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from yatla.parser import parse
+from yatla.template import Template
+
+
+class TemplateRegistry:
+    """
+    Parsed and compiled templates keyed by name. Templates can only be added before the registry is frozen.
+    """
+
+    def __init__(self):
+        self._templates: dict[str, Template] = {}
+        self._frozen = False
+
+    def register(self, name: str, source: str) -> Template:
+        """
+        Parses source and stores it under name.
+        """
+        if self._frozen:
+            raise ValueError(
+                f"Cannot register template {name}, the registry is frozen."
+            )
+        template = parse(source)
+        self._templates[name] = template
+        return template
+
+    def register_file(self, name: str, path: str) -> Template:
+        """
+        Parses the template stored at path and stores it under name.
+        """
+        with open(path) as f:
+            return self.register(name, f.read())
+
+    def freeze(self):
+        """
+        Collects garbage, then moves every object the collector tracks, including the templates, into the permanent
+        generation. Call this in the parent process immediately before forking workers.
+        """
+        gc.collect()
+        gc.freeze()
+        self._frozen = True
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def get(self, name: str) -> Template:
+        if name not in self._templates:
+            raise ValueError(f"Unknown template: {name}.")
+        return self._templates[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._templates)
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
+@dataclass
+class WorkerMemory:
+    """
+    The memory of a process in bytes. The resident set size (rss) counts every page the process has mapped, the
+    proportional set size (pss) divides shared pages between the processes sharing them, and the unique set size
+    (uss) counts only the pages no other process shares.
+    """
+
+    rss: int
+    pss: int
+    uss: int
+
+
+def worker_memory(pid: int | str = "self") -> Optional[WorkerMemory]:
+    """
+    Reads the memory use of a process from /proc/<pid>/smaps_rollup. Returns None where that file is unavailable,
+    for example on platforms other than Linux.
+    """
+    try:
+        with open(os.path.join("/proc", str(pid), "smaps_rollup")) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    fields = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        fields[key] = int(value.split()[0]) * 1024
+    return WorkerMemory(
+        fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+    )
+
+
+class DirectoryRegistry:
+    """
+    The templates in a directory and its subdirectories, keyed by their path relative to the directory with /
+    separators, for example "emails/welcome.txt". Only files whose name matches pattern are loaded.
+
+    refresh() polls the files for changes and reparses the ones which changed, and start() runs it every
+    poll_interval seconds in a background thread. A file is read when its modification time or size changes, and
+    parsed again only when the hash of its contents changes too. Templates which fail to load, for any reason, keep
+    their previous version, and the error is reported in errors. A background refresh which fails is retried at the
+    next poll, and its error is reported in poll_error. Each refresh swaps in a complete new mapping, so get never
+    waits for a reload and never sees a partial one.
+    """
+
+    def __init__(self, directory: str, pattern: str = "*", poll_interval: float = 1.0):
+        self.directory = directory
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+
+        self._templates: dict[str, Template] = {}
+        self._files: dict[str, tuple[int, int, bytes]] = {}
+        self._errors: dict[str, str] = {}
+        self._poll_error: Optional[str] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.refresh()
+
+    def _list_files(self) -> dict[str, str]:
+        files = {}
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if fnmatch.fnmatch(name, self.pattern):
+                    files[name] = path
+        return files
+
+    def refresh(self) -> list[str]:
+        """
+        Reloads the templates which were added, changed or removed since the previous refresh and returns their
+        names.
+        """
+        from hashlib import blake2b
+
+        with self._refresh_lock:
+            templates = dict(self._templates)
+            files = {}
+            errors = {}
+            changed = []
+
+            for name, path in self._list_files().items():
+                try:
+                    stat = os.stat(path)
+                    previous = self._files.get(name)
+                    if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                        files[name] = previous
+                        if name in self._errors:
+                            errors[name] = self._errors[name]
+                        continue
+
+                    with open(path, "rb") as f:
+                        content = f.read()
+                    digest = blake2b(content).digest()
+                    files[name] = (stat.st_mtime_ns, stat.st_size, digest)
+                    if previous and previous[2] == digest:
+                        if name in self._errors:
+                            errors[name] = self._errors[name]
+                        continue
+
+                    templates[name] = parse(content.decode("utf-8"))
+                    changed.append(name)
+                except Exception as e:
+                    # Any error, such as a RecursionError for a deeply nested template, only affects this file.
+                    errors[name] = f"{type(e).__name__}: {e}"
+
+            for name in templates.keys() - files.keys():
+                del templates[name]
+                changed.append(name)
+
+            self._files = files
+            self._errors = errors
+            if changed:
+                self._templates = templates
+            return changed
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            # The thread must outlive a failed refresh, or templates would stop reloading for good.
+            try:
+                self.refresh()
+                self._poll_error = None
+            except Exception as e:
+                self._poll_error = f"{type(e).__name__}: {e}"
+
+    def start(self):
+        """
+        Starts refreshing the registry in a background thread.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._poll, name="yatla-registry", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread, waiting for a refresh in progress to finish.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def errors(self) -> dict[str, str]:
+        """
+        The error raised by each file which failed to load at the latest refresh.
+        """
+        return dict(self._errors)
+
+    @property
+    def poll_error(self) -> Optional[str]:
+        """
+        The error raised by the latest refresh of the background thread, or None if it succeeded.
+        """
+        return self._poll_error
+
+    def get(self, name: str) -> Template:
+        template = self._templates.get(name)
+        if template is None:
+            raise ValueError(f"Unknown template: {name}.")
+        return template
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._templates)
+
+    def __len__(self) -> int:
+        return len(self._templates)
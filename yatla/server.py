@@ -0,0 +1,142 @@
+"""
+A long running render server. Requests and responses are single lines of JSON, exchanged over stdin/stdout or a
+Unix domain socket.
+
+A request names a template, either by a registered name or by a file path, and provides the values to fill it with::
+
+    {"id": 1, "template": "invoice.txt", "values": {"total": 10}}
+
+The response echoes the id and holds either the output or an error message::
+
+    {"id": 1, "output": "Total: 10"}
+"""
+
+import json
+import os
+import socketserver
+import stat
+import threading
+from typing import IO, Optional
+
+from yatla import metrics
+from yatla.budget import RenderBudget
+from yatla.parser import parse
+from yatla.template import Template
+
+
+class TemplateCache:
+    """
+    Parsed templates keyed by name or path. Templates loaded from a path are parsed again when the file's
+    modification time or size changes.
+    """
+
+    def __init__(self):
+        self._named: dict[str, Template] = {}
+        self._files: dict[str, tuple[int, int, Template]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, source: str):
+        """
+        Parses source and stores it under name.
+        """
+        template = parse(source)
+        with self._lock:
+            self._named[name] = template
+
+    def get(self, name_or_path: str) -> Template:
+        if template := self._named.get(name_or_path):
+            if metrics.ENABLED:
+                metrics.CACHE_REQUESTS.inc("template", "hit")
+            return template
+
+        file_stat = os.stat(name_or_path)
+        cached = self._files.get(name_or_path)
+        if cached and cached[:2] == (file_stat.st_mtime_ns, file_stat.st_size):
+            if metrics.ENABLED:
+                metrics.CACHE_REQUESTS.inc("template", "hit")
+            return cached[2]
+
+        with open(name_or_path) as f:
+            template = parse(f.read())
+        with self._lock:
+            self._files[name_or_path] = (
+                file_stat.st_mtime_ns,
+                file_stat.st_size,
+                template,
+            )
+        if metrics.ENABLED:
+            metrics.CACHE_REQUESTS.inc("template", "miss")
+        return template
+
+
+class RenderServer:
+    """
+    Answers render requests using a shared template cache. Every render is limited by budget, if one is given.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[TemplateCache] = None,
+        budget: Optional[RenderBudget] = None,
+    ):
+        self.cache = cache or TemplateCache()
+        self.budget = budget
+
+    def handle(self, request: str) -> str:
+        """
+        Renders a single JSON request line and returns the JSON response, without a trailing newline.
+        """
+        request_id = None
+        try:
+            message = json.loads(request)
+            request_id = message.get("id")
+            template = self.cache.get(message["template"])
+            response = {
+                "id": request_id,
+                "output": template.fill(message["values"], self.budget),
+            }
+        except Exception as e:
+            response = {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+        return json.dumps(response)
+
+    def serve_stream(self, requests: IO[str], responses: IO[str]):
+        """
+        Answers one request per line of requests until it is exhausted. Blank lines are ignored.
+        """
+        for line in requests:
+            if line.strip():
+                responses.write(self.handle(line) + "\n")
+                responses.flush()
+
+    def serve_unix_socket(self, path: str):
+        """
+        Listens on a Unix domain socket at path, handling each connection in its own thread. Blocks until the
+        process is interrupted. A socket already at path is replaced, and a ValueError is raised if path is any other
+        file.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.decode("utf-8")
+                    if line.strip():
+                        response = server.handle(line) + "\n"
+                        self.wfile.write(response.encode("utf-8"))
+
+        # A socket left by a previous server is replaced, but any other file is kept.
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise ValueError(f"{path} exists and is not a socket.")
+            os.unlink(path)
+        with socketserver.ThreadingUnixStreamServer(path, Handler) as unix_server:
+            # Idle client connections must not keep the process alive on shutdown.
+            unix_server.daemon_threads = True
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.unlink(path)
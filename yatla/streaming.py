@@ -0,0 +1,124 @@
+"""
+Single pass parsing and rendering for templates which are filled exactly once, such as very large generated
+documents.
+
+Instead of building the whole document tree before rendering, each line is rendered and written out as soon as it
+has been parsed, so memory use is bounded by the largest line, which for a line holding a foreach block is the whole
+block, rather than by the size of the document.
+"""
+
+from typing import IO, Iterable, Iterator, Mapping, Optional
+
+from yatla.ast_nodes import (
+    BinOpASTNode,
+    DocumentASTNode,
+    ExpressionASTNode,
+    ExpressionBlockASTNode,
+    ForEachBlockASTNode,
+    FunctionCallASTNode,
+    LineASTNode,
+)
+from yatla.compiler import MAX_CLOSURE_NESTING, compile_document
+from yatla.lexer import Scanner
+from yatla.loader import TemplateLoader
+from yatla.parallel import ParallelRenderer, find_large_loop
+from yatla.parser import Parser, TokenSource
+from yatla.template import Slot, Template
+from yatla.validation import Constraint, compute_parameters
+
+
+def _is_deep(line: LineASTNode) -> bool:
+    """
+    Returns whether an expression in line is nested too deeply to be evaluated recursively.
+    """
+    stack = [
+        (node.value, 0)
+        for node in line.content
+        if isinstance(node, ExpressionBlockASTNode)
+    ]
+    while stack:
+        node, height = stack.pop()
+        if height > MAX_CLOSURE_NESTING:
+            return True
+        if isinstance(node, ExpressionASTNode):
+            stack.append((node.value, height))
+        elif isinstance(node, BinOpASTNode):
+            stack.extend([(node.lhs, height + 1), (node.rhs, height + 1)])
+        elif isinstance(node, FunctionCallASTNode):
+            stack.extend((argument, height + 1) for argument in node.arguments)
+    return False
+
+
+def _render_line(line: LineASTNode, values: Mapping, workers: int) -> Iterator[str]:
+    # Compiling a line costs more than evaluating it once, except for foreach blocks whose bodies are rendered
+    # once per element and for deep expressions, which the compiled plan evaluates without recursion.
+    if workers > 1 and find_large_loop(line, values):
+        with ParallelRenderer(Template(DocumentASTNode([line]), "", []), workers) as r:
+            yield from r.iter_fill(values)
+    elif any(
+        isinstance(node, ForEachBlockASTNode) for node in line.content
+    ) or _is_deep(line):
+        yield compile_document(DocumentASTNode([line])).render(values)
+    else:
+        yield line.eval(values)
+
+
+class StreamingRender:
+    """
+    Parses and renders a template source in a single pass. Iterating yields the rendered document in pieces which
+    concatenate to the output of parse(source).fill(values). Source may be a string or a file-like object, which is
+    read in chunks as rendering proceeds. Include blocks are resolved with loader.
+
+    Slots are inferred as lines are parsed, and slots holds the result once iteration has finished. Errors in the
+    template are raised when the line holding them is reached, after the preceding lines have been yielded.
+
+    With more than one worker, each large top level foreach loop is rendered in its own pool of that many worker
+    processes, and its chunks are yielded in order as they are rendered.
+    """
+
+    def __init__(
+        self,
+        source: str | IO[str] | IO[bytes],
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+        loader: Optional[TemplateLoader] = None,
+        workers: int = 1,
+    ):
+        self.source = source
+        self.values = values
+        self.loader = loader
+        self.workers = workers
+        self.slots: list[Slot] = None
+
+    def __iter__(self) -> Iterator[str]:
+        parser = Parser(TokenSource(Scanner(self.source)), self.loader)
+        constraints: dict[Constraint, None] = {}
+
+        for index, line in enumerate(parser.iter_lines()):
+            constraints.update(dict.fromkeys(line.get_parameters()))
+            if index:
+                yield "\n"
+            yield from _render_line(line, self.values, self.workers)
+
+        self.slots = [
+            Slot(c.identifier, c.type) for c in compute_parameters(list(constraints))
+        ]
+
+
+def render_stream(
+    source: str | IO[str] | IO[bytes],
+    values: Mapping[
+        str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+    ],
+    output: IO[str],
+    loader: Optional[TemplateLoader] = None,
+    workers: int = 1,
+) -> list[Slot]:
+    """
+    Parses source and writes it, filled with values, to output line by line. Returns the slots of the template.
+    """
+    render = StreamingRender(source, values, loader, workers)
+    for piece in render:
+        output.write(piece)
+    return render.slots
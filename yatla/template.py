@@ -1,10 +1,18 @@
+from __future__ import annotations
+
+import time
 from dataclasses import dataclass
-from typing import Iterable, List, Mapping
+from typing import TYPE_CHECKING, Iterable, List, Mapping, Optional
+from yatla import metrics
 from yatla.ast_nodes import DocumentASTNode
 from yatla.types import SlotType
+from yatla.validation import SlotValidator
+
+if TYPE_CHECKING:
+    from yatla.budget import CostEstimate, RenderBudget
 
 
-@dataclass
+@dataclass(frozen=True)
 class Slot:
     """
     Represents a slot in a template. Has a name which is derived from the placeholder in the template, and a type which is inferred from the
@@ -18,27 +26,102 @@ class Slot:
 class Template:
     """
     Represents a parsed template. Can be filled using a mapping of slot names to values.
+
+    Templates are immutable and filling one does not modify any shared state, so a single template may be filled
+    from several threads at once.
     """
 
     _ast: DocumentASTNode
     source: str
-    slots: List[Slot]
+    cost: CostEstimate
+    escape: Optional[str]
+
+    def __init__(
+        self,
+        _ast: DocumentASTNode,
+        source: str,
+        slots: List[Slot],
+        escape: Optional[str] = None,
+    ):
+        # The compiler, the cost model and the escapers are imported by the first template, so that importing the
+        # parser stays fast.
+        from yatla.budget import estimate_cost
+        from yatla.compiler import compile_document
+        from yatla.escaping import get_escaper
+
+        set_attribute = super().__setattr__
+        set_attribute("_ast", _ast)
+        set_attribute("source", source)
+        set_attribute("_slots", tuple(slots))
+        set_attribute("escape", escape)
+        set_attribute("validator", SlotValidator([(s.name, s.type) for s in slots]))
+        set_attribute("_plan", compile_document(_ast, get_escaper(escape)))
+        set_attribute("cost", estimate_cost(_ast))
 
-    def __init__(self, _ast: DocumentASTNode, source: str, slots: List[Slot]):
-        self._ast = _ast
-        self.source = source
-        self.slots = slots
+    def __setattr__(self, name, value):
+        raise AttributeError("Template objects are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Template objects are immutable.")
+
+    @property
+    def slots(self) -> List[Slot]:
+        """
+        The slots of the template. Each access returns a new list.
+        """
+        return list(self._slots)
 
     def fill(
         self,
         values: Mapping[
             str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
         ],
+        budget: Optional[RenderBudget] = None,
+        workers: int = 1,
     ) -> str:
         """
-        Fill the slots in the template using the provided values.
+        Fill the slots in the template using the provided values. If the template has an escaping mode, the output of
+        its expressions is escaped, except for numbers. If a budget is given, a BudgetExceededError is raised as soon
+        as the render exceeds it. With more than one worker, large top level foreach loops are rendered in a pool of
+        that many worker processes, see yatla.parallel. Each such fill starts a new pool and sends it the template,
+        which takes tens of milliseconds, so templates filled repeatedly should use a ParallelRenderer, which keeps
+        its pool between fills.
+        """
+        if not metrics.ENABLED:
+            if workers == 1:
+                return self._plan.render(values, budget)
+            return self._fill_parallel(values, budget, workers)
+
+        start = time.perf_counter()
+        if workers == 1:
+            output = self._plan.render(values, budget)
+        else:
+            output = self._fill_parallel(values, budget, workers)
+        metrics.FILL_SECONDS.observe(time.perf_counter() - start)
+        metrics.OUTPUT_CHARACTERS.inc(amount=len(output))
+        return output
+
+    def _fill_parallel(
+        self, values: Mapping, budget: Optional[RenderBudget], workers: int
+    ) -> str:
+        if budget is not None:
+            raise ValueError("A budget cannot be used with more than one worker.")
+        # The parallel module imports this one, and multiprocessing is only needed by parallel fills.
+        from yatla.parallel import ParallelRenderer
+
+        with ParallelRenderer(self, workers) as renderer:
+            return renderer.fill(values)
+
+    def validate(
+        self,
+        values: Mapping[
+            str, int | float | str | Iterable[int] | Iterable[float] | Iterable[str]
+        ],
+    ):
+        """
+        Check that values provides a correctly typed value for every slot, raising a SlotValidationError otherwise.
         """
-        return self._ast.eval(values)
+        self.validator.validate(values)
 
     def __repr__(self) -> str:
         return f"Template(source='{self.source}', slots={self.slots})"
@@ -1,4 +1,8 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
 from enum import Enum
+from typing import Optional
 
 
 class SlotType(Enum):
@@ -12,3 +16,45 @@ class SlotType(Enum):
     StringArray = 4
     NumArray = 5
     AnyArray = 6
+
+
+@dataclass(frozen=True)
+class ArrayType:
+    """
+    The type of an array whose elements are arrays, such as the iterator of a foreach loop whose iterand is itself
+    iterated over. Arrays of strings, numbers and either are represented by SlotType.StringArray, SlotType.NumArray
+    and SlotType.AnyArray instead.
+    """
+
+    element: SlotType | ArrayType
+
+    @property
+    def name(self) -> str:
+        return f"{self.element.name}Array"
+
+
+_SCALAR_ARRAYS = {
+    SlotType.String: SlotType.StringArray,
+    SlotType.Num: SlotType.NumArray,
+    SlotType.Any: SlotType.AnyArray,
+}
+
+_ARRAY_ELEMENTS = {array: element for element, array in _SCALAR_ARRAYS.items()}
+
+
+def array_of(element: SlotType | ArrayType) -> SlotType | ArrayType:
+    """
+    Returns the type of an array of element.
+    """
+    if element in _SCALAR_ARRAYS:
+        return _SCALAR_ARRAYS[element]
+    return ArrayType(element)
+
+
+def element_type(array: SlotType | ArrayType) -> Optional[SlotType | ArrayType]:
+    """
+    Returns the type of the elements of array, or None if array is not an array type.
+    """
+    if isinstance(array, ArrayType):
+        return array.element
+    return _ARRAY_ELEMENTS.get(array)
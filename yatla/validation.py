@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 from itertools import groupby
 from operator import attrgetter
+from typing import Any, Callable, Iterable, Mapping, Optional
 
-from yatla.types import SlotType
+from yatla.types import ArrayType, SlotType, array_of, element_type
 
 
 @dataclass(frozen=True)
@@ -31,20 +32,40 @@ def group_constraints_by_identifier(
     return grouped_constraints
 
 
-def convert_to_shared_subtype(constraints: list[Constraint]):
-    grouped = group_constraints_by_identifier(constraints)
-    new_constraints = []
-    for identifier, c in grouped.items():
-        new_type = None
-        if len(c) == 1:
-            new_type = c[0]
+def shared_subtype(
+    identifier: str, types: Iterable[SlotType | ArrayType]
+) -> Optional[SlotType | ArrayType]:
+    """
+    Returns the type satisfying every constraint placed on a slot. Any is narrowed by String or Num, also in the
+    elements of arrays, and other types must agree exactly. Returns None for a slot used with conflicting types,
+    which is left untyped.
+    """
+    shared = None
+    for type in types:
+        if shared is None or shared == type:
+            shared = type
+        elif shared == SlotType.Any and type in (SlotType.String, SlotType.Num):
+            shared = type
+        elif type == SlotType.Any and shared in (SlotType.String, SlotType.Num):
+            continue
+        elif element_type(shared) is not None and element_type(type) is not None:
+            element = shared_subtype(
+                identifier, (element_type(shared), element_type(type))
+            )
+            if element is None:
+                return None
+            shared = array_of(element)
         else:
-            if set(c) == set([SlotType.Any, SlotType.Num]):
-                new_type = SlotType.Num
+            return None
+    return shared
 
-        new_constraints.append(Constraint(identifier, new_type))
 
-    return new_constraints
+def convert_to_shared_subtype(constraints: list[Constraint]):
+    grouped = group_constraints_by_identifier(constraints)
+    return [
+        Constraint(identifier, shared_subtype(identifier, c))
+        for identifier, c in grouped.items()
+    ]
 
 
 def compute_parameters(constraints: list[Constraint]) -> list[Constraint]:
@@ -54,3 +75,137 @@ def compute_parameters(constraints: list[Constraint]) -> list[Constraint]:
 
     constraints = convert_to_shared_subtype(constraints)
     return constraints
+
+
+class SlotValidationError(ValueError):
+    """
+    Raised when the values provided to a template do not match the template's slots. The errors attribute lists
+    every problem found, not only the first.
+    """
+
+    def __init__(self, errors: list[str]):
+        super().__init__("Invalid slot values. " + " ".join(errors))
+        self.errors = errors
+
+
+def _is_num(value) -> bool:
+    return type(value) in (int, float) or (
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+    )
+
+
+def _is_string(value) -> bool:
+    return isinstance(value, str)
+
+
+def _is_any(value) -> bool:
+    return _is_string(value) or _is_num(value)
+
+
+def _is_value(value) -> bool:
+    return True
+
+
+# Slots used with conflicting types are inferred as None, and accept any value.
+_ELEMENT_CHECKS = {
+    SlotType.String: (_is_string, "a string"),
+    SlotType.Num: (_is_num, "a number"),
+    SlotType.Any: (_is_any, "a string or a number"),
+    None: (_is_value, "a value"),
+}
+
+_PLURAL_DESCRIPTIONS = {
+    SlotType.String: "strings",
+    SlotType.Num: "numbers",
+    SlotType.Any: "strings or numbers",
+    None: "values",
+}
+
+
+def _element_check(type: SlotType | ArrayType) -> tuple[Callable[[Any], bool], str]:
+    """
+    Returns a predicate for the elements of an array of type, and a description of a valid element.
+    """
+    if type in _ELEMENT_CHECKS:
+        return _ELEMENT_CHECKS[type]
+
+    element = element_type(type)
+    is_valid_element, _ = _element_check(element)
+    plural = element
+    description = "a list of "
+    while plural not in _PLURAL_DESCRIPTIONS:
+        plural = element_type(plural)
+        description += "lists of "
+
+    def is_valid(value) -> bool:
+        return isinstance(value, (list, tuple)) and all(
+            is_valid_element(e) for e in value
+        )
+
+    return is_valid, description + _PLURAL_DESCRIPTIONS[plural]
+
+
+def _compile_check(name: str, type: SlotType | ArrayType):
+    """
+    Builds a function which returns an error message for an invalid value, or None for a valid one.
+    """
+    if type in _ELEMENT_CHECKS:
+        is_valid, description = _ELEMENT_CHECKS[type]
+
+        def check(value):
+            if not is_valid(value):
+                return f"Slot '{name}' must be {description}, got {value!r}."
+
+        return check
+
+    is_valid, description = _element_check(element_type(type))
+
+    def check_array(value):
+        if not isinstance(value, (list, tuple)):
+            return f"Slot '{name}' must be a list, got {value!r}."
+        for index, element in enumerate(value):
+            if not is_valid(element):
+                return f"Element {index} of slot '{name}' must be {description}, got {element!r}."
+
+    return check_array
+
+
+class SlotValidator:
+    """
+    Checks a mapping of values against a template's slots before the template is filled. The checks for each slot
+    are built once, when the validator is created.
+    """
+
+    def __init__(self, slots: list[tuple[str, SlotType]]):
+        self._checks = tuple((name, _compile_check(name, type)) for name, type in slots)
+
+    def errors(self, values: Mapping) -> list[str]:
+        """
+        Returns a message for every missing or wrongly typed slot in values.
+        """
+        errors = []
+        for name, check in self._checks:
+            if name not in values:
+                errors.append(f"Missing value for slot '{name}'.")
+            elif message := check(values[name]):
+                errors.append(message)
+        return errors
+
+    def validate(self, values: Mapping):
+        """
+        Raises a SlotValidationError if values cannot be used to fill the template.
+        """
+        if errors := self.errors(values):
+            raise SlotValidationError(errors)
+
+    def validate_batch(self, records: Iterable[Mapping]) -> dict[int, list[str]]:
+        """
+        Validates many records, returning the errors for each invalid record keyed by its position. Valid records
+        are omitted, so an empty result means every record can be rendered.
+        """
+        failures = {}
+        errors = self.errors
+        for index, values in enumerate(records):
+            if record_errors := errors(values):
+                failures[index] = record_errors
+        return failures